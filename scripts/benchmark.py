@@ -0,0 +1,284 @@
+"""
+Mediciones de rendimiento de los gestores SP_* y de DistributedConnection.
+Usa los nodos FIS y FIQA emulados con SQLite, de modo que no hace falta
+SQL Server. Para cada tamaño de datos se cargan las tablas, se ejecutan las
+operaciones CRUD y de consulta de cada gestor y la consulta en paralelo a
+todos los nodos, y se emite un JSON con rendimiento, latencias p50/p95/p99
+y memoria máxima de cada operación.
+
+Uso:
+    python scripts/benchmark.py --sizes 1000 10000 100000 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+# Agregar el directorio src al path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config.database import DistributedDatabaseConfig
+from database.distributed_connection import DistributedConnection
+from database.s_p_libro import SP_Libro
+from database.s_p_pasillo import SP_Pasillo
+from database.s_p_prestamo import SP_Prestamo
+from database.s_p_usuarios import SP_Usuarios
+
+
+BIBLIOTECAS = ("01", "02")
+# Las consultas completas recorren toda la tabla: se repiten menos veces
+SCAN_ITERATIONS = 5
+POINT_ITERATIONS = 200
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """Percentil por el método del rango más cercano."""
+    ordered = sorted(samples)
+    position = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[position]
+
+
+def measure(name: str, operation: Callable[[int], Any], iterations: int) -> Dict[str, Any]:
+    """
+    Ejecuta una operación varias veces y resume sus tiempos y memoria.
+    
+    Args:
+        name: Nombre de la operación en el informe.
+        operation: Función que recibe el número de iteración.
+        iterations: Número de ejecuciones.
+    
+    Returns:
+        Diccionario con throughput (operaciones por segundo), latencias en
+        milisegundos y memoria máxima asignada en bytes por una ejecución.
+    """
+    samples = []
+    # Los gestores informan cada operación por consola: se descarta esa salida
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for iteration in range(iterations):
+            operation_start = time.perf_counter()
+            operation(iteration)
+            samples.append(time.perf_counter() - operation_start)
+        total = time.perf_counter() - start
+        
+        # tracemalloc vuelve lenta cada asignación: la memoria se mide en una
+        # ejecución aparte para no alterar las latencias
+        tracemalloc.start()
+        operation(iterations)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'operation': name,
+        'iterations': iterations,
+        'throughput_ops': round(iterations / total, 2) if total else None,
+        'p50_ms': round(percentile(samples, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+        'peak_memory_bytes': peak,
+    }
+
+
+def load_data(dist_conn: DistributedConnection, size: int):
+    """
+    Carga size filas en LIBRO, usuarios, préstamos y pasillos, repartidas
+    entre los fragmentos de ambas bibliotecas.
+    
+    La carga inserta directamente en las tablas (sin los procedimientos)
+    para que preparar un millón de filas no domine el tiempo total.
+    """
+    today = date.today()
+    libros = [(f"ISBN-{i:07d}", f"Libro {i}", 1950 + i % 75, f"Categoría {i % 20}", "Quito")
+              for i in range(size)]
+    for node in ("FIS", "FIQA"):
+        with dist_conn.connection(node) as connection, connection.get_cursor() as cursor:
+            cursor.executemany("INSERT INTO LIBRO VALUES (?, ?, ?, ?, ?)", libros)
+            connection.commit()
+    del libros
+    
+    with dist_conn.connection("FIS") as connection, connection.get_cursor() as cursor:
+        for fragment in BIBLIOTECAS:
+            rows = range(int(fragment) - 1, size, len(BIBLIOTECAS))
+            cursor.executemany(
+                f"INSERT INTO Usuarios_info_{fragment} VALUES (?, ?, ?, ?)",
+                [(fragment, f"{i:010d}", f"Nombre {i}", f"Apellido {i}") for i in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO Prestamo_{fragment} VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(fragment, f"ISBN-{i:07d}", 1, f"{i:010d}", today - timedelta(days=i % 60),
+                  today + timedelta(days=15 - i % 60), None if i % 3 else today)
+                 for i in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO Pasillo_{fragment} VALUES (?, ?)",
+                [(fragment, i) for i in range(min(size, 1000))]
+            )
+        cursor.executemany(
+            "INSERT INTO Usuario_contacto VALUES (?, ?, ?)",
+            [(f"{i:010d}", f"usuario{i}@correo.com", f"09{i % 10 ** 8:08d}") for i in range(size)]
+        )
+        connection.commit()
+
+
+def run_size(size: int, directory: str) -> List[Dict[str, Any]]:
+    """Mide todas las operaciones con size filas por tabla."""
+    config = DistributedDatabaseConfig.for_sqlite(directory)
+    # Se mide el costo de cada consulta en el nodo, no el de la caché de resultados
+    config.cache.enabled = False
+    dist_conn = DistributedConnection(config)
+    dist_conn.connect_all()
+    load_data(dist_conn, size)
+    
+    sp_libro = SP_Libro(dist_conn)
+    sp_usuarios = SP_Usuarios(dist_conn)
+    sp_prestamo = SP_Prestamo(dist_conn)
+    sp_pasillo = SP_Pasillo(dist_conn)
+    today = date.today()
+    # Versión tras la carga: mide una actualización incremental sin cambios
+    version = sp_libro.version_cambios()
+    # Clave de un préstamo a mitad del historial: mide una página profunda
+    medio = sp_prestamo.consultar_prestamo_page(limit=max(1, size // 2))[-1]
+    clave_media = tuple(medio[column] for column in
+                        ("id_biblioteca", "ISBN", "id_ejemplar", "cedula", "fecha_prestamo"))
+    
+    def existing(iteration: int) -> int:
+        return (iteration * 7919) % size
+    
+    benchmarks = [
+        # LIBRO (replicada)
+        ("libro.consultar_todos", lambda i: sp_libro.consultar_libro(node="FIS"), SCAN_ITERATIONS),
+        ("libro.consultar_result_set",
+         lambda i: sp_libro.consultar_libro(node="FIS", as_result_set=True), SCAN_ITERATIONS),
+        ("libro.consultar_iter", lambda i: sum(1 for _ in sp_libro.consultar_libro_iter(node="FIS")),
+         SCAN_ITERATIONS),
+        ("libro.consultar_cambios",
+         lambda i: sp_libro.consultar_libro_cambios(version), SCAN_ITERATIONS),
+        ("libro.buscar",
+         lambda i: sp_libro.buscar_libro(f"libro {existing(i)}", node="FIS"), POINT_ITERATIONS),
+        ("libro.consultar_isbn",
+         lambda i: sp_libro.consultar_libro(f"ISBN-{existing(i):07d}"), POINT_ITERATIONS),
+        ("libro.insertar",
+         lambda i: sp_libro.insertar_libro(f"NUEVO-{i}", "Nuevo", 2024, "Prueba", "Quito"),
+         POINT_ITERATIONS),
+        ("libro.actualizar",
+         lambda i: sp_libro.actualizar_libro(f"NUEVO-{i}", "Editado", 2024, "Prueba", "Quito"),
+         POINT_ITERATIONS),
+        ("libro.eliminar", lambda i: sp_libro.eliminar_libro(f"NUEVO-{i}"), POINT_ITERATIONS),
+        ("libro.insertar_lote",
+         lambda i: sp_libro.insertar_libros([
+             {"ISBN": f"LOTE-{i}-{j}", "nombre_libro": "Lote", "anio_edicion": 2024,
+              "categoria_libro": "Prueba", "lugar_impresion_libro": "Quito"}
+             for j in range(100)
+         ]), 20),
+        # USUARIOS (fragmentación mixta)
+        ("usuarios.consultar_todos",
+         lambda i: sp_usuarios.consultar_usuario(node="FIS"), SCAN_ITERATIONS),
+        ("usuarios.consultar_cedula",
+         lambda i: sp_usuarios.consultar_usuario(f"{existing(i):010d}"), POINT_ITERATIONS),
+        ("usuarios.buscar",
+         lambda i: sp_usuarios.buscar_usuario(f"apellido {existing(i)}"), POINT_ITERATIONS),
+        ("usuarios.insertar",
+         lambda i: sp_usuarios.insertar_usuario(BIBLIOTECAS[i % 2], f"N{i:09d}", "Nuevo",
+                                                "Usuario", "nuevo@correo.com", "0990000000"),
+         POINT_ITERATIONS),
+        ("usuarios.actualizar",
+         lambda i: sp_usuarios.actualizar_usuario(BIBLIOTECAS[i % 2], f"N{i:09d}", "Editado",
+                                                  "Usuario", "editado@correo.com", "0991111111"),
+         POINT_ITERATIONS),
+        ("usuarios.eliminar",
+         lambda i: sp_usuarios.eliminar_usuario(BIBLIOTECAS[i % 2], f"N{i:09d}"),
+         POINT_ITERATIONS),
+        # PRESTAMO (fragmentación horizontal)
+        ("prestamo.consultar_todos",
+         lambda i: sp_prestamo.consultar_prestamo(node="FIS"), SCAN_ITERATIONS),
+        ("prestamo.consultar_activos",
+         lambda i: sp_prestamo.consultar_prestamos_activos(node="FIS"), SCAN_ITERATIONS),
+        ("prestamo.consultar_vencidos",
+         lambda i: sp_prestamo.consultar_prestamos_vencidos(node="FIS"), SCAN_ITERATIONS),
+        ("prestamo.consultar_pagina",
+         lambda i: sp_prestamo.consultar_prestamo_page(clave_media, 100, node="FIS"),
+         SCAN_ITERATIONS),
+        ("prestamo.insertar",
+         lambda i: sp_prestamo.insertar_prestamo(BIBLIOTECAS[i % 2], "ISBN-0000000", 2,
+                                                 f"{existing(i):010d}", today - timedelta(days=i),
+                                                 today + timedelta(days=15)),
+         POINT_ITERATIONS),
+        ("prestamo.actualizar",
+         lambda i: sp_prestamo.actualizar_prestamo(BIBLIOTECAS[i % 2], "ISBN-0000000", 2,
+                                                   f"{existing(i):010d}",
+                                                   today - timedelta(days=i), today),
+         POINT_ITERATIONS),
+        # PASILLO (fragmentación horizontal)
+        ("pasillo.consultar_todos",
+         lambda i: sp_pasillo.consultar_pasillo(node="FIS"), SCAN_ITERATIONS),
+        ("pasillo.insertar",
+         lambda i: sp_pasillo.insertar_pasillo(BIBLIOTECAS[i % 2], 100000 + i), POINT_ITERATIONS),
+        ("pasillo.actualizar",
+         lambda i: sp_pasillo.actualizar_pasillo(BIBLIOTECAS[i % 2], 100000 + i, 200000 + i),
+         POINT_ITERATIONS),
+        ("pasillo.eliminar",
+         lambda i: sp_pasillo.eliminar_pasillo(BIBLIOTECAS[i % 2], 200000 + i), POINT_ITERATIONS),
+        # Consulta en paralelo a todos los nodos
+        ("distribuida.consulta_todos_nodos",
+         lambda i: dist_conn.execute_procedure_all("sp_Consultar_Libro").merged(),
+         SCAN_ITERATIONS),
+        ("distribuida.conteo_todos_nodos",
+         lambda i: dist_conn.execute_query_all("SELECT COUNT(*) AS total FROM LIBRO"),
+         POINT_ITERATIONS),
+    ]
+    
+    results = []
+    for name, operation, iterations in benchmarks:
+        result = measure(name, operation, iterations)
+        result['rows'] = size
+        results.append(result)
+        print(f"  {name:<36} p50={result['p50_ms']:>9.3f} ms  "
+              f"p99={result['p99_ms']:>9.3f} ms  {result['throughput_ops']:>10} op/s",
+              file=sys.stderr)
+    dist_conn.disconnect_all()
+    return results
+
+
+def main():
+    """Ejecuta las mediciones y escribe el informe JSON."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Filas por tabla en cada corrida (ej: 1000 10000 1000000)")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto, la consola)")
+    args = parser.parse_args()
+    
+    report = {
+        'timestamp': datetime.now().isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'results': [],
+    }
+    for size in args.sizes:
+        print(f"Midiendo con {size} filas...", file=sys.stderr)
+        directory = tempfile.mkdtemp(prefix="benchmark_")
+        try:
+            report['results'].extend(run_size(size, directory))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+    
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(output)
+        print(f"Resultados guardados en {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
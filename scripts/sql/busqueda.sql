@@ -0,0 +1,84 @@
+/*
+ * Búsquedas en el servidor (buscar_libro y buscar_usuario).
+ * Crea el índice de texto completo de LIBRO y los procedimientos
+ * sp_Buscar_Libro y sp_Buscar_Usuario. Ejecutar en la base de cada nodo
+ * (FIS y FIQA): LIBRO está replicado y sus búsquedas van a la réplica que
+ * responda antes; las de usuarios se hacen en FIS, sobre v_Usuario.
+ *
+ * Requiere Full-Text Search instalado y SQL Server 2017 o posterior
+ * (STRING_AGG). Las comparaciones no distinguen mayúsculas si la
+ * intercalación de la base es CI, como la predeterminada.
+ */
+
+IF NOT EXISTS (SELECT 1 FROM sys.fulltext_catalogs WHERE name = 'ft_biblioteca')
+    CREATE FULLTEXT CATALOG ft_biblioteca WITH ACCENT_SENSITIVITY = OFF;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.fulltext_indexes WHERE object_id = OBJECT_ID('dbo.LIBRO'))
+BEGIN
+    -- El índice de texto completo necesita el nombre del índice de la clave primaria
+    DECLARE @sql NVARCHAR(MAX) =
+        N'CREATE FULLTEXT INDEX ON dbo.LIBRO '
+        + N'(ISBN, nombre_libro, categoria_libro, lugar_impresion_libro) KEY INDEX '
+        + QUOTENAME((SELECT name FROM sys.indexes
+                     WHERE object_id = OBJECT_ID('dbo.LIBRO') AND is_primary_key = 1))
+        + N' ON ft_biblioteca WITH CHANGE_TRACKING AUTO';
+    EXEC sys.sp_executesql @sql;
+END
+GO
+
+-- Libros con palabras que empiezan por cada palabra de @texto, los más
+-- relevantes primero; sin texto, los de la categoría por nombre
+CREATE OR ALTER PROCEDURE dbo.sp_Buscar_Libro
+    @texto NVARCHAR(200) = NULL,
+    @categoria NVARCHAR(100) = NULL,
+    @limite INT = 200
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- "quim*" AND "fund*": cada palabra como prefijo y todas obligatorias
+    DECLARE @busqueda NVARCHAR(4000);
+    SELECT @busqueda = STRING_AGG(N'"' + REPLACE(value, N'"', N'') + N'*"', N' AND ')
+    FROM STRING_SPLIT(@texto, N' ')
+    WHERE REPLACE(value, N'"', N'') <> N'';
+
+    IF @busqueda IS NULL
+        SELECT TOP (@limite) l.*
+        FROM dbo.LIBRO AS l
+        WHERE @categoria IS NULL OR l.categoria_libro = @categoria
+        ORDER BY l.nombre_libro;
+    ELSE
+        SELECT TOP (@limite) l.*
+        FROM CONTAINSTABLE(dbo.LIBRO,
+                           (ISBN, nombre_libro, categoria_libro, lugar_impresion_libro),
+                           @busqueda) AS b
+        JOIN dbo.LIBRO AS l ON l.ISBN = b.[KEY]
+        WHERE @categoria IS NULL OR l.categoria_libro = @categoria
+        ORDER BY b.RANK DESC;
+END
+GO
+
+-- Usuarios cuya cédula, nombre, apellido o email empiezan por @texto
+CREATE OR ALTER PROCEDURE dbo.sp_Buscar_Usuario
+    @texto NVARCHAR(100),
+    @limite INT = 200,
+    @id_biblioteca VARCHAR(10) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- Comodines de LIKE escapados y sin comodín al inicio, para que cada
+    -- columna pueda usar su índice
+    DECLARE @prefijo NVARCHAR(402) = REPLACE(REPLACE(REPLACE(
+        LTRIM(RTRIM(ISNULL(@texto, N''))), N'[', N'[[]'), N'%', N'[%]'), N'_', N'[_]') + N'%';
+
+    SELECT TOP (@limite) *
+    FROM dbo.v_Usuario
+    WHERE (cedula LIKE @prefijo OR nombre_usuario LIKE @prefijo
+           OR apellido_usuario LIKE @prefijo OR email_usuario LIKE @prefijo)
+      AND (@id_biblioteca IS NULL OR id_biblioteca = @id_biblioteca)
+    ORDER BY apellido_usuario, nombre_usuario
+    OPTION (RECOMPILE);
+END
+GO
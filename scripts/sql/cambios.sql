@@ -0,0 +1,62 @@
+/*
+ * Sincronización incremental de las vistas (DeltaSync).
+ * Activa Change Tracking sobre LIBRO y crea sp_Version_Cambios y
+ * sp_Cambios_Libro. Ejecutar en la base de cada nodo (FIS y FIQA): la vista
+ * de libros lee la versión, la carga completa y los cambios de la réplica
+ * que elige ReadRouter, siempre la misma hasta la siguiente carga completa.
+ * Cada base lleva su propia versión; en FIQA los cambios que llegan por
+ * replicación también quedan registrados.
+ *
+ * Las columnas de sp_Cambios_Libro deben ser las de sp_Consultar_Libro,
+ * más 'operacion' ('U' o 'D') y 'version_cambio'.
+ *
+ * No hay sp_Cambios_Usuario, sp_Cambios_Pasillo ni sp_Cambios_Prestamo:
+ * sus vistas unen fragmentos de FIS y FIQA, y cada base lleva su propia
+ * versión de Change Tracking, así que un solo número no puede marcar hasta
+ * dónde se sincronizó. Sin ellos la aplicación vuelve a cargar esos datos
+ * completos en cada actualización (lo detecta en la primera llamada).
+ *
+ * Requiere SQL Server 2016 SP1 o posterior (CREATE OR ALTER).
+ */
+IF NOT EXISTS (SELECT 1 FROM sys.change_tracking_databases WHERE database_id = DB_ID())
+    ALTER DATABASE CURRENT SET CHANGE_TRACKING = ON (CHANGE_RETENTION = 2 DAYS, AUTO_CLEANUP = ON);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.change_tracking_tables WHERE object_id = OBJECT_ID('dbo.LIBRO'))
+    ALTER TABLE dbo.LIBRO ENABLE CHANGE_TRACKING;
+GO
+
+-- Versión actual, leída antes de cada carga completa
+CREATE OR ALTER PROCEDURE dbo.sp_Version_Cambios
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT CHANGE_TRACKING_CURRENT_VERSION() AS version;
+END
+GO
+
+-- Libros modificados desde @version: la fila actual ('U') o solo el ISBN ('D')
+CREATE OR ALTER PROCEDURE dbo.sp_Cambios_Libro
+    @version BIGINT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- La retención ya borró cambios posteriores a @version: el error hace
+    -- que la aplicación vuelva a cargar todo
+    IF @version < CHANGE_TRACKING_MIN_VALID_VERSION(OBJECT_ID('dbo.LIBRO'))
+    BEGIN
+        RAISERROR('La versión %I64d ya no está en el registro de cambios de LIBRO.', 16, 1, @version);
+        RETURN;
+    END
+
+    SELECT l.ISBN, l.nombre_libro, l.anio_edicion, l.categoria_libro, l.lugar_impresion_libro,
+           'U' AS operacion, c.SYS_CHANGE_VERSION AS version_cambio
+    FROM CHANGETABLE(CHANGES dbo.LIBRO, @version) AS c
+    JOIN dbo.LIBRO AS l ON l.ISBN = c.ISBN
+    UNION ALL
+    SELECT c.ISBN, NULL, NULL, NULL, NULL, 'D', c.SYS_CHANGE_VERSION
+    FROM CHANGETABLE(CHANGES dbo.LIBRO, @version) AS c
+    WHERE NOT EXISTS (SELECT 1 FROM dbo.LIBRO AS l WHERE l.ISBN = c.ISBN);
+END
+GO
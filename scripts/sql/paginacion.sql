@@ -0,0 +1,58 @@
+/*
+ * Paginación por clave de los resultados grandes (consultar_*_page).
+ * Crea sp_Pagina_Usuario y sp_Pagina_Prestamo sobre las vistas v_Usuario y
+ * v_Prestamo. Ejecutar en FIS, donde las vistas unen ambos fragmentos.
+ *
+ * Cada página devuelve hasta @limite filas ordenadas por la clave, a partir
+ * de la siguiente a la clave recibida (todas NULL: primera página). T-SQL
+ * no compara filas ((a, b) > (@a, @b)), así que la condición se escribe
+ * columna por columna; OPTION (RECOMPILE) permite buscar con el índice de
+ * la clave para los valores de cada llamada.
+ *
+ * Ajustar los tipos de los parámetros a los de las tablas.
+ * Requiere SQL Server 2016 SP1 o posterior (CREATE OR ALTER).
+ */
+USE FIS;
+GO
+
+CREATE OR ALTER PROCEDURE dbo.sp_Pagina_Usuario
+    @limite INT,
+    @id_biblioteca VARCHAR(10) = NULL,
+    @cedula VARCHAR(20) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT TOP (@limite) *
+    FROM dbo.v_Usuario
+    WHERE @id_biblioteca IS NULL
+       OR id_biblioteca > @id_biblioteca
+       OR (id_biblioteca = @id_biblioteca AND cedula > @cedula)
+    ORDER BY id_biblioteca, cedula
+    OPTION (RECOMPILE);
+END
+GO
+
+CREATE OR ALTER PROCEDURE dbo.sp_Pagina_Prestamo
+    @limite INT,
+    @id_biblioteca VARCHAR(10) = NULL,
+    @ISBN VARCHAR(20) = NULL,
+    @id_ejemplar INT = NULL,
+    @cedula VARCHAR(20) = NULL,
+    @fecha_prestamo DATE = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SELECT TOP (@limite) *
+    FROM dbo.v_Prestamo
+    WHERE @id_biblioteca IS NULL
+       OR id_biblioteca > @id_biblioteca
+       OR (id_biblioteca = @id_biblioteca AND ISBN > @ISBN)
+       OR (id_biblioteca = @id_biblioteca AND ISBN = @ISBN AND id_ejemplar > @id_ejemplar)
+       OR (id_biblioteca = @id_biblioteca AND ISBN = @ISBN AND id_ejemplar = @id_ejemplar
+           AND cedula > @cedula)
+       OR (id_biblioteca = @id_biblioteca AND ISBN = @ISBN AND id_ejemplar = @id_ejemplar
+           AND cedula = @cedula AND fecha_prestamo > @fecha_prestamo)
+    ORDER BY id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo
+    OPTION (RECOMPILE);
+END
+GO
@@ -2,7 +2,7 @@
 Configuración de conexión a la base de datos distribuida.
 """
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Optional
 
 
@@ -17,6 +17,11 @@ class DatabaseConfig:
     driver: str = "ODBC Driver 17 for SQL Server"
     trusted_connection: bool = True
     port: int = 1433
+    connect_timeout: int = 15   # Segundos de espera del login (0 = sin límite)
+    query_timeout: int = 30     # Segundos por consulta (0 = sin límite)
+    backend: str = "sqlserver"  # "sqlserver" (pyodbc) o "sqlite" (emulación local)
+    sqlite_path: str = ""           # Archivo del nodo con el backend sqlite
+    sqlite_remote_path: str = ""    # Archivo del otro nodo (servidor vinculado)
     
     @classmethod
     def from_env(cls) -> "DatabaseConfig":
@@ -28,9 +33,16 @@ class DatabaseConfig:
             password=os.getenv("DB_PASSWORD", ""),
             driver=os.getenv("DB_DRIVER", "ODBC Driver 17 for SQL Server"),
             trusted_connection=os.getenv("DB_TRUSTED_CONNECTION", "True").lower() == "true",
-            port=int(os.getenv("DB_PORT", "1433"))
+            port=int(os.getenv("DB_PORT", "1433")),
+            connect_timeout=int(os.getenv("DB_CONNECT_TIMEOUT", "15")),
+            query_timeout=int(os.getenv("DB_QUERY_TIMEOUT", "30"))
         )
     
+    @property
+    def is_sqlite(self) -> bool:
+        """Indica si el nodo usa el backend local SQLite."""
+        return self.backend.lower() == "sqlite"
+    
     def get_connection_string(self) -> str:
         """Genera la cadena de conexión para pyodbc."""
         server_with_port = f"{self.server},{self.port}" if self.port != 1433 else self.server
@@ -52,17 +64,99 @@ class DatabaseConfig:
             )
 
 
+@dataclass
+class PoolConfig:
+    """Configuración del pool de conexiones de cada nodo."""
+    
+    max_size: int = 5                   # Conexiones simultáneas por nodo
+    idle_timeout: float = 300.0         # Segundos antes de cerrar una conexión ociosa
+    max_lifetime: float = 1800.0        # Segundos antes de reciclar una conexión
+    validation_interval: float = 30.0   # Ociosidad tras la cual se valida al prestarla
+    checkout_timeout: float = 30.0      # Espera máxima por una conexión libre
+
+
+@dataclass
+class CircuitBreakerConfig:
+    """Configuración del interruptor de circuito de cada nodo."""
+    
+    failure_threshold: int = 3      # Fallos de conexión seguidos antes de abrir
+    base_backoff: float = 1.0       # Segundos antes del primer reintento
+    max_backoff: float = 60.0       # Tope de la espera exponencial
+
+
+@dataclass
+class ReadRouterConfig:
+    """Configuración del enrutamiento de lecturas replicadas."""
+    
+    ewma_alpha: float = 0.3         # Peso de la última latencia en el promedio
+    initial_latency: float = 0.05   # Segundos supuestos antes de medir
+    history_size: int = 200         # Latencias recientes guardadas por nodo
+    hedge_percentile: float = 0.95  # Percentil usado como espera antes de duplicar
+    hedge_min_samples: int = 20     # Muestras necesarias para usar el percentil
+    default_hedge_delay: float = 0.5  # Espera mientras no hay muestras suficientes
+    probe_interval: float = 10.0    # Segundos sin medir un nodo antes de enviarle una lectura
+    pin_after_write: float = 5.0    # Segundos que las lecturas van al nodo de la última escritura en su tabla
+
+
+@dataclass
+class QueryCacheConfig:
+    """Configuración de la caché de resultados de los procedimientos sp_Consultar_*."""
+    
+    enabled: bool = True
+    ttl: float = 60.0               # Segundos que un resultado se considera vigente
+    max_entries: int = 256          # Resultados guardados antes de desalojar el menos usado
+
+
 @dataclass
 class DistributedDatabaseConfig:
     """Configuración para base de datos distribuida con múltiples nodos."""
     
     nodes: Dict[str, DatabaseConfig]
     primary_node: str = "FIS"
+    pool: PoolConfig = field(default_factory=PoolConfig)
+    breaker: CircuitBreakerConfig = field(default_factory=CircuitBreakerConfig)
+    router: ReadRouterConfig = field(default_factory=ReadRouterConfig)
+    cache: QueryCacheConfig = field(default_factory=QueryCacheConfig)
+    
+    @classmethod
+    def for_sqlite(cls, directory: str) -> "DistributedDatabaseConfig":
+        """
+        Crea la configuración de los nodos FIS y FIQA emulados con SQLite.
+        
+        Args:
+            directory: Carpeta donde se guardan FIS.db y FIQA.db.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            name: os.path.join(directory, f"{name}.db") for name in ("FIS", "FIQA")
+        }
+        nodes = {
+            name: DatabaseConfig(
+                server="localhost",
+                database=name,
+                backend="sqlite",
+                sqlite_path=path,
+                sqlite_remote_path=next(
+                    other for other_name, other in paths.items() if other_name != name
+                )
+            )
+            for name, path in paths.items()
+        }
+        return cls(nodes=nodes, primary_node="FIS")
     
     @classmethod
     def from_env(cls) -> "DistributedDatabaseConfig":
-        """Crea la configuración distribuida con credenciales directas."""
+        """
+        Crea la configuración distribuida con credenciales directas.
+        
+        Con DB_BACKEND=sqlite se usan los nodos emulados en DB_SQLITE_DIR.
+        """
+        if os.getenv("DB_BACKEND", "").lower() == "sqlite":
+            return cls.for_sqlite(os.getenv("DB_SQLITE_DIR", "data"))
+        
         nodes = {}
+        connect_timeout = int(os.getenv("DB_CONNECT_TIMEOUT", "15"))
+        query_timeout = int(os.getenv("DB_QUERY_TIMEOUT", "30"))
         
         # Configuración del nodo FIS (WIN-PHDDNKD39M9 - Nodo 1)
         nodes["FIS"] = DatabaseConfig(
@@ -72,7 +166,9 @@ class DistributedDatabaseConfig:
             password="P@ssw0rd",
             driver="ODBC Driver 17 for SQL Server",
             trusted_connection=False,
-            port=1433
+            port=1433,
+            connect_timeout=connect_timeout,
+            query_timeout=query_timeout
         )
         
         # Configuración del nodo FIQA (Slim - Nodo 2)
@@ -83,7 +179,9 @@ class DistributedDatabaseConfig:
             password="P@ssw0rd",
             driver="ODBC Driver 17 for SQL Server",
             trusted_connection=False,
-            port=1433
+            port=1433,
+            connect_timeout=connect_timeout,
+            query_timeout=query_timeout
         )
         
         primary_node = "FIS"
@@ -47,6 +47,19 @@ class Settings:
     WINDOW_MIN_WIDTH = 800
     WINDOW_MIN_HEIGHT = 500
     
+    # Búsqueda: hasta este número de filas cargadas las vistas buscan con un
+    # índice en memoria; con más, buscan en el servidor (buscar_*) al dejar de
+    # escribir, para no mantener un índice tan grande (y también mientras los
+    # datos aún no se han cargado)
+    SEARCH_SERVER_ROWS = 500000
+    SEARCH_DELAY_MS = 300
+    
+    # Vistas: se crean al abrirlas por primera vez; tras el inicio de sesión
+    # las demás se crean de a una si PREFETCH_VIEWS, solo cuando el usuario
+    # lleva esta pausa sin usar el teclado ni el ratón y no hay consultas en curso
+    PREFETCH_VIEWS = True
+    PREFETCH_DELAY_MS = 1500
+    
     # Colores del tema (fijos)
     PRIMARY_COLOR = "#2196F3"
     SECONDARY_COLOR = "#1976D2"
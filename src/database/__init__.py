@@ -3,5 +3,21 @@ Módulo de base de datos.
 """
 from .connection import DatabaseConnection
 from .distributed_connection import DistributedConnection
+from .async_connection import AsyncDistributedConnection
+from .circuit_breaker import CircuitBreaker, CircuitState
+from .delta_sync import DeltaSync
+from .fan_out import FanOutResult, NodeResult
+from .instrumentation import LatencyHistogram, MetricsCollector, QueryEvent, metrics
+from .pool import ConnectionPool
+from .query_cache import QueryCache
+from .read_router import ReadRouter
+from .registry import ConnectionRegistry, connection_registry
+from .result_set import ResultSet, Row
+from .search_index import TrigramIndex
+from .unit_of_work import UnitOfWork
 
-__all__ = ['DatabaseConnection', 'DistributedConnection']
+__all__ = ['DatabaseConnection', 'DistributedConnection', 'AsyncDistributedConnection',
+           'CircuitBreaker', 'CircuitState', 'DeltaSync', 'ReadRouter',
+           'ConnectionPool', 'QueryCache', 'ConnectionRegistry', 'connection_registry',
+           'FanOutResult', 'NodeResult', 'ResultSet', 'Row', 'TrigramIndex',
+           'UnitOfWork', 'LatencyHistogram', 'MetricsCollector', 'QueryEvent', 'metrics']
@@ -0,0 +1,147 @@
+"""
+Interfaz asyncio sobre DistributedConnection.
+Cada nodo tiene su propio pool de hilos con concurrencia acotada, de modo que
+las corrutinas pueden solapar muchas llamadas a procedimientos almacenados sin
+bloquear el bucle de eventos (scripts por lotes, o la GUI con un bucle
+compatible con Qt como qasync).
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from database.distributed_connection import DistributedConnection
+from database.fan_out import FanOutResult, NodeResult, build_exec_statement
+
+
+class AsyncDistributedConnection:
+    """Fachada asíncrona de una DistributedConnection."""
+    
+    # Protege la creación de la fachada compartida de cada conexión
+    _instances_lock = threading.Lock()
+    
+    def __init__(self, dist_conn: DistributedConnection,
+                 max_concurrency: Optional[int] = None):
+        """
+        Inicializa la fachada asíncrona.
+        
+        Args:
+            dist_conn: Conexión distribuida a usar.
+            max_concurrency: Llamadas simultáneas por nodo. Si es None, se usa
+                            el tamaño del pool de conexiones de cada nodo.
+        """
+        self.dist_conn = dist_conn
+        self.max_concurrency = max_concurrency or dist_conn.config.pool.max_size
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._lock = threading.Lock()
+    
+    @classmethod
+    def for_connection(cls, dist_conn: DistributedConnection) -> "AsyncDistributedConnection":
+        """
+        Obtiene la fachada asíncrona compartida de una conexión distribuida.
+        
+        La fachada se guarda en la propia conexión (dist_conn.async_conn),
+        de modo que se libera junto con ella y disconnect_all() la cierra.
+        
+        Args:
+            dist_conn: Conexión distribuida.
+        
+        Returns:
+            Fachada asíncrona asociada a dist_conn.
+        """
+        with cls._instances_lock:
+            if dist_conn.async_conn is None:
+                dist_conn.async_conn = cls(dist_conn)
+            return dist_conn.async_conn
+    
+    def _get_executor(self, node_name: str) -> ThreadPoolExecutor:
+        """Obtiene (o crea) el pool de hilos dedicado a un nodo."""
+        node_name = node_name.upper()
+        with self._lock:
+            executor = self._executors.get(node_name)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=self.max_concurrency,
+                    thread_name_prefix=f"async-{node_name}"
+                )
+                self._executors[node_name] = executor
+            return executor
+    
+    async def run(self, node_name: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta una función bloqueante en el pool de hilos del nodo.
+        
+        Args:
+            node_name: Nodo cuyo pool de hilos se usa.
+            func: Función bloqueante a ejecutar.
+        
+        Returns:
+            Valor devuelto por func.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(node_name),
+            functools.partial(func, *args, **kwargs)
+        )
+    
+    async def execute_query(self, node_name: str, query: str, params: tuple = (),
+                            timeout: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Versión asíncrona de DistributedConnection.execute_query."""
+        return await self.run(node_name, self.dist_conn.execute_query,
+                              node_name, query, params, timeout=timeout)
+    
+    async def execute_non_query(self, node_name: str, query: str, params: tuple = (),
+                                timeout: Optional[int] = None) -> int:
+        """Versión asíncrona de DistributedConnection.execute_non_query."""
+        return await self.run(node_name, self.dist_conn.execute_non_query,
+                              node_name, query, params, timeout)
+    
+    async def execute_query_all(self, query: str, params: tuple = (),
+                                nodes: Optional[Iterable[str]] = None,
+                                timeout: Optional[int] = None) -> FanOutResult:
+        """
+        Ejecuta la misma consulta en varios nodos de forma concurrente.
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            nodes: Nodos donde ejecutar. Si es None, se usan todos.
+            timeout: Segundos máximos de la consulta en cada nodo.
+        
+        Returns:
+            FanOutResult con filas, error y tiempo de cada nodo.
+        """
+        async def run_node(node_name: str) -> NodeResult:
+            start = time.perf_counter()
+            try:
+                rows = await self.execute_query(node_name, query, params, timeout)
+                return NodeResult(node_name, rows, elapsed=time.perf_counter() - start)
+            except Exception as e:
+                return NodeResult(node_name, error=e, elapsed=time.perf_counter() - start)
+        
+        nodes = [node.upper() for node in (nodes or self.dist_conn.config.get_all_nodes())]
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run_node(node) for node in nodes))
+        return FanOutResult(
+            {result.node: result for result in results},
+            elapsed=time.perf_counter() - start
+        )
+    
+    async def execute_procedure_all(self, procedure: str,
+                                    params: Optional[Dict[str, Any]] = None,
+                                    nodes: Optional[Iterable[str]] = None,
+                                    timeout: Optional[int] = None) -> FanOutResult:
+        """Versión asíncrona de DistributedConnection.execute_procedure_all."""
+        params = params or {}
+        query = build_exec_statement(procedure, params.keys())
+        return await self.execute_query_all(query, tuple(params.values()), nodes, timeout)
+    
+    def close(self):
+        """Detiene los pools de hilos de todos los nodos."""
+        with self._lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=False)
@@ -0,0 +1,162 @@
+"""
+Interruptor de circuito por nodo.
+Cuando un nodo deja de responder, las llamadas siguientes fallan de inmediato
+en lugar de esperar el tiempo de login de ODBC cada vez. Mientras el circuito
+está abierto, un hilo en segundo plano reintenta la conexión con espera
+exponencial y lo cierra en cuanto el nodo vuelve a responder.
+"""
+import threading
+import time
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+from config.database import CircuitBreakerConfig
+
+
+class CircuitState(Enum):
+    """Estados del interruptor de circuito."""
+    CLOSED = "closed"         # Nodo sano: se permiten las llamadas
+    OPEN = "open"             # Nodo caído: las llamadas fallan de inmediato
+    HALF_OPEN = "half_open"   # Probando si el nodo volvió
+
+
+class CircuitBreaker:
+    """Interruptor de circuito con reconexión en segundo plano."""
+    
+    def __init__(self, config: Optional[CircuitBreakerConfig] = None,
+                 probe: Optional[Callable[[], bool]] = None,
+                 name: str = ""):
+        """
+        Inicializa el interruptor cerrado.
+        
+        Args:
+            config: Umbral de fallos y tiempos de espera.
+            probe: Función que intenta reconectar y devuelve True si lo logró.
+                  Si es None, la primera llamada tras la espera hace de prueba.
+            name: Nombre del nodo, usado en los hilos y mensajes.
+        """
+        self.config = config or CircuitBreakerConfig()
+        self.probe = probe
+        self.name = name
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._open_count = 0
+        self._retry_at = 0.0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self) -> CircuitState:
+        """Estado actual del circuito."""
+        return self._state
+    
+    def _backoff(self) -> float:
+        """Espera antes del siguiente intento, creciente con cada apertura."""
+        backoff = self.config.base_backoff * (2 ** (self._open_count - 1))
+        return min(backoff, self.config.max_backoff)
+    
+    def allow_request(self) -> bool:
+        """
+        Indica si se puede enviar una llamada al nodo.
+        
+        Returns:
+            True con el circuito cerrado. Con el circuito abierto devuelve
+            False, salvo la única llamada de prueba cuando no hay sonda en
+            segundo plano y ya pasó el tiempo de espera.
+        """
+        with self._lock:
+            if self._state is CircuitState.CLOSED:
+                return True
+            if (self._state is CircuitState.OPEN and self.probe is None
+                    and time.monotonic() >= self._retry_at):
+                self._state = CircuitState.HALF_OPEN
+                return True
+            return False
+    
+    def record_success(self):
+        """Registra una llamada exitosa y cierra el circuito."""
+        with self._lock:
+            if self._state is CircuitState.CLOSED and self._failures == 0:
+                return
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._open_count = 0
+            self._cancel_timer()
+    
+    def record_failure(self):
+        """Registra un fallo de conexión y abre el circuito si corresponde."""
+        with self._lock:
+            self._failures += 1
+            if (self._state is CircuitState.HALF_OPEN
+                    or self._failures >= self.config.failure_threshold):
+                self._open()
+    
+    def record_skipped(self):
+        """
+        Registra una llamada que no llegó al nodo (por ejemplo, sin conexiones
+        libres en el pool). No cuenta como éxito ni como fallo; si era la
+        llamada de prueba, la siguiente puede volver a probar.
+        """
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN and self.probe is None:
+                self._state = CircuitState.OPEN
+                self._retry_at = time.monotonic()
+    
+    def _open(self):
+        """Abre el circuito y programa el siguiente intento. Requiere el lock."""
+        self._state = CircuitState.OPEN
+        self._open_count += 1
+        backoff = self._backoff()
+        self._retry_at = time.monotonic() + backoff
+        if self.probe is not None:
+            self._cancel_timer()
+            self._timer = threading.Timer(backoff, self._run_probe)
+            self._timer.name = f"circuito-{self.name}"
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def _run_probe(self):
+        """Intenta reconectar en segundo plano y actualiza el estado."""
+        with self._lock:
+            if self._state is not CircuitState.OPEN:
+                return
+            self._state = CircuitState.HALF_OPEN
+        try:
+            recovered = self.probe()
+        except Exception:
+            recovered = False
+        if recovered:
+            self.record_success()
+        else:
+            with self._lock:
+                if self._state is CircuitState.HALF_OPEN:
+                    self._open()
+    
+    def _cancel_timer(self):
+        """Cancela la sonda programada. Requiere el lock."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+    
+    def reset(self):
+        """Cierra el circuito y cancela cualquier sonda pendiente."""
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._failures = 0
+            self._open_count = 0
+            self._cancel_timer()
+    
+    def retry_in(self) -> float:
+        """Segundos que faltan para el siguiente intento de reconexión."""
+        if self._state is CircuitState.CLOSED:
+            return 0.0
+        return max(0.0, self._retry_at - time.monotonic())
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Resumen del estado para mostrar o registrar."""
+        with self._lock:
+            return {
+                'state': self._state.value,
+                'failures': self._failures,
+                'retry_in': round(self.retry_in(), 1),
+            }
@@ -1,26 +1,50 @@
 """
 Gestión de conexiones a SQL Server.
 """
-import pyodbc
-from typing import Optional, List, Any, Dict
+import sqlite3
+import time
+from typing import Optional, List, Any, Dict, Iterator, Union, Sequence, Tuple
 from contextlib import contextmanager
 
 from config.database import DatabaseConfig
+from database import sqlite_backend
+from database.instrumentation import MetricsCollector, QueryTimer, metrics
+from database.result_set import ResultSet
+
+try:
+    import pyodbc
+except ImportError:  # Sin controlador ODBC solo está disponible el backend SQLite
+    pyodbc = None
+
+# Errores de base de datos de cualquiera de los dos backends
+DB_ERRORS = (sqlite3.Error,) if pyodbc is None else (pyodbc.Error, sqlite3.Error)
+
+
+# Filas pedidas al servidor en cada fetchmany() al iterar resultados
+DEFAULT_BATCH_SIZE = 500
 
 
 class DatabaseConnection:
     """Clase para gestionar conexiones a SQL Server."""
     
-    def __init__(self, config: Optional[DatabaseConfig] = None):
+    def __init__(self, config: Optional[DatabaseConfig] = None,
+                 collector: Optional[MetricsCollector] = None):
         """
         Inicializa la conexión con la configuración proporcionada.
         
         Args:
             config: Configuración de la base de datos. Si es None, 
                    se carga desde variables de entorno.
+            collector: Recolector de métricas de las consultas. Si es None,
+                      se usa el recolector global 'metrics'.
         """
         self.config = config or DatabaseConfig.from_env()
-        self._connection: Optional[pyodbc.Connection] = None
+        self.collector = collector or metrics
+        self._connection: Optional[Any] = None      # pyodbc o SQLiteConnection
+        self._active_cursor: Optional[Any] = None
+        # Dentro de una transacción explícita las escrituras no se confirman solas
+        self.in_transaction = False
+        self.created_at: float = 0.0
     
     def connect(self) -> bool:
         """
@@ -30,10 +54,21 @@ class DatabaseConnection:
             True si la conexión fue exitosa, False en caso contrario.
         """
         try:
-            connection_string = self.config.get_connection_string()
-            self._connection = pyodbc.connect(connection_string)
+            if self.config.is_sqlite:
+                self._connection = sqlite_backend.connect(self.config)
+            elif pyodbc is None:
+                print("Error de conexión: pyodbc no está instalado")
+                return False
+            else:
+                connection_string = self.config.get_connection_string()
+                self._connection = pyodbc.connect(
+                    connection_string, timeout=self.config.connect_timeout
+                )
+            # Límite por defecto de cada consulta; los cursores lo heredan
+            self._connection.timeout = self.config.query_timeout
+            self.created_at = time.monotonic()
             return True
-        except pyodbc.Error as e:
+        except DB_ERRORS as e:
             print(f"Error de conexión: {e}")
             return False
     
@@ -47,58 +82,243 @@ class DatabaseConnection:
         """Verifica si hay una conexión activa."""
         return self._connection is not None
     
+    def is_alive(self) -> bool:
+        """
+        Verifica que la conexión siga respondiendo en el servidor.
+        
+        Returns:
+            True si una consulta trivial se ejecuta correctamente.
+        """
+        if not self._connection:
+            return False
+        try:
+            with self.get_cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+            return True
+        except DB_ERRORS:
+            return False
+    
+    def begin(self):
+        """Inicia una transacción explícita: las escrituras esperan a commit()."""
+        self.in_transaction = True
+    
+    def commit(self):
+        """Confirma la transacción pendiente y vuelve a confirmar cada escritura."""
+        self.in_transaction = False
+        if self._connection:
+            self._connection.commit()
+    
+    def rollback(self):
+        """Revierte la transacción pendiente, si existe."""
+        self.in_transaction = False
+        if self._connection:
+            try:
+                self._connection.rollback()
+            except DB_ERRORS as e:
+                print(f"Error al revertir transacción: {e}")
+    
+    def _timed(self, query: str) -> QueryTimer:
+        """Crea el medidor de una consulta, etiquetado con la base de datos del nodo."""
+        return QueryTimer(self.collector, self.config.database or self.config.server, query)
+    
+    def cancel(self):
+        """
+        Cancela la consulta en curso en esta conexión, si la hay.
+        
+        Puede llamarse desde otro hilo; la consulta cancelada termina con
+        un error de base de datos en el hilo que la ejecutaba.
+        """
+        cursor = self._active_cursor
+        if cursor is not None:
+            try:
+                cursor.cancel()
+            except DB_ERRORS as e:
+                print(f"Error al cancelar consulta: {e}")
+    
     @contextmanager
-    def get_cursor(self):
+    def get_cursor(self, timeout: Optional[int] = None):
         """
         Context manager para obtener un cursor.
         
+        Args:
+            timeout: Segundos máximos por consulta en este cursor. Si es None,
+                    se usa query_timeout de la configuración.
+        
         Yields:
             Cursor de la conexión.
         """
         if not self._connection:
             raise ConnectionError("No hay conexión activa a la base de datos")
         
-        cursor = self._connection.cursor()
+        if timeout is None:
+            cursor = self._connection.cursor()
+        else:
+            # El cursor toma el límite de la conexión al crearse
+            self._connection.timeout = timeout
+            try:
+                cursor = self._connection.cursor()
+            finally:
+                self._connection.timeout = self.config.query_timeout
+        self._active_cursor = cursor
         try:
             yield cursor
         finally:
+            self._active_cursor = None
             cursor.close()
     
-    def execute_query(self, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    def execute_query(self, query: str, params: tuple = (),
+                      as_result_set: bool = False,
+                      timeout: Optional[int] = None) -> Union[List[Dict[str, Any]], ResultSet]:
         """
         Ejecuta una consulta SELECT y devuelve los resultados.
         
         Args:
             query: Consulta SQL a ejecutar.
             params: Parámetros para la consulta.
+            as_result_set: Si es True, devuelve un ResultSet compacto (columnas
+                          una sola vez y filas como tuplas) en lugar de una
+                          lista de diccionarios.
+            timeout: Segundos máximos de la consulta. Si es None, se usa
+                    query_timeout de la configuración.
         
         Returns:
-            Lista de diccionarios con los resultados.
+            Lista de diccionarios o ResultSet con los resultados.
         """
-        with self.get_cursor() as cursor:
+        with self._timed(query) as timer, self.get_cursor(timeout) as cursor:
             cursor.execute(query, params)
             columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+            timer.add_rows(rows)
+            if as_result_set:
+                return ResultSet(columns, [tuple(row) for row in rows])
             results = []
-            for row in cursor.fetchall():
+            for row in rows:
                 results.append(dict(zip(columns, row)))
             return results
     
-    def execute_non_query(self, query: str, params: tuple = ()) -> int:
+    def iter_query(self, query: str, params: tuple = (),
+                   batch_size: int = DEFAULT_BATCH_SIZE,
+                   timeout: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Ejecuta una consulta SELECT y entrega las filas a medida que llegan.
+        
+        Las filas se piden en lotes de batch_size con fetchmany(), por lo que
+        la memoria usada no depende del tamaño total del resultado. El cursor
+        permanece abierto hasta agotar o cerrar el generador.
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            batch_size: Número de filas por lote.
+            timeout: Segundos máximos de cada llamada al servidor. Si es None,
+                    se usa query_timeout de la configuración.
+        
+        Yields:
+            Un diccionario por fila.
+        """
+        with self._timed(query) as timer, self.get_cursor(timeout) as cursor:
+            cursor.execute(query, params)
+            columns = [column[0] for column in cursor.description]
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                timer.add_rows(rows)
+                for row in rows:
+                    yield dict(zip(columns, row))
+    
+    def execute_non_query(self, query: str, params: tuple = (),
+                          timeout: Optional[int] = None) -> int:
         """
         Ejecuta una consulta INSERT, UPDATE o DELETE.
         
+        Se confirma de inmediato, salvo dentro de una transacción iniciada
+        con begin(), que se confirma con commit().
+        
         Args:
             query: Consulta SQL a ejecutar.
             params: Parámetros para la consulta.
+            timeout: Segundos máximos de la consulta. Si es None, se usa
+                    query_timeout de la configuración.
         
         Returns:
             Número de filas afectadas.
         """
-        with self.get_cursor() as cursor:
+        with self._timed(query) as timer, self.get_cursor(timeout) as cursor:
             cursor.execute(query, params)
-            self._connection.commit()
+            if not self.in_transaction:
+                self._connection.commit()
+            timer.event.rows = max(cursor.rowcount, 0)
             return cursor.rowcount
     
+    def execute_batch(self, query: str, param_rows: Sequence[tuple],
+                      timeout: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        Ejecuta la misma sentencia para muchas filas en una sola transacción.
+        
+        Primero se envían todas las filas en un único viaje con
+        fast_executemany. Si alguna falla, se revierte el lote y se repite
+        fila por fila con un punto de guardado por fila, de modo que las
+        filas válidas se confirman juntas y las inválidas se informan.
+        
+        Dentro de una transacción iniciada con begin() no se confirma ni se
+        reintenta fila por fila: el primer error se propaga para que la
+        transacción completa se revierta.
+        
+        Args:
+            query: Sentencia SQL a ejecutar (ej: EXEC sp_Insertar_Libro @ISBN=?, ...).
+            param_rows: Parámetros de cada fila.
+            timeout: Segundos máximos de cada llamada al servidor. Si es None,
+                    se usa query_timeout de la configuración.
+        
+        Returns:
+            Lista (éxito, mensaje de error) por fila, en el mismo orden.
+        """
+        if not param_rows:
+            return []
+        
+        with self._timed(query) as timer:
+            timer.event.rows = len(param_rows)
+            with self.get_cursor(timeout) as cursor:
+                cursor.fast_executemany = True
+                try:
+                    cursor.executemany(query, param_rows)
+                    if not self.in_transaction:
+                        self._connection.commit()
+                    return [(True, "")] * len(param_rows)
+                except DB_ERRORS:
+                    if self.in_transaction:
+                        raise
+                    self._connection.rollback()
+            
+            outcomes: List[Tuple[bool, str]] = []
+            with self.get_cursor(timeout) as cursor:
+                for params in param_rows:
+                    cursor.execute("IF @@TRANCOUNT = 0 BEGIN TRANSACTION; SAVE TRANSACTION fila_lote")
+                    try:
+                        cursor.execute(query, params)
+                        outcomes.append((True, ""))
+                    except DB_ERRORS as e:
+                        outcomes.append((False, str(e)))
+                        cursor.execute("SELECT XACT_STATE()")
+                        if cursor.fetchone()[0] == -1:
+                            # Transacción irrecuperable: se revierte el lote completo
+                            self._connection.rollback()
+                            reverted = [
+                                (False, message or "Revertido por un error en otra fila del lote")
+                                for _, message in outcomes
+                            ]
+                            pending = len(param_rows) - len(outcomes)
+                            timer.event.error = "Lote revertido"
+                            return reverted + [(False, "No ejecutado")] * pending
+                        cursor.execute("ROLLBACK TRANSACTION fila_lote")
+                self._connection.commit()
+            failed = sum(1 for ok, _ in outcomes if not ok)
+            if failed:
+                timer.event.error = f"{failed} filas con error"
+            return outcomes
+    
     def execute_scalar(self, query: str, params: tuple = ()) -> Any:
         """
         Ejecuta una consulta y devuelve un único valor.
@@ -110,9 +330,11 @@ class DatabaseConnection:
         Returns:
             Primer valor del primer resultado.
         """
-        with self.get_cursor() as cursor:
+        with self._timed(query) as timer, self.get_cursor() as cursor:
             cursor.execute(query, params)
             row = cursor.fetchone()
+            if row:
+                timer.add_rows([row])
             return row[0] if row else None
     
     def test_connection(self) -> tuple[bool, str]:
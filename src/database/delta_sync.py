@@ -0,0 +1,268 @@
+"""
+Sincronización incremental de resultados.
+Mantiene en memoria el resultado de una consulta completa (sp_Consultar_*)
+y, en cada actualización posterior, pide solo las filas modificadas desde
+la última versión aplicada (sp_Cambios_*) y las combina: las filas 'U' se
+insertan o reemplazan por su clave y las 'D' se quitan. Así refrescar una
+vista cuesta según los cambios y no según el tamaño de la tabla.
+La actualización puede hacerse en dos pasos: fetch() solo consulta y prepara
+las filas y los índices de búsqueda de una carga completa (y puede
+ejecutarse en otro hilo), y apply() modifica los datos en el hilo que los usa.
+Cada réplica lleva su propio registro de cambios, así que la versión, la
+carga completa y los cambios se leen siempre del mismo nodo: el que se
+eligió en la última carga completa.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from database.result_set import ResultSet
+from database.search_index import TrigramIndex
+
+
+@dataclass
+class SyncUpdate:
+    """Datos consultados por DeltaSync.fetch(), pendientes de aplicar."""
+    
+    full: bool  # True: resultado completo; False: filas cambiadas
+    data: Any  # ResultSet (o lista vacía si falló) o lista de cambios
+    version: Optional[int] = None  # Versión del resultado completo
+    node: Optional[str] = None  # Nodo del que se leyó el resultado completo
+    from_snapshot: bool = False  # True: leído de la copia local, falta consultar los nodos
+    # Preparado por DeltaSync.prepare(): filas por clave e índices ya construidos
+    rows: Optional[Dict[tuple, tuple]] = None
+    indexes: Optional[List[TrigramIndex]] = None
+
+
+class DeltaSync:
+    """Copia en memoria de una consulta, actualizada con sus cambios."""
+    
+    def __init__(self, key_columns: Sequence[str],
+                 load_full: Callable[[str, bool], Any],
+                 load_changes: Callable[[str, int], Optional[List[Dict[str, Any]]]],
+                 current_version: Callable[[str], Optional[int]],
+                 choose_node: Callable[[], str]):
+        """
+        Inicializa la sincronización sin datos.
+        
+        Args:
+            key_columns: Columnas que identifican una fila.
+            load_full: Función que recibe el nodo y si puede usarse la caché
+                      de consultas, y devuelve el ResultSet completo (o una
+                      lista vacía si la consulta falló). La caché solo se
+                      permite si no hay versión de cambios: un resultado
+                      guardado antes de la versión perdería los cambios
+                      intermedios.
+            load_changes: Función que recibe el nodo y la última versión
+                         aplicada y devuelve las filas modificadas desde
+                         entonces, o None si no pudo (se vuelve a cargar todo).
+            current_version: Función que devuelve la versión actual del
+                            registro de cambios del nodo (o None si no la hay).
+            choose_node: Función que elige el nodo de cada carga completa
+                        (ej: la réplica más rápida según ReadRouter).
+        """
+        self.key_columns = tuple(key_columns)
+        self._load_full = load_full
+        self._load_changes = load_changes
+        self._current_version = current_version
+        self._choose_node = choose_node
+        self.version: Optional[int] = None
+        self.node: Optional[str] = None
+        self.columns: List[str] = []
+        # clave -> valores de la fila, en el orden en que se cargaron
+        self._rows: Dict[tuple, tuple] = {}
+        self._result: Optional[ResultSet] = None
+        self.loaded = False
+        # Índices de búsqueda que se mantienen al día con cada cambio
+        self._indexes: List[TrigramIndex] = []
+    
+    @staticmethod
+    def _key(values: Iterable[Any]) -> tuple:
+        """Clave normalizada (las fechas llegan como date o como texto ISO)."""
+        return tuple(str(value) for value in values)
+    
+    @property
+    def checkpoint(self) -> Optional[Tuple[str, int]]:
+        """
+        Nodo y versión hasta donde están aplicados los datos, o None si la
+        próxima actualización debe ser completa. Se lee en el hilo de los
+        datos y se pasa a fetch(), que puede ejecutarse en otro hilo.
+        """
+        if not self.loaded or self.version is None or self.node is None:
+            return None
+        return self.node, self.version
+    
+    @property
+    def result(self) -> ResultSet:
+        """Datos actuales como ResultSet."""
+        if self._result is None:
+            self._result = ResultSet(self.columns, list(self._rows.values()))
+        return self._result
+    
+    def attach(self, index: TrigramIndex):
+        """
+        Mantiene un índice de búsqueda con los datos actuales y sus cambios.
+        
+        Args:
+            index: Índice sobre las mismas filas; sus claves son las de subset().
+        """
+        self._indexes.append(index)
+        if self.loaded:
+            index.reset(self.columns, self._rows)
+    
+    def subset(self, keys: Iterable[tuple]) -> ResultSet:
+        """
+        Filas de unas claves (por ejemplo, las que devuelve un índice), en
+        el orden de las claves.
+        
+        Args:
+            keys: Claves normalizadas de las filas.
+        """
+        rows = self._rows
+        return ResultSet(self.columns, [rows[key] for key in sorted(keys) if key in rows])
+    
+    def _keyed(self, result: ResultSet) -> Dict[tuple, tuple]:
+        """Filas de un resultado completo por su clave normalizada."""
+        positions = [result.columns.index(column) for column in self.key_columns]
+        return {
+            self._key(values[position] for position in positions): values
+            for values in result.rows
+        }
+    
+    def prepare(self, update: SyncUpdate) -> SyncUpdate:
+        """
+        Prepara una carga completa para que apply() solo tenga que adoptarla:
+        agrupa las filas por clave y construye los índices de búsqueda. No
+        modifica los datos actuales, así que puede ejecutarse en otro hilo.
+        
+        Args:
+            update: Datos consultados (los cambios se devuelven sin tocar).
+        
+        Returns:
+            El mismo update, con rows e indexes.
+        """
+        if update.full and isinstance(update.data, ResultSet) and update.rows is None:
+            update.rows = self._keyed(update.data)
+            update.indexes = []
+            for index in self._indexes:
+                built = TrigramIndex(index.columns)
+                built.reset(update.data.columns, update.rows)
+                update.indexes.append(built)
+        return update
+    
+    def seed(self, result: ResultSet, version: Optional[int],
+             rows: Optional[Dict[tuple, tuple]] = None,
+             indexes: Optional[List[TrigramIndex]] = None,
+             node: Optional[str] = None):
+        """
+        Carga un resultado previo, por ejemplo la copia local de la última sesión.
+        
+        Args:
+            result: Resultado completo.
+            version: Versión del registro de cambios a la que corresponde.
+                    Si es None, la próxima actualización será completa.
+            rows: Filas por clave ya preparadas (ver prepare()).
+            indexes: Índices ya construidos, en el orden de attach(); sin
+                    ellos los índices se construyen aquí, en este hilo.
+            node: Nodo del que se leyó el resultado; los cambios se piden a
+                 ese mismo nodo. Si es None, la próxima actualización será
+                 completa.
+        """
+        self.columns = list(result.columns)
+        self._rows = self._keyed(result) if rows is None else rows
+        self._result = result
+        self.version = version
+        self.node = node
+        self.loaded = True
+        if indexes is not None and len(indexes) == len(self._indexes):
+            for index, built in zip(self._indexes, indexes):
+                index.take(built)
+        else:
+            for index in self._indexes:
+                index.reset(self.columns, self._rows)
+    
+    def fetch(self, checkpoint: Optional[Tuple[str, int]] = None) -> SyncUpdate:
+        """
+        Consulta lo necesario para actualizar, sin modificar los datos: solo
+        los cambios desde checkpoint o, si no hay o no se pudieron pedir, el
+        resultado completo de un nodo recién elegido, ya preparado con
+        prepare().
+        
+        Args:
+            checkpoint: Valor de la propiedad checkpoint leído en el hilo de
+                       los datos antes de lanzar la consulta.
+        
+        Returns:
+            Datos consultados, para pasarlos a apply().
+        """
+        if checkpoint is not None:
+            node, version = checkpoint
+            changes = self._load_changes(node, version)
+            if changes is not None:
+                return SyncUpdate(False, changes, node=node)
+        node = self._choose_node()
+        # La versión se toma antes de la carga: lo que cambie mientras
+        # tanto se vuelve a pedir en la siguiente actualización
+        version = self._current_version(node)
+        result = self._load_full(node, version is None)
+        return self.prepare(SyncUpdate(True, result, version, node=node))
+    
+    def apply(self, update: SyncUpdate) -> bool:
+        """
+        Aplica los datos consultados por fetch().
+        
+        Args:
+            update: Resultado de fetch().
+        
+        Returns:
+            True si los datos cambiaron, False si no hubo cambios o la
+            consulta falló (en ese caso se conservan los datos anteriores).
+        """
+        if update.full:
+            result = update.data
+            if not isinstance(result, ResultSet):
+                return False
+            changed = not self.loaded or result.rows != self.result.rows
+            self.seed(result, update.version, update.rows, update.indexes, update.node)
+            return changed
+        
+        if update.node != self.node:
+            # Cambios de otro nodo (los datos se recargaron mientras tanto)
+            return False
+        changed = False
+        for change in update.data:
+            key = self._key(change[column] for column in self.key_columns)
+            if change['operacion'] == 'D':
+                if self._rows.pop(key, None) is not None:
+                    changed = True
+                    for index in self._indexes:
+                        index.remove(key)
+            else:
+                values = tuple(change[column] for column in self.columns)
+                if self._rows.get(key) != values:
+                    changed = True
+                    self._rows[key] = values
+                    for index in self._indexes:
+                        index.add(key, values)
+            self.version = max(self.version, change['version_cambio'])
+        if changed:
+            self._result = None
+        return changed
+    
+    def refresh(self) -> bool:
+        """
+        Actualiza los datos: completos la primera vez, luego solo los cambios.
+        
+        Returns:
+            True si los datos cambiaron, False si no hubo cambios o la
+            consulta falló (en ese caso se conservan los datos anteriores).
+        """
+        return self.apply(self.fetch(self.checkpoint))
+    
+    def reload(self) -> bool:
+        """
+        Descarta los datos y vuelve a cargar la consulta completa.
+        
+        Returns:
+            True si los datos cambiaron, False si son iguales o la consulta falló.
+        """
+        return self.apply(self.fetch())
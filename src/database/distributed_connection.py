@@ -1,13 +1,24 @@
 """
 Gestión de conexiones distribuidas a SQL Server.
-Maneja conexiones a múltiples nodos (FIS y FIQA).
+Maneja conexiones a múltiples nodos (FIS y FIQA), cada uno con su propio
+pool de conexiones para poder trabajar desde varios hilos.
 """
-import pyodbc
-from typing import Optional, List, Any, Dict
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, List, Any, Dict, Callable, Iterable, Iterator, Union, Sequence, Set, Tuple
 from contextlib import contextmanager
 
 from config.database import DistributedDatabaseConfig, DatabaseConfig
-from database.connection import DatabaseConnection
+from database.circuit_breaker import CircuitBreaker, CircuitState
+from database.connection import DatabaseConnection, DEFAULT_BATCH_SIZE, pyodbc
+from database.fan_out import FanOutResult, NodeResult, build_exec_statement
+from database.instrumentation import statement_name
+from database.pool import ConnectionPool
+from database.query_cache import QueryCache, read_table, written_table
+from database.read_router import ReadRouter
+from database.unit_of_work import UnitOfWork
+from database.result_set import ResultSet
 
 
 class DistributedConnection:
@@ -22,13 +33,43 @@ class DistributedConnection:
                    Si es None, se carga desde variables de entorno.
         """
         self.config = config or DistributedDatabaseConfig.from_env()
-        self._connections: Dict[str, DatabaseConnection] = {}
+        self._pools: Dict[str, ConnectionPool] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        # Transacciones abiertas por cada hilo: nodo -> UnitOfWork
+        self._local = threading.local()
+        # Resultados de sp_Consultar_*, compartidos por todos los gestores SP_*
+        self.query_cache = QueryCache(self.config.cache)
+        # Fachada asyncio (AsyncDistributedConnection), creada al pedirla con
+        # AsyncDistributedConnection.for_connection()
+        self.async_conn = None
+        # Procedimientos opcionales que no existen en los nodos (ver SP_Base.has_procedure)
+        self.missing_procedures: Set[str] = set()
         self._initialize_connections()
+        self.read_router = ReadRouter(
+            self._pools, self.config.router,
+            is_available=lambda node: self._breakers[node].state is CircuitState.CLOSED
+        )
     
     def _initialize_connections(self):
-        """Inicializa las conexiones para cada nodo."""
+        """Inicializa el pool de conexiones y el interruptor de circuito de cada nodo."""
         for node_name, node_config in self.config.get_all_nodes().items():
-            self._connections[node_name] = DatabaseConnection(node_config)
+            pool = ConnectionPool(node_config, self.config.pool, name=node_name)
+            self._pools[node_name] = pool
+            self._breakers[node_name] = CircuitBreaker(
+                self.config.breaker, probe=pool.warm, name=node_name
+            )
+    
+    @staticmethod
+    def _is_connection_failure(error: Exception) -> bool:
+        """Indica si un error se debe a que el nodo no responde (y no a la consulta)."""
+        if isinstance(error, ConnectionError):
+            return True
+        # SQLSTATE clase 08: errores de comunicación con el servidor
+        if pyodbc is None or not isinstance(error, pyodbc.Error):
+            return False
+        return bool(error.args) and str(error.args[0]).startswith("08")
     
     def connect_node(self, node_name: str) -> bool:
         """
@@ -41,11 +82,19 @@ class DistributedConnection:
             True si la conexión fue exitosa, False en caso contrario.
         """
         node_name = node_name.upper()
-        if node_name not in self._connections:
+        if node_name not in self._pools:
             print(f"Nodo '{node_name}' no encontrado en la configuración")
             return False
         
-        return self._connections[node_name].connect()
+        pool = self._pools[node_name]
+        if pool.closed:
+            pool.reopen()
+        connected = pool.warm()
+        if connected:
+            self._breakers[node_name].record_success()
+        else:
+            self._breakers[node_name].record_failure()
+        return connected
     
     def connect_all(self) -> Dict[str, bool]:
         """
@@ -54,35 +103,214 @@ class DistributedConnection:
         Returns:
             Diccionario con el estado de conexión de cada nodo.
         """
-        results = {}
-        for node_name in self._connections.keys():
-            results[node_name] = self.connect_node(node_name)
-        return results
+        return self._run_on_nodes(self.connect_node, self._pools.keys())
     
     def disconnect_node(self, node_name: str):
         """Desconecta de un nodo específico."""
         node_name = node_name.upper()
-        if node_name in self._connections:
-            self._connections[node_name].disconnect()
+        if node_name in self._pools:
+            self._pools[node_name].close()
     
     def disconnect_all(self):
         """Desconecta de todos los nodos."""
-        for connection in self._connections.values():
-            connection.disconnect()
+        for pool in self._pools.values():
+            pool.close()
+        for breaker in self._breakers.values():
+            breaker.reset()
+        self.query_cache.clear()
+        self.missing_procedures.clear()
+        if self.async_conn is not None:
+            self.async_conn.close()
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
     
-    def get_connection(self, node_name: str) -> Optional[DatabaseConnection]:
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Obtiene (o crea) el pool de hilos usado para consultar nodos en paralelo."""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=len(self._pools) * self.config.pool.max_size,
+                    thread_name_prefix="nodo"
+                )
+            return self._executor
+    
+    def _run_on_nodes(self, func: Callable[[str], Any],
+                      nodes: Iterable[str]) -> Dict[str, Any]:
         """
-        Obtiene la conexión a un nodo específico.
+        Ejecuta func(nodo) en paralelo para cada nodo y espera todos los resultados.
+        
+        Args:
+            func: Función que recibe el nombre del nodo.
+            nodes: Nombres de los nodos.
+        
+        Returns:
+            Diccionario nodo -> valor devuelto por func.
+        """
+        nodes = [node.upper() for node in nodes]
+        if len(nodes) == 1:
+            return {nodes[0]: func(nodes[0])}
+        
+        executor = self._get_executor()
+        futures = {node: executor.submit(func, node) for node in nodes}
+        return {node: future.result() for node, future in futures.items()}
+    
+    def get_pool(self, node_name: str) -> Optional[ConnectionPool]:
+        """
+        Obtiene el pool de conexiones de un nodo específico.
         
         Args:
             node_name: Nombre del nodo (FIS o FIQA).
             
         Returns:
-            Objeto DatabaseConnection o None si no existe.
+            Objeto ConnectionPool o None si no existe.
+        """
+        return self._pools.get(node_name.upper())
+    
+    def _transactions(self) -> Dict[str, UnitOfWork]:
+        """Transacciones abiertas por el hilo actual."""
+        transactions = getattr(self._local, "transactions", None)
+        if transactions is None:
+            transactions = self._local.transactions = {}
+        return transactions
+    
+    def in_transaction(self, node_name: Optional[str] = None) -> bool:
+        """
+        Indica si el hilo actual tiene una transacción abierta.
+        
+        Args:
+            node_name: Nodo a revisar. Si es None, cualquier nodo.
+        """
+        transactions = self._transactions()
+        if node_name is None:
+            return bool(transactions)
+        return node_name.upper() in transactions
+    
+    def _after_write(self, node_name: str, query: str):
+        """
+        Tras una escritura exitosa, descarta de la caché los resultados de la
+        tabla que modifica y fija en el nodo escrito las lecturas siguientes
+        de esa tabla (ReadRouter.pin).
+        
+        Dentro de una transacción la tabla se descarta de nuevo y se fija
+        solo al confirmarla, por si otro hilo leyó los datos anteriores
+        mientras estaba abierta y porque aún puede revertirse.
+        """
+        table = written_table(statement_name(query))
+        if table is None:
+            return
+        self.query_cache.invalidate(table)
+        unit = self._transactions().get(node_name.upper())
+        if unit is not None:
+            unit.written_tables.add(table)
+        else:
+            self.read_router.pin(node_name, table)
+    
+    @contextmanager
+    def transaction(self, node_name: str):
+        """
+        Agrupa todas las operaciones del bloque with en una sola transacción del nodo.
+        
+        Mientras el bloque está abierto, cualquier llamada del mismo hilo a
+        ese nodo (incluidos los métodos SP_*) usa la misma conexión y no
+        confirma por separado. Al salir se confirma todo junto; si alguna
+        operación falló, aunque el llamador haya capturado el error, se
+        revierte todo y se relanza ese error. Un bloque anidado en el mismo
+        nodo se une a la transacción exterior.
+        
+        Args:
+            node_name: Nombre del nodo (FIS o FIQA).
+        
+        Yields:
+            UnitOfWork con execute_query y execute_non_query propios.
+        """
+        node_name = node_name.upper()
+        transactions = self._transactions()
+        current = transactions.get(node_name)
+        if current is not None:
+            yield current
+            return
+        
+        with self.connection(node_name) as connection:
+            unit = UnitOfWork(node_name, connection)
+            connection.begin()
+            transactions[node_name] = unit
+            try:
+                yield unit
+            except BaseException:
+                connection.rollback()
+                raise
+            finally:
+                del transactions[node_name]
+            if unit.failed:
+                connection.rollback()
+                raise unit.error
+            connection.commit()
+            for table in unit.written_tables:
+                self.query_cache.invalidate(table)
+                self.read_router.pin(node_name, table)
+    
+    @contextmanager
+    def connection(self, node_name: str):
+        """
+        Presta una conexión del pool del nodo durante el bloque with.
+        
+        Si el hilo tiene una transacción abierta en el nodo, se entrega
+        la conexión de esa transacción.
+        
+        Args:
+            node_name: Nombre del nodo (FIS o FIQA).
+        
+        Yields:
+            Objeto DatabaseConnection de uso exclusivo del hilo actual.
         """
-        return self._connections.get(node_name.upper())
+        unit = self._transactions().get(node_name.upper())
+        if unit is not None:
+            try:
+                yield unit.connection
+            except Exception as e:
+                unit.record_error(e)
+                raise
+            return
+        
+        pool = self.get_pool(node_name)
+        if not pool:
+            raise ValueError(f"Nodo '{node_name}' no encontrado")
+        
+        # Con el circuito abierto se falla de inmediato, sin esperar al login
+        breaker = self._breakers[node_name.upper()]
+        if not breaker.allow_request():
+            raise ConnectionError(
+                f"Nodo '{node_name}' no disponible; "
+                f"reintento de conexión en {breaker.retry_in():.1f}s"
+            )
+        
+        if pool.closed:
+            pool.reopen()
+        
+        # Solo cuenta como éxito si se obtuvo una conexión: esperar sin
+        # conexiones libres (TimeoutError) indica un nodo saturado, no sano
+        reached = False
+        error: Optional[Exception] = None
+        try:
+            with pool.connection() as connection:
+                reached = True
+                yield connection
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if error is not None and self._is_connection_failure(error):
+                breaker.record_failure()
+            elif reached:
+                breaker.record_success()
+            else:
+                breaker.record_skipped()
     
-    def execute_query(self, node_name: str, query: str, params: tuple = ()) -> List[Dict[str, Any]]:
+    def execute_query(self, node_name: str, query: str, params: tuple = (),
+                      as_result_set: bool = False,
+                      timeout: Optional[int] = None) -> Union[List[Dict[str, Any]], ResultSet]:
         """
         Ejecuta una consulta SELECT en un nodo específico.
         
@@ -90,21 +318,165 @@ class DistributedConnection:
             node_name: Nombre del nodo donde ejecutar la consulta.
             query: Consulta SQL a ejecutar.
             params: Parámetros para la consulta.
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            timeout: Segundos máximos de la consulta. Si es None, se usa
+                    query_timeout del nodo.
         
         Returns:
-            Lista de diccionarios con los resultados.
+            Lista de diccionarios o ResultSet con los resultados.
         """
-        connection = self.get_connection(node_name)
-        if not connection:
-            raise ValueError(f"Nodo '{node_name}' no encontrado")
+        with self.connection(node_name) as connection:
+            return connection.execute_query(query, params, as_result_set, timeout)
+    
+    def _routed_query(self, node_name: str, query: str, params: tuple,
+                      as_result_set: bool,
+                      timeout: Optional[int]) -> Union[List[Dict[str, Any]], ResultSet]:
+        """Igual que execute_query, registrando carga y latencia en read_router."""
+        with self.read_router.track(node_name), self.connection(node_name) as connection:
+            with self.read_router.measure(node_name):
+                return connection.execute_query(query, params, as_result_set, timeout)
+    
+    def execute_read(self, query: str, params: tuple = (),
+                     nodes: Optional[Iterable[str]] = None,
+                     as_result_set: bool = False,
+                     timeout: Optional[int] = None,
+                     table: Optional[str] = None) -> Union[List[Dict[str, Any]], ResultSet]:
+        """
+        Ejecuta una lectura de datos replicados en el nodo que se espera responda antes.
+        
+        El nodo se elige con read_router según la latencia observada y la
+        carga actual; justo después de una escritura propia en la tabla se
+        lee del nodo escrito. Si el nodo elegido no responde, se reintenta en
+        la siguiente réplica.
         
-        if not connection.is_connected():
-            if not connection.connect():
-                raise ConnectionError(f"No se pudo conectar al nodo '{node_name}'")
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            nodes: Nodos que tienen una copia completa de los datos. Si es
+                  None, se usan todos.
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            timeout: Segundos máximos de la consulta.
+            table: Tabla que se lee. Si es None, se deduce de un
+                  sp_Consultar_* (ver query_cache.read_table).
         
-        return connection.execute_query(query, params)
+        Returns:
+            Lista de diccionarios o ResultSet con los resultados.
+        """
+        candidates = [node.upper() for node in (nodes or self._pools)]
+        table = table or read_table(statement_name(query))
+        tried: List[str] = []
+        while True:
+            node_name = self.read_router.choose(candidates, exclude=tried, table=table)
+            try:
+                return self._routed_query(node_name, query, params, as_result_set, timeout)
+            except Exception as e:
+                tried.append(node_name)
+                if not self._is_connection_failure(e) or len(tried) == len(candidates):
+                    raise
+    
+    def execute_hedged(self, query: str, params: tuple = (),
+                       nodes: Optional[Iterable[str]] = None,
+                       as_result_set: bool = False,
+                       timeout: Optional[int] = None,
+                       delay: Optional[float] = None,
+                       table: Optional[str] = None) -> Union[List[Dict[str, Any]], ResultSet]:
+        """
+        Ejecuta una lectura replicada con una copia de respaldo en otra réplica.
+        
+        La lectura se envía al nodo elegido por read_router. Si no responde
+        dentro de delay, se envía la misma lectura a la siguiente réplica y se
+        usa la primera respuesta; la consulta que pierde se cancela. Pensado
+        para consultas cortas (un solo registro), donde duplicar es barato.
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            nodes: Nodos que tienen una copia completa de los datos. Si es
+                  None, se usan todos.
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            timeout: Segundos máximos de la consulta en cada nodo.
+            delay: Segundos de espera antes de duplicar. Si es None, se usa
+                  el percentil de latencia del nodo (ReadRouter.hedge_delay).
+            table: Tabla que se lee. Si es None, se deduce de un
+                  sp_Consultar_* (ver query_cache.read_table).
+        
+        Returns:
+            Lista de diccionarios o ResultSet con los resultados.
+        """
+        candidates = [node.upper() for node in (nodes or self._pools)]
+        table = table or read_table(statement_name(query))
+        primary = self.read_router.choose(candidates, table=table)
+        if len(candidates) == 1 or self.read_router.pinned(candidates, table) is not None:
+            # Tras una escritura propia no se duplica en una réplica que puede ir atrasada
+            return self._routed_query(primary, query, params, as_result_set, timeout)
+        secondary = self.read_router.choose(candidates, exclude=[primary], table=table)
+        if delay is None:
+            delay = self.read_router.hedge_delay(primary)
+        
+        finished = threading.Event()
+        active: Dict[str, DatabaseConnection] = {}
+        active_lock = threading.Lock()
+        
+        def attempt(node_name: str):
+            with self.read_router.track(node_name), self.connection(node_name) as connection:
+                with active_lock:
+                    if finished.is_set():
+                        raise RuntimeError("Lectura descartada: otra réplica ya respondió")
+                    active[node_name] = connection
+                try:
+                    with self.read_router.measure(node_name):
+                        return connection.execute_query(query, params, as_result_set, timeout)
+                finally:
+                    with active_lock:
+                        active.pop(node_name, None)
+        
+        executor = self._get_executor()
+        futures = {executor.submit(attempt, primary): primary}
+        done, _ = wait(futures, timeout=delay)
+        if not done or next(iter(done)).exception() is not None:
+            # Respuesta lenta (o fallida): se duplica en la otra réplica
+            futures[executor.submit(attempt, secondary)] = secondary
+        
+        pending = set(futures)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    with active_lock:
+                        finished.set()
+                        losers = list(active.values())
+                    for connection in losers:
+                        connection.cancel()
+                    return future.result()
+                error = error or future.exception()
+        raise error
+    
+    def iter_query(self, node_name: str, query: str, params: tuple = (),
+                   batch_size: int = DEFAULT_BATCH_SIZE,
+                   timeout: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Ejecuta una consulta SELECT en un nodo y entrega las filas por lotes.
+        
+        La conexión queda prestada hasta agotar o cerrar el generador, por
+        lo que conviene consumirlo completo o usar contextlib.closing().
+        
+        Args:
+            node_name: Nombre del nodo donde ejecutar la consulta.
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            batch_size: Número de filas pedidas al servidor por lote.
+            timeout: Segundos máximos de cada llamada al servidor. Si es None,
+                    se usa query_timeout del nodo.
+        
+        Yields:
+            Un diccionario por fila.
+        """
+        with self.connection(node_name) as connection:
+            yield from connection.iter_query(query, params, batch_size, timeout)
     
-    def execute_non_query(self, node_name: str, query: str, params: tuple = ()) -> int:
+    def execute_non_query(self, node_name: str, query: str, params: tuple = (),
+                          timeout: Optional[int] = None) -> int:
         """
         Ejecuta una consulta INSERT, UPDATE o DELETE en un nodo específico.
         
@@ -112,31 +484,100 @@ class DistributedConnection:
             node_name: Nombre del nodo donde ejecutar la consulta.
             query: Consulta SQL a ejecutar.
             params: Parámetros para la consulta.
+            timeout: Segundos máximos de la consulta. Si es None, se usa
+                    query_timeout del nodo.
         
         Returns:
             Número de filas afectadas.
         """
-        connection = self.get_connection(node_name)
-        if not connection:
-            raise ValueError(f"Nodo '{node_name}' no encontrado")
+        with self.connection(node_name) as connection:
+            affected = connection.execute_non_query(query, params, timeout)
+        self._after_write(node_name, query)
+        return affected
+    
+    def execute_batch(self, node_name: str, query: str, param_rows: Sequence[tuple],
+                      timeout: Optional[int] = None) -> List[Tuple[bool, str]]:
+        """
+        Ejecuta la misma sentencia para muchas filas en un nodo, en una sola transacción.
         
-        if not connection.is_connected():
-            if not connection.connect():
-                raise ConnectionError(f"No se pudo conectar al nodo '{node_name}'")
+        Args:
+            node_name: Nombre del nodo donde ejecutar.
+            query: Sentencia SQL a ejecutar.
+            param_rows: Parámetros de cada fila.
+            timeout: Segundos máximos de cada llamada al servidor. Si es None,
+                    se usa query_timeout del nodo.
         
-        return connection.execute_non_query(query, params)
+        Returns:
+            Lista (éxito, mensaje de error) por fila, en el mismo orden.
+        """
+        with self.connection(node_name) as connection:
+            outcomes = connection.execute_batch(query, param_rows, timeout)
+        if any(ok for ok, _ in outcomes):
+            self._after_write(node_name, query)
+        return outcomes
+    
+    def execute_query_all(self, query: str, params: tuple = (),
+                          nodes: Optional[Iterable[str]] = None,
+                          timeout: Optional[int] = None) -> FanOutResult:
+        """
+        Ejecuta la misma consulta SELECT en varios nodos al mismo tiempo.
+        
+        El tiempo total es el del nodo más lento, no la suma de todos. Un nodo
+        que falla no interrumpe a los demás: su error queda en el resultado.
+        
+        Args:
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            nodes: Nodos donde ejecutar. Si es None, se usan todos.
+            timeout: Segundos máximos de la consulta en cada nodo.
+        
+        Returns:
+            FanOutResult con filas, error y tiempo de cada nodo. Usar
+            merged() para obtener la unión de las filas.
+        """
+        def run(node_name: str) -> NodeResult:
+            start = time.perf_counter()
+            try:
+                rows = self.execute_query(node_name, query, params, timeout=timeout)
+                return NodeResult(node_name, rows, elapsed=time.perf_counter() - start)
+            except Exception as e:
+                return NodeResult(node_name, error=e, elapsed=time.perf_counter() - start)
+        
+        start = time.perf_counter()
+        results = self._run_on_nodes(run, nodes or self._pools.keys())
+        return FanOutResult(results, elapsed=time.perf_counter() - start)
+    
+    def execute_procedure_all(self, procedure: str,
+                              params: Optional[Dict[str, Any]] = None,
+                              nodes: Optional[Iterable[str]] = None,
+                              timeout: Optional[int] = None) -> FanOutResult:
+        """
+        Ejecuta el mismo procedimiento almacenado en varios nodos al mismo tiempo.
+        
+        Args:
+            procedure: Nombre del procedimiento (ej: 'sp_Consultar_Libro').
+            params: Parámetros nombrados del procedimiento, sin '@'.
+            nodes: Nodos donde ejecutar. Si es None, se usan todos.
+            timeout: Segundos máximos de la consulta en cada nodo.
+        
+        Returns:
+            FanOutResult con filas, error y tiempo de cada nodo.
+        """
+        params = params or {}
+        query = build_exec_statement(procedure, params.keys())
+        return self.execute_query_all(query, tuple(params.values()), nodes, timeout)
     
     def test_all_connections(self) -> Dict[str, tuple[bool, str]]:
         """
-        Prueba la conexión a todos los nodos.
+        Prueba la conexión a todos los nodos en paralelo.
         
         Returns:
             Diccionario con el resultado de la prueba para cada nodo.
         """
-        results = {}
-        for node_name, connection in self._connections.items():
-            results[node_name] = connection.test_connection()
-        return results
+        def test(node_name: str) -> tuple[bool, str]:
+            return DatabaseConnection(self.config.get_node_config(node_name)).test_connection()
+        
+        return self._run_on_nodes(test, self._pools.keys())
     
     def get_node_info(self, node_name: str) -> Optional[Dict[str, str]]:
         """
@@ -152,12 +593,16 @@ class DistributedConnection:
         if not node_config:
             return None
         
+        circuit = self._breakers[node_name.upper()].snapshot()
         return {
             'name': node_name.upper(),
             'server': node_config.server,
             'database': node_config.database,
             'port': str(node_config.port),
-            'is_primary': node_name.upper() == self.config.primary_node
+            'is_primary': node_name.upper() == self.config.primary_node,
+            'circuit_state': circuit['state'],
+            'circuit_failures': str(circuit['failures']),
+            'circuit_retry_in': str(circuit['retry_in'])
         }
     
     def get_all_nodes_info(self) -> List[Dict[str, str]]:
@@ -169,5 +614,5 @@ class DistributedConnection:
         """
         return [
             self.get_node_info(node_name) 
-            for node_name in self._connections.keys()
+            for node_name in self._pools.keys()
         ]
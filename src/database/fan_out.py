@@ -0,0 +1,88 @@
+"""
+Resultados de consultas ejecutadas en paralelo sobre varios nodos.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+
+def build_exec_statement(procedure: str, param_names: Iterable[str]) -> str:
+    """
+    Construye la sentencia EXEC de un procedimiento almacenado con parámetros nombrados.
+    
+    Args:
+        procedure: Nombre del procedimiento (ej: 'sp_Consultar_Libro').
+        param_names: Nombres de los parámetros, sin '@'.
+    
+    Returns:
+        Sentencia del tipo "EXEC sp_X @a=?, @b=?".
+    """
+    assignments = ", ".join(f"@{name}=?" for name in param_names)
+    return f"EXEC {procedure} {assignments}" if assignments else f"EXEC {procedure}"
+
+
+@dataclass
+class NodeResult:
+    """Resultado de una consulta en un nodo."""
+    
+    node: str
+    rows: List[Dict[str, Any]] = field(default_factory=list)
+    error: Optional[Exception] = None
+    elapsed: float = 0.0  # Segundos
+    
+    @property
+    def ok(self) -> bool:
+        """Indica si la consulta terminó sin errores."""
+        return self.error is None
+
+
+@dataclass
+class FanOutResult:
+    """Resultados de una misma consulta ejecutada en varios nodos."""
+    
+    results: Dict[str, NodeResult]
+    elapsed: float = 0.0  # Segundos de pared, el máximo entre nodos
+    
+    def __getitem__(self, node: str) -> NodeResult:
+        return self.results[node.upper()]
+    
+    @property
+    def ok(self) -> bool:
+        """Indica si todos los nodos respondieron sin errores."""
+        return all(result.ok for result in self.results.values())
+    
+    @property
+    def errors(self) -> Dict[str, Exception]:
+        """Errores por nodo, solo de los nodos que fallaron."""
+        return {
+            node: result.error
+            for node, result in self.results.items()
+            if result.error is not None
+        }
+    
+    @property
+    def timings(self) -> Dict[str, float]:
+        """Tiempo de respuesta en segundos de cada nodo."""
+        return {node: result.elapsed for node, result in self.results.items()}
+    
+    def merged(self, distinct: bool = False) -> List[Dict[str, Any]]:
+        """
+        Une las filas de todos los nodos que respondieron.
+        
+        Args:
+            distinct: Si es True, descarta filas repetidas (como UNION);
+                     si es False, conserva todas (como UNION ALL).
+        
+        Returns:
+            Lista de diccionarios con las filas de todos los nodos.
+        """
+        merged = []
+        seen = set()
+        for result in self.results.values():
+            for row in result.rows:
+                if distinct:
+                    key = tuple(row.items())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                merged.append(row)
+        return merged
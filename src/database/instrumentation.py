@@ -0,0 +1,299 @@
+"""
+Instrumentación de consultas.
+Cada consulta ejecutada por DatabaseConnection genera un QueryEvent con su
+nodo, sentencia (nombre del procedimiento almacenado), duración, filas,
+bytes leídos y error. El recolector global 'metrics' agrupa esos eventos en
+histogramas de latencia por nodo y sentencia, registra las consultas lentas
+(también en el logger de este módulo) y reenvía cada evento a los oyentes
+que se hayan suscrito.
+"""
+import bisect
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Límites superiores de los intervalos del histograma, en milisegundos
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000)
+# Filas de cada lote que se miden para estimar los bytes leídos
+BYTES_SAMPLE_ROWS = 8
+
+logger = logging.getLogger(__name__)
+
+_EXEC = re.compile(r"^\s*EXEC(?:UTE)?\s+([\w.\[\]]+)", re.IGNORECASE)
+_FROM = re.compile(r"\bFROM\s+([\w.\[\]]+)", re.IGNORECASE)
+
+
+def statement_name(query: str) -> str:
+    """
+    Obtiene un nombre corto y estable para agrupar una consulta.
+    
+    Args:
+        query: Sentencia SQL.
+    
+    Returns:
+        El procedimiento de un EXEC (ej: 'sp_Consultar_Libro'), o el verbo
+        y la tabla o vista de una consulta directa (ej: 'SELECT v_Prestamo').
+    """
+    match = _EXEC.match(query)
+    if match:
+        return match.group(1)
+    words = query.split()
+    if not words:
+        return ""
+    verb = words[0].upper()
+    match = _FROM.search(query)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def estimate_row_bytes(values: Iterable[Any]) -> int:
+    """Estima los bytes de una fila: longitud de textos y binarios, 8 por el resto."""
+    size = 0
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, (str, bytes, bytearray)):
+            size += len(value)
+        else:
+            size += 8
+    return size
+
+
+def estimate_batch_bytes(rows: Sequence[Sequence[Any]]) -> int:
+    """
+    Estima los bytes de un lote de filas a partir de una muestra, para que
+    medir no cueste recorrer cada celda del resultado.
+    
+    Args:
+        rows: Filas leídas en un lote.
+    
+    Returns:
+        Tamaño medio de hasta BYTES_SAMPLE_ROWS filas repartidas en el lote,
+        multiplicado por el número de filas.
+    """
+    if not rows:
+        return 0
+    step = max(1, len(rows) // BYTES_SAMPLE_ROWS)
+    sample = rows[::step][:BYTES_SAMPLE_ROWS]
+    return sum(estimate_row_bytes(row) for row in sample) * len(rows) // len(sample)
+
+
+@dataclass
+class QueryEvent:
+    """Una consulta ejecutada en un nodo."""
+    
+    node: str
+    statement: str
+    elapsed: float = 0.0    # Segundos
+    rows: int = 0           # Filas leídas o afectadas
+    bytes: int = 0          # Bytes leídos (estimados)
+    error: Optional[str] = None
+    
+    @property
+    def ok(self) -> bool:
+        """Indica si la consulta terminó sin errores."""
+        return self.error is None
+
+
+class LatencyHistogram:
+    """Histograma de latencias con intervalos fijos en milisegundos."""
+    
+    __slots__ = ("counts", "count", "total", "max")
+    
+    def __init__(self):
+        # Un contador por intervalo más uno para lo que supere el último límite
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds: float):
+        """Agrega una muestra en segundos."""
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, seconds * 1000)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+    
+    def percentile(self, fraction: float) -> float:
+        """
+        Percentil aproximado en segundos (límite superior de su intervalo).
+        
+        Args:
+            fraction: Percentil entre 0 y 1 (ej: 0.95).
+        """
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                if position == len(LATENCY_BUCKETS_MS):
+                    return self.max
+                return min(LATENCY_BUCKETS_MS[position] / 1000, self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        """Latencia media en segundos."""
+        return self.total / self.count if self.count else 0.0
+
+
+class StatementStats:
+    """Métricas acumuladas de una sentencia en un nodo."""
+    
+    __slots__ = ("latency", "errors", "rows", "bytes")
+    
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Resumen con tiempos en milisegundos."""
+        return {
+            'calls': self.latency.count,
+            'errors': self.errors,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'mean_ms': round(self.latency.mean * 1000, 1),
+            'p50_ms': round(self.latency.percentile(0.50) * 1000, 1),
+            'p95_ms': round(self.latency.percentile(0.95) * 1000, 1),
+            'p99_ms': round(self.latency.percentile(0.99) * 1000, 1),
+            'max_ms': round(self.latency.max * 1000, 1),
+        }
+
+
+class MetricsCollector:
+    """Recolector de eventos de consulta, seguro para hilos."""
+    
+    def __init__(self, slow_query_threshold: float = 1.0, slow_query_log_size: int = 100):
+        """
+        Inicializa el recolector vacío.
+        
+        Args:
+            slow_query_threshold: Segundos a partir de los cuales una consulta
+                                 se registra como lenta. 0 desactiva el registro.
+            slow_query_log_size: Consultas lentas que se conservan.
+        """
+        self.slow_query_threshold = slow_query_threshold
+        self.enabled = True
+        self.slow_queries: Deque[QueryEvent] = deque(maxlen=slow_query_log_size)
+        self._stats: Dict[Tuple[str, str], StatementStats] = {}
+        self._listeners: List[Callable[[QueryEvent], None]] = []
+        self._lock = threading.Lock()
+    
+    def add_listener(self, listener: Callable[[QueryEvent], None]):
+        """Suscribe una función que recibe cada QueryEvent registrado."""
+        with self._lock:
+            self._listeners.append(listener)
+    
+    def remove_listener(self, listener: Callable[[QueryEvent], None]):
+        """Cancela la suscripción de un oyente."""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+    
+    def record(self, event: QueryEvent):
+        """
+        Registra una consulta terminada.
+        
+        Args:
+            event: Evento con los datos de la consulta.
+        """
+        slow = 0 < self.slow_query_threshold <= event.elapsed
+        with self._lock:
+            stats = self._stats.get((event.node, event.statement))
+            if stats is None:
+                stats = self._stats[(event.node, event.statement)] = StatementStats()
+            stats.latency.record(event.elapsed)
+            stats.rows += event.rows
+            stats.bytes += event.bytes
+            if event.error is not None:
+                stats.errors += 1
+            if slow:
+                self.slow_queries.append(event)
+            listeners = list(self._listeners)
+        
+        if slow:
+            logger.warning("Consulta lenta en %s: %s (%.0f ms, %d filas)",
+                           event.node, event.statement, event.elapsed * 1000, event.rows)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Error en oyente de métricas: {e}")
+    
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        """
+        Métricas acumuladas por nodo y sentencia.
+        
+        Returns:
+            Diccionario nodo -> sentencia -> resumen (ver StatementStats.to_dict).
+        """
+        with self._lock:
+            result: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (node, statement), stats in self._stats.items():
+                result.setdefault(node, {})[statement] = stats.to_dict()
+            return result
+    
+    def slowest(self, limit: int = 10) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Sentencias ordenadas por latencia p95, de mayor a menor.
+        
+        Args:
+            limit: Número máximo de sentencias a devolver.
+        
+        Returns:
+            Lista de (nodo, sentencia, resumen).
+        """
+        rows = [
+            (node, statement, summary)
+            for node, statements in self.snapshot().items()
+            for statement, summary in statements.items()
+        ]
+        rows.sort(key=lambda row: row[2]['p95_ms'], reverse=True)
+        return rows[:limit]
+    
+    def reset(self):
+        """Descarta las métricas y consultas lentas acumuladas."""
+        with self._lock:
+            self._stats.clear()
+            self.slow_queries.clear()
+
+
+class QueryTimer:
+    """Mide una consulta y la registra en el recolector al terminar."""
+    
+    __slots__ = ("collector", "event", "_start")
+    
+    def __init__(self, collector: MetricsCollector, node: str, query: str):
+        self.collector = collector
+        self.event = QueryEvent(node, statement_name(query))
+        self._start = 0.0
+    
+    def add_rows(self, rows: List[tuple]):
+        """Suma un lote de filas leídas y su tamaño estimado por muestra."""
+        self.event.rows += len(rows)
+        self.event.bytes += estimate_batch_bytes(rows)
+    
+    def __enter__(self) -> "QueryTimer":
+        self._start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc, traceback):
+        self.event.elapsed = time.perf_counter() - self._start
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.event.error = str(exc) or exc_type.__name__
+        if self.collector.enabled:
+            self.collector.record(self.event)
+        return False
+
+
+# Recolector usado por defecto por todas las conexiones
+metrics = MetricsCollector()
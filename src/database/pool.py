@@ -0,0 +1,256 @@
+"""
+Pool de conexiones por nodo.
+Mantiene un conjunto acotado de conexiones DatabaseConnection reutilizables
+para que varios hilos puedan trabajar contra el mismo nodo sin compartir
+una única conexión pyodbc.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Optional, Tuple
+
+from config.database import DatabaseConfig, PoolConfig
+from database.connection import DatabaseConnection
+
+
+class ConnectionPool:
+    """Pool acotado y seguro para hilos de conexiones a un nodo."""
+    
+    def __init__(self, config: DatabaseConfig, pool_config: Optional[PoolConfig] = None,
+                 name: Optional[str] = None):
+        """
+        Inicializa el pool sin abrir conexiones.
+        
+        Args:
+            config: Configuración del nodo al que se conecta el pool.
+            pool_config: Límites y tiempos del pool. Si es None, se usan
+                        los valores por defecto.
+            name: Nombre del nodo, usado en los mensajes de error.
+        """
+        self.config = config
+        self.name = name or config.server
+        self.pool_config = pool_config or PoolConfig()
+        # Conexiones libres junto al instante en que se devolvieron
+        self._idle: Deque[Tuple[DatabaseConnection, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+    
+    @property
+    def size(self) -> int:
+        """Número total de conexiones abiertas (libres y prestadas)."""
+        return self._size
+    
+    @property
+    def closed(self) -> bool:
+        """Indica si el pool fue cerrado con close()."""
+        return self._closed
+    
+    @property
+    def idle_count(self) -> int:
+        """Número de conexiones libres en el pool."""
+        return len(self._idle)
+    
+    def _is_expired(self, connection: DatabaseConnection, now: float) -> bool:
+        """Indica si la conexión superó su tiempo máximo de vida."""
+        return now - connection.created_at >= self.pool_config.max_lifetime
+    
+    def _discard(self, connection: DatabaseConnection):
+        """Cierra una conexión y libera su lugar en el pool."""
+        try:
+            connection.disconnect()
+        except Exception as e:
+            print(f"Error al cerrar conexión del pool: {e}")
+        with self._lock:
+            self._size -= 1
+            self._available.notify()
+    
+    def _evict_locked(self, now: float) -> list:
+        """
+        Retira las conexiones ociosas vencidas. Debe llamarse con el lock tomado.
+        
+        Returns:
+            Lista de conexiones que el llamador debe cerrar fuera del lock.
+        """
+        evicted = []
+        # Las conexiones más antiguas quedan al inicio de la cola
+        while self._idle:
+            connection, returned_at = self._idle[0]
+            if (now - returned_at < self.pool_config.idle_timeout
+                    and not self._is_expired(connection, now)):
+                break
+            self._idle.popleft()
+            evicted.append(connection)
+        return evicted
+    
+    def evict_idle(self) -> int:
+        """
+        Cierra las conexiones ociosas que superaron idle_timeout o max_lifetime.
+        
+        Returns:
+            Número de conexiones cerradas.
+        """
+        with self._lock:
+            evicted = self._evict_locked(time.monotonic())
+        for connection in evicted:
+            self._discard(connection)
+        return len(evicted)
+    
+    def checkout(self, timeout: Optional[float] = None) -> DatabaseConnection:
+        """
+        Presta una conexión del pool, abriendo una nueva si hay capacidad.
+        
+        Args:
+            timeout: Segundos máximos de espera por una conexión libre.
+                    Si es None, se usa checkout_timeout de la configuración.
+        
+        Returns:
+            Conexión lista para usar. Debe devolverse con checkin().
+        
+        Raises:
+            ConnectionError: Si el pool está cerrado o no se pudo conectar.
+            TimeoutError: Si no hubo una conexión libre a tiempo.
+        """
+        if timeout is None:
+            timeout = self.pool_config.checkout_timeout
+        deadline = time.monotonic() + timeout
+        
+        while True:
+            connection = None
+            idle_since = 0.0
+            create = False
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise ConnectionError("El pool de conexiones está cerrado")
+                    now = time.monotonic()
+                    evicted = self._evict_locked(now)
+                    if evicted:
+                        break
+                    if self._idle:
+                        # LIFO: la conexión usada más recientemente está más caliente
+                        connection, idle_since = self._idle.pop()
+                        break
+                    if self._size < self.pool_config.max_size:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"Sin conexiones libres en el nodo '{self.name}' "
+                            f"tras {timeout:.1f}s"
+                        )
+                    self._available.wait(remaining)
+            
+            if connection is None and not create:
+                # Se retiraron conexiones vencidas: cerrarlas y reintentar
+                for stale in evicted:
+                    self._discard(stale)
+                continue
+            
+            if create:
+                return self._open()
+            
+            if time.monotonic() - idle_since >= self.pool_config.validation_interval:
+                if not connection.is_alive():
+                    self._discard(connection)
+                    continue
+            return connection
+    
+    def _open(self) -> DatabaseConnection:
+        """Abre una conexión nueva cuyo lugar ya fue reservado."""
+        connection = DatabaseConnection(self.config)
+        try:
+            connected = connection.connect()
+        except Exception:
+            connected = False
+        if not connected:
+            with self._lock:
+                self._size -= 1
+                self._available.notify()
+            raise ConnectionError(f"No se pudo conectar al nodo '{self.name}'")
+        return connection
+    
+    def checkin(self, connection: DatabaseConnection, discard: bool = False):
+        """
+        Devuelve una conexión prestada al pool.
+        
+        Args:
+            connection: Conexión obtenida con checkout().
+            discard: Si es True, la conexión se cierra en lugar de reutilizarse.
+        """
+        now = time.monotonic()
+        if (discard or self._closed or not connection.is_connected()
+                or self._is_expired(connection, now)):
+            self._discard(connection)
+            return
+        
+        with self._lock:
+            self._idle.append((connection, now))
+            evicted = self._evict_locked(now)
+            self._available.notify()
+        for stale in evicted:
+            self._discard(stale)
+    
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """
+        Context manager que presta una conexión y la devuelve al terminar.
+        
+        La conexión se devuelve siempre, también cuando el bloque termina
+        sin error de la consulta (por ejemplo, al cerrar antes de tiempo un
+        generador que la usa). Si ocurre un error, se revierte cualquier
+        transacción pendiente y la conexión se descarta cuando ya no responde.
+        
+        Yields:
+            Conexión DatabaseConnection del pool.
+        """
+        connection = self.checkout(timeout)
+        failed = False
+        try:
+            yield connection
+        except Exception:
+            failed = True
+            connection.rollback()
+            raise
+        finally:
+            self.checkin(connection, discard=failed and not connection.is_alive())
+    
+    def warm(self) -> bool:
+        """
+        Garantiza al menos una conexión abierta en el pool y comprueba que el
+        nodo responda. A diferencia de checkout(), siempre valida la conexión
+        (aunque lleve poco tiempo libre), porque se usa como sonda del
+        interruptor de circuito justo después de una caída; las conexiones
+        libres que no responden se descartan hasta abrir una nueva.
+        
+        Returns:
+            True si el nodo respondió, False en caso contrario.
+        """
+        while True:
+            try:
+                connection = self.checkout()
+            except (ConnectionError, TimeoutError):
+                return False
+            if connection.is_alive():
+                self.checkin(connection)
+                return True
+            self.checkin(connection, discard=True)
+    
+    def close(self):
+        """Cierra las conexiones libres y rechaza nuevos préstamos."""
+        with self._lock:
+            self._closed = True
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+            self._available.notify_all()
+        for connection in idle:
+            self._discard(connection)
+    
+    def reopen(self):
+        """Permite volver a prestar conexiones después de close()."""
+        with self._lock:
+            self._closed = False
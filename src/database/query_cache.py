@@ -0,0 +1,151 @@
+"""
+Caché de resultados de consultas.
+Guarda el resultado de los procedimientos sp_Consultar_* por (procedimiento,
+parámetros, nodo) durante un tiempo de vida (TTL), con un número máximo de
+entradas que se desalojan por antigüedad de uso (LRU). Cada entrada queda
+asociada a la tabla que consulta (sp_Consultar_Libro -> Libro), y cualquier
+sp_Insertar_*, sp_Actualizar_* o sp_Eliminar_* de esa tabla la invalida.
+Las vistas (DeltaSync) la usan en sus recargas completas cuando el nodo no
+tiene registro de cambios; con registro, la carga completa debe corresponder
+a la versión recién leída y se consulta sin caché.
+"""
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from config.database import QueryCacheConfig
+
+
+_READ = re.compile(r"^sp_Consultar_(\w+)$", re.IGNORECASE)
+_WRITE = re.compile(r"^sp_(?:Insertar|Actualizar|Eliminar)_(\w+)$", re.IGNORECASE)
+
+
+def read_table(statement: str) -> Optional[str]:
+    """
+    Tabla leída por una sentencia, si es un sp_Consultar_*.
+    
+    Args:
+        statement: Nombre de la sentencia (ver instrumentation.statement_name).
+    
+    Returns:
+        Nombre de la tabla en mayúsculas (ej: 'LIBRO'), o None.
+    """
+    match = _READ.match(statement)
+    return match.group(1).upper() if match else None
+
+
+def written_table(statement: str) -> Optional[str]:
+    """
+    Tabla modificada por una sentencia, si es un sp_Insertar/Actualizar/Eliminar_*.
+    
+    Args:
+        statement: Nombre de la sentencia (ver instrumentation.statement_name).
+    
+    Returns:
+        Nombre de la tabla en mayúsculas (ej: 'LIBRO'), o None.
+    """
+    match = _WRITE.match(statement)
+    return match.group(1).upper() if match else None
+
+
+class QueryCache:
+    """Caché LRU con tiempo de vida, invalidada por tabla, segura para hilos."""
+    
+    def __init__(self, config: Optional[QueryCacheConfig] = None):
+        """
+        Inicializa la caché vacía.
+        
+        Args:
+            config: Tiempo de vida y número máximo de entradas.
+        """
+        self.config = config or QueryCacheConfig()
+        # clave -> (momento de expiración, tabla, resultado), del menos al más usado
+        self._entries: "OrderedDict[Hashable, Tuple[float, str, Any]]" = OrderedDict()
+        # Escrituras vistas por cada tabla; un resultado leído antes de una
+        # escritura no se guarda aunque llegue después de ella
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def enabled(self) -> bool:
+        """Indica si la caché guarda resultados."""
+        return self.config.enabled and self.config.ttl > 0 and self.config.max_entries > 0
+    
+    def generation(self, table: str) -> int:
+        """Número de invalidaciones de una tabla, para pasarlo luego a put()."""
+        with self._lock:
+            return self._generations.get(table, 0)
+    
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """
+        Busca un resultado vigente.
+        
+        Args:
+            key: Clave de la consulta.
+        
+        Returns:
+            Tupla (encontrado, resultado).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, entry[2]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+    
+    def put(self, key: Hashable, value: Any, table: str, generation: int):
+        """
+        Guarda un resultado, desalojando el menos usado si se supera el límite.
+        
+        Args:
+            key: Clave de la consulta.
+            value: Resultado a guardar.
+            table: Tabla consultada, usada para invalidar.
+            generation: Valor de generation(table) antes de ejecutar la consulta.
+                       Si la tabla se modificó desde entonces, no se guarda.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._generations.get(table, 0) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.config.ttl, table, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.config.max_entries:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, table: str):
+        """
+        Descarta los resultados de una tabla en todos los nodos.
+        
+        Args:
+            table: Nombre de la tabla en mayúsculas (ej: 'LIBRO').
+        """
+        with self._lock:
+            self._generations[table] = self._generations.get(table, 0) + 1
+            for key in [key for key, entry in self._entries.items() if entry[1] == table]:
+                del self._entries[key]
+    
+    def clear(self):
+        """Descarta todos los resultados."""
+        with self._lock:
+            for table in set(self._generations) | {entry[1] for entry in self._entries.values()}:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """Tamaño actual, aciertos y fallos acumulados."""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
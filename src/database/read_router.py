@@ -0,0 +1,234 @@
+"""
+Enrutamiento de lecturas replicadas.
+Para las tablas que existen completas en varios nodos (como LIBRO, replicada
+de FIS a FIQA), elige en cada lectura el nodo que se espera responda antes,
+según un promedio móvil exponencial (EWMA) de la latencia observada y las
+consultas que el nodo tiene en curso en ese momento. Un nodo que no se mide
+desde hace probe_interval recibe una lectura de prueba, para que una muestra
+lenta aislada no lo deje fuera para siempre; y tras escribir en una tabla
+las lecturas de esa tabla van al nodo escrito durante pin_after_write, para
+leer lo propio aunque la réplica vaya atrasada.
+Solo las lecturas enrutadas (DistributedConnection.execute_read y
+execute_hedged) alimentan estas estadísticas; las consultas a un nodo fijo,
+como las cargas completas o los registros de cambios, no se miden.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+from config.database import ReadRouterConfig
+
+
+class _NodeStats:
+    """Latencia y carga observadas de un nodo."""
+    
+    __slots__ = ("latency", "in_flight", "history", "sampled_at")
+    
+    def __init__(self, initial_latency: float, history_size: int):
+        self.latency = initial_latency  # EWMA en segundos
+        self.in_flight = 0
+        self.history: Deque[float] = deque(maxlen=history_size)
+        # Última medición o lectura de prueba enviada (time.monotonic)
+        self.sampled_at = time.monotonic()
+
+
+class ReadRouter:
+    """Elige el nodo de menor costo esperado para una lectura replicada."""
+    
+    def __init__(self, nodes: Iterable[str], config: Optional[ReadRouterConfig] = None,
+                 is_available: Optional[Callable[[str], bool]] = None):
+        """
+        Inicializa el enrutador sin historial de latencias.
+        
+        Args:
+            nodes: Nombres de los nodos conocidos.
+            config: Peso del EWMA y latencia inicial supuesta.
+            is_available: Función que indica si un nodo acepta llamadas
+                         (ej: su circuito está cerrado). Si es None, todos
+                         los nodos se consideran disponibles.
+        """
+        self.config = config or ReadRouterConfig()
+        self.is_available = is_available or (lambda node: True)
+        self._stats: Dict[str, _NodeStats] = {
+            node.upper(): _NodeStats(self.config.initial_latency, self.config.history_size)
+            for node in nodes
+        }
+        # Tabla escrita -> (nodo de la escritura, hasta cuándo se lee en él)
+        self._pins: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+    
+    def _cost(self, stats: _NodeStats) -> float:
+        """Tiempo esperado de respuesta si se envía una consulta más al nodo."""
+        return stats.latency * (stats.in_flight + 1)
+    
+    def choose(self, candidates: Optional[Iterable[str]] = None,
+               exclude: Iterable[str] = (), table: Optional[str] = None) -> str:
+        """
+        Elige el nodo donde ejecutar una lectura.
+        
+        Args:
+            candidates: Nodos que tienen los datos. Si es None, todos.
+            exclude: Nodos a descartar (ej: uno que ya falló).
+            table: Tabla que se lee (ej: 'LIBRO'), para respetar una
+                  escritura reciente en ella (ver pin).
+        
+        Returns:
+            Nombre del nodo elegido: el de la última escritura en la tabla
+            si sigue fijado (ver pin), un nodo sin medir desde hace probe_interval o
+            el de menor costo. Si ningún candidato está disponible, se
+            devuelve el primero no excluido para que la llamada falle con el
+            error del propio nodo.
+        
+        Raises:
+            ValueError: Si no queda ningún candidato.
+        """
+        excluded = {node.upper() for node in exclude}
+        names = [node.upper() for node in (candidates or self._stats)]
+        names = [node for node in names if node not in excluded and node in self._stats]
+        if not names:
+            raise ValueError("No hay nodos candidatos para la lectura")
+        
+        pinned = self.pinned(names, table)
+        if pinned is not None:
+            return pinned
+        
+        available = [node for node in names if self.is_available(node)] or names
+        now = time.monotonic()
+        with self._lock:
+            best = min(available, key=lambda node: self._cost(self._stats[node]))
+            for node in available:
+                stats = self._stats[node]
+                if node != best and now - stats.sampled_at >= self.config.probe_interval:
+                    # Lectura de prueba: renueva la latencia de un nodo descartado
+                    stats.sampled_at = now
+                    return node
+            return best
+    
+    def pin(self, node_name: str, table: str):
+        """
+        Envía las lecturas de una tabla al nodo de una escritura confirmada
+        durante pin_after_write segundos, para que lean lo recién escrito
+        aunque la réplica no lo haya recibido todavía.
+        
+        Args:
+            node_name: Nodo donde se escribió.
+            table: Tabla modificada (ver query_cache.written_table).
+        """
+        if node_name.upper() not in self._stats:
+            return
+        with self._lock:
+            self._pins[table.upper()] = (
+                node_name.upper(), time.monotonic() + self.config.pin_after_write
+            )
+    
+    def pinned(self, candidates: Optional[Iterable[str]] = None,
+               table: Optional[str] = None) -> Optional[str]:
+        """
+        Nodo al que siguen fijadas las lecturas de una tabla tras una escritura reciente.
+        
+        Args:
+            candidates: Nodos que tienen los datos. Si es None, todos.
+            table: Tabla que se lee. Si es None, la lectura no corresponde a
+                  una tabla conocida y no se fija.
+        
+        Returns:
+            Nombre del nodo, o None si la tabla no se escribió hace poco, el
+            nodo no está entre los candidatos o no está disponible.
+        """
+        if table is None:
+            return None
+        with self._lock:
+            node, until = self._pins.get(table.upper(), (None, 0.0))
+            if node is None or time.monotonic() >= until:
+                return None
+        names = {name.upper() for name in (candidates or self._stats)}
+        if node not in names or not self.is_available(node):
+            return None
+        return node
+    
+    @contextmanager
+    def track(self, node_name: str):
+        """
+        Registra una consulta en curso en el nodo, incluida la espera por
+        una conexión, para repartir la carga.
+        
+        Args:
+            node_name: Nodo donde se ejecuta la consulta.
+        """
+        stats = self._stats.get(node_name.upper())
+        if stats is None:
+            yield
+            return
+        
+        with self._lock:
+            stats.in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                stats.in_flight -= 1
+    
+    @contextmanager
+    def measure(self, node_name: str):
+        """
+        Mide la duración de una sentencia y actualiza la latencia del nodo.
+        
+        Debe envolver solo la ejecución, ya con la conexión prestada, para
+        no contar la espera del pool ni el login. Solo las consultas
+        exitosas actualizan el EWMA; los errores de conexión los gestiona
+        el interruptor de circuito del nodo.
+        
+        Args:
+            node_name: Nodo donde se ejecuta la consulta.
+        """
+        stats = self._stats.get(node_name.upper())
+        start = time.perf_counter()
+        yield
+        if stats is not None:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._observe(stats, elapsed)
+    
+    def _observe(self, stats: _NodeStats, elapsed: float):
+        """Actualiza el EWMA de latencia con una nueva muestra. Requiere el lock."""
+        if not stats.history:
+            stats.latency = elapsed
+        else:
+            alpha = self.config.ewma_alpha
+            stats.latency = alpha * elapsed + (1 - alpha) * stats.latency
+        stats.history.append(elapsed)
+        stats.sampled_at = time.monotonic()
+    
+    def hedge_delay(self, node_name: str) -> float:
+        """
+        Espera antes de duplicar una lectura en otra réplica.
+        
+        Es el percentil hedge_percentile de las latencias recientes del nodo:
+        solo las lecturas más lentas que lo habitual se duplican.
+        
+        Args:
+            node_name: Nodo al que se envió la lectura.
+        
+        Returns:
+            Segundos de espera.
+        """
+        stats = self._stats.get(node_name.upper())
+        with self._lock:
+            history = sorted(stats.history) if stats else []
+        if len(history) < self.config.hedge_min_samples:
+            return self.config.default_hedge_delay
+        position = min(len(history) - 1, int(len(history) * self.config.hedge_percentile))
+        return history[position]
+    
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Latencia estimada (ms) y consultas en curso de cada nodo."""
+        with self._lock:
+            return {
+                node: {
+                    'latency_ms': round(stats.latency * 1000, 1),
+                    'in_flight': stats.in_flight,
+                }
+                for node, stats in self._stats.items()
+            }
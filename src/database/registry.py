@@ -0,0 +1,80 @@
+"""
+Registro de conexiones distribuidas compartidas.
+Permite que todas las vistas y gestores de procedimientos almacenados usen
+una misma DistributedConnection (y por tanto los mismos pools de conexiones)
+en lugar de abrir sesiones propias contra cada nodo.
+"""
+import threading
+from typing import Dict, List, Optional
+
+from config.database import DistributedDatabaseConfig
+from database.distributed_connection import DistributedConnection
+
+
+class ConnectionRegistry:
+    """Registro de conexiones distribuidas con conteo de referencias."""
+    
+    DEFAULT = "default"
+    
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        self._lock = threading.Lock()
+        # nombre -> [conexión, número de referencias]
+        self._entries: Dict[str, List] = {}
+    
+    def acquire(self, name: str = DEFAULT,
+                config: Optional[DistributedDatabaseConfig] = None) -> DistributedConnection:
+        """
+        Obtiene la conexión compartida con el nombre indicado, creándola si no existe.
+        
+        Cada llamada debe tener su correspondiente release().
+        
+        Args:
+            name: Nombre de la conexión compartida.
+            config: Configuración a usar si la conexión aún no existe.
+        
+        Returns:
+            Conexión distribuida compartida.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = [DistributedConnection(config), 0]
+                self._entries[name] = entry
+            entry[1] += 1
+            return entry[0]
+    
+    def release(self, name: str = DEFAULT):
+        """
+        Libera una referencia. Al liberar la última se cierran los pools.
+        
+        Args:
+            name: Nombre de la conexión compartida.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return
+            entry[1] -= 1
+            if entry[1] > 0:
+                return
+            del self._entries[name]
+        entry[0].disconnect_all()
+    
+    def ref_count(self, name: str = DEFAULT) -> int:
+        """Número de referencias activas de una conexión compartida."""
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry[1] if entry else 0
+    
+    def close_all(self):
+        """Cierra todas las conexiones compartidas sin importar sus referencias."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for connection, _ in entries:
+            connection.disconnect_all()
+
+
+# Registro único del proceso
+connection_registry = ConnectionRegistry()
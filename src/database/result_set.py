@@ -0,0 +1,128 @@
+"""
+Resultado compacto de consultas.
+Guarda los nombres de columna una sola vez y cada fila como una tupla, en
+lugar de un diccionario por fila. Las filas se exponen mediante objetos Row
+de solo lectura que se comportan como diccionarios, para que el código que
+usa fila.get('columna') siga funcionando sin cambios.
+"""
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+
+class Row(Mapping):
+    """Vista tipo diccionario de una fila de un ResultSet."""
+    
+    __slots__ = ("_index", "_values")
+    
+    def __init__(self, index: Dict[str, int], values: tuple):
+        self._index = index
+        self._values = values
+    
+    def __getitem__(self, key: str) -> Any:
+        return self._values[self._index[key]]
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+    
+    def __len__(self) -> int:
+        return len(self._index)
+    
+    def __repr__(self) -> str:
+        return f"Row({dict(self)!r})"
+    
+    @property
+    def values_tuple(self) -> tuple:
+        """Valores de la fila en el orden de las columnas."""
+        return self._values
+
+
+class ResultSet(Sequence):
+    """Filas de una consulta almacenadas como tuplas con columnas compartidas."""
+    
+    __slots__ = ("columns", "rows", "_index")
+    
+    def __init__(self, columns: List[str], rows: Optional[List[tuple]] = None):
+        """
+        Inicializa el resultado.
+        
+        Args:
+            columns: Nombres de las columnas, en orden.
+            rows: Filas como tuplas alineadas con columns.
+        """
+        self.columns = list(columns)
+        self.rows = rows if rows is not None else []
+        self._index = {name: position for position, name in enumerate(self.columns)}
+    
+    @classmethod
+    def from_dicts(cls, records: Iterable[Dict[str, Any]],
+                   columns: Optional[List[str]] = None) -> "ResultSet":
+        """
+        Construye un ResultSet a partir de una lista de diccionarios.
+        
+        Args:
+            records: Filas como diccionarios.
+            columns: Columnas a conservar. Si es None, se usan las del primer registro.
+        """
+        records = list(records)
+        if columns is None:
+            columns = list(records[0].keys()) if records else []
+        return cls(columns, [tuple(record.get(name) for name in columns) for record in records])
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return ResultSet(self.columns, self.rows[position])
+        return Row(self._index, self.rows[position])
+    
+    def __iter__(self) -> Iterator[Row]:
+        index = self._index
+        for values in self.rows:
+            yield Row(index, values)
+    
+    def __repr__(self) -> str:
+        return f"ResultSet(columns={self.columns!r}, rows={len(self.rows)})"
+    
+    def row(self, values: tuple) -> Row:
+        """
+        Envuelve como Row una tupla de valores con las columnas del resultado
+        (por ejemplo, una fila ya ordenada o filtrada fuera del ResultSet).
+        
+        Args:
+            values: Valores alineados con columns.
+        
+        Returns:
+            Row de solo lectura sobre values.
+        """
+        return Row(self._index, values)
+    
+    def column(self, name: str) -> List[Any]:
+        """
+        Obtiene todos los valores de una columna.
+        
+        Args:
+            name: Nombre de la columna.
+        
+        Returns:
+            Lista con el valor de la columna en cada fila.
+        """
+        position = self._index[name]
+        return [values[position] for values in self.rows]
+    
+    def filter(self, predicate: Callable[[Row], bool]) -> "ResultSet":
+        """
+        Devuelve un nuevo ResultSet con las filas que cumplen el predicado.
+        
+        Args:
+            predicate: Función que recibe un Row y devuelve True para conservarlo.
+        """
+        index = self._index
+        return ResultSet(
+            self.columns,
+            [values for values in self.rows if predicate(Row(index, values))]
+        )
+    
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Convierte el resultado a la lista de diccionarios tradicional."""
+        return [dict(zip(self.columns, values)) for values in self.rows]
@@ -0,0 +1,318 @@
+"""
+Funcionalidad común de los gestores de procedimientos almacenados.
+"""
+import inspect
+import re
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .async_connection import AsyncDistributedConnection
+from .distributed_connection import DistributedConnection
+from .fan_out import build_exec_statement
+from .instrumentation import statement_name
+from .query_cache import read_table
+
+
+# Filas por página en las consultas paginadas (consultar_*_page)
+DEFAULT_PAGE_SIZE = 500
+# Resultados máximos de las búsquedas en el servidor (buscar_*)
+DEFAULT_SEARCH_LIMIT = 200
+# Error 2812 de SQL Server: el procedimiento llamado no existe en el nodo
+_MISSING_PROCEDURE = re.compile(r"\(2812\)")
+
+
+class SP_Base:
+    """Base de SP_Libro, SP_Usuarios, SP_Prestamo y SP_Pasillo."""
+    
+    dist_conn: DistributedConnection
+    
+    # Segundos máximos por procedimiento; los ausentes usan query_timeout del nodo
+    TIMEOUTS: Dict[str, int] = {}
+    
+    def _timeout(self, query: str) -> Optional[int]:
+        """
+        Obtiene el límite de tiempo declarado para el procedimiento de una consulta.
+        
+        Args:
+            query: Sentencia EXEC o nombre del procedimiento.
+        
+        Returns:
+            Segundos máximos, o None para usar el valor del nodo.
+        """
+        words = query.split()
+        if not words:
+            return None
+        procedure = words[1] if words[0].upper() == "EXEC" and len(words) > 1 else words[0]
+        return self.TIMEOUTS.get(procedure)
+    
+    @property
+    def async_conn(self) -> AsyncDistributedConnection:
+        """Fachada asíncrona compartida de la conexión distribuida."""
+        return AsyncDistributedConnection.for_connection(self.dist_conn)
+    
+    async def run_async(self, method: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta cualquier método del gestor sin bloquear el bucle de eventos.
+        
+        La llamada se envía al pool de hilos del nodo indicado en el
+        argumento 'node' del método (o su valor por defecto).
+        
+        Args:
+            method: Método del gestor (ej: sp.insertar_libro).
+        
+        Returns:
+            Valor devuelto por el método.
+        """
+        bound = inspect.signature(method).bind(*args, **kwargs)
+        bound.apply_defaults()
+        node = bound.arguments.get("node") or self.dist_conn.config.primary_node
+        return await self.async_conn.run(node, method, *args, **kwargs)
+    
+    def _cached_query(self, node: Optional[str], query: str, params: tuple,
+                      as_result_set: bool, fetch: Callable[[], Any],
+                      cached: bool = True) -> Any:
+        """
+        Devuelve el resultado de una consulta sp_Consultar_* desde la caché
+        compartida de la conexión, ejecutándola solo si no está vigente.
+        
+        Dentro de una transacción del hilo no se usa la caché, porque la
+        consulta puede ver escrituras aún sin confirmar. Tampoco en las
+        lecturas enrutadas justo después de una escritura propia en la tabla
+        (mientras ReadRouter.pinned indica un nodo): si la lectura llegara a una
+        réplica atrasada, su resultado quedaría guardado todo el TTL.
+        
+        Args:
+            node: Nodo de la consulta (None si lo elige read_router).
+            query: Consulta SQL, parte de la clave junto con params y node.
+            params: Parámetros para la consulta.
+            as_result_set: Forma del resultado, también parte de la clave.
+            fetch: Función que ejecuta la consulta en el servidor.
+            cached: Si es False, siempre se ejecuta fetch sin guardar el resultado.
+        
+        Returns:
+            Copia de la lista (o ResultSet) guardada; las filas son compartidas
+            y no deben modificarse.
+        """
+        cache = self.dist_conn.query_cache
+        statement = statement_name(query)
+        table = read_table(statement)
+        if (not cached or table is None or not cache.enabled
+                or self.dist_conn.in_transaction(node)):
+            return fetch()
+        if node is None and self.dist_conn.read_router.pinned(table=table) is not None:
+            return fetch()
+        
+        key = (statement, params, node and node.upper(), as_result_set)
+        found, value = cache.get(key)
+        if not found:
+            generation = cache.generation(table)
+            value = fetch()
+            cache.put(key, value, table, generation)
+        return value[:]
+    
+    def has_procedure(self, procedure: str) -> bool:
+        """
+        Indica si un procedimiento opcional (sp_Version_Cambios, sp_Cambios_*,
+        sp_Pagina_*, sp_Buscar_*) puede llamarse, es decir, si no se detectó
+        ya que falta en los nodos (ver scripts/sql y el README).
+        
+        Args:
+            procedure: Nombre del procedimiento.
+        """
+        return procedure not in self.dist_conn.missing_procedures
+    
+    def _note_missing(self, procedure: str, error: Exception) -> bool:
+        """
+        Anota un procedimiento opcional si el error indica que no existe, para
+        no volver a llamarlo mientras dure la conexión.
+        
+        Args:
+            procedure: Nombre del procedimiento llamado.
+            error: Error de la llamada.
+        
+        Returns:
+            True si el procedimiento no existe (ya informado), False si el
+            error es otro.
+        """
+        if _MISSING_PROCEDURE.search(str(error)) is None:
+            return False
+        if procedure not in self.dist_conn.missing_procedures:
+            self.dist_conn.missing_procedures.add(procedure)
+            print(f"{procedure} no está instalado en los nodos; se usa la alternativa "
+                  f"sin él (ver scripts/sql)")
+        return True
+    
+    def version_cambios(self, node: str = "FIS",
+                        changes_procedure: Optional[str] = None) -> Optional[int]:
+        """
+        Versión actual del registro de cambios de un nodo (sp_Version_Cambios).
+        
+        Args:
+            node: Nodo donde ejecutar.
+            changes_procedure: Procedimiento sp_Cambios_* con que se usará la
+                              versión (opcional); si ya se sabe que falta, la
+                              versión no sirve y no se consulta.
+        
+        Returns:
+            Versión a guardar antes de una carga completa para luego pedir
+            solo los cambios posteriores, o None si la consulta falló o el
+            nodo no tiene el procedimiento.
+        """
+        procedure = "sp_Version_Cambios"
+        if not self.has_procedure(procedure):
+            return None
+        if changes_procedure is not None and not self.has_procedure(changes_procedure):
+            return None
+        query = f"EXEC {procedure}"
+        try:
+            rows = self.dist_conn.execute_query(node, query, timeout=self._timeout(query))
+            return rows[0]['version'] if rows else None
+        except Exception as e:
+            if not self._note_missing(procedure, e):
+                print(f"Error al consultar la versión de cambios: {e}")
+            return None
+    
+    def _consultar_cambios(self, node: str, procedure: str, version: int,
+                           description: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Ejecuta un procedimiento sp_Cambios_* con la versión ya sincronizada.
+        
+        Args:
+            node: Nodo donde ejecutar.
+            procedure: Nombre del procedimiento (ej: 'sp_Cambios_Libro').
+            version: Última versión ya aplicada.
+            description: Nombre de los datos para el mensaje de error.
+        
+        Returns:
+            Una fila por clave modificada, con las columnas de la consulta
+            completa más 'operacion' ('U' o 'D') y 'version_cambio'; None
+            si la consulta falló o el nodo no tiene el procedimiento (hay
+            que volver a cargar todo).
+        """
+        if not self.has_procedure(procedure):
+            return None
+        query = f"EXEC {procedure} @version=?"
+        try:
+            return self.dist_conn.execute_query(node, query, (version,),
+                                                timeout=self._timeout(query))
+        except Exception as e:
+            if not self._note_missing(procedure, e):
+                print(f"Error al consultar cambios de {description}: {e}")
+            return None
+    
+    def _consultar_pagina(self, node: str, procedure: str, key_columns: Sequence[str],
+                          after_key: Optional[Sequence[Any]], limit: int,
+                          as_result_set: bool, description: str) -> List[Dict[str, Any]]:
+        """
+        Ejecuta un procedimiento sp_Pagina_*, que devuelve hasta limit filas
+        ordenadas por su clave a partir de la siguiente a after_key.
+        
+        Args:
+            node: Nodo donde ejecutar.
+            procedure: Nombre del procedimiento (ej: 'sp_Pagina_Prestamo').
+            key_columns: Columnas de la clave, en el orden del procedimiento.
+            after_key: Clave de la última fila ya recibida, o None para la
+                      primera página.
+            limit: Número máximo de filas.
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            description: Nombre de los datos para el mensaje de error.
+        
+        Returns:
+            Filas de la página; menos de limit si es la última.
+        
+        Raises:
+            Exception: El error de la consulta, ya informado; una página
+                      vacía siempre significa que no hay más filas.
+        """
+        if after_key is None:
+            after_key = (None,) * len(key_columns)
+        elif len(after_key) != len(key_columns):
+            raise ValueError(f"La clave de {description} tiene {len(key_columns)} columnas")
+        query = build_exec_statement(procedure, ("limite",) + tuple(key_columns))
+        try:
+            return self.dist_conn.execute_query(node, query, (limit, *after_key),
+                                                as_result_set, timeout=self._timeout(query))
+        except Exception as e:
+            print(f"Error al consultar {description}: {e}")
+            raise
+    
+    @staticmethod
+    def _iter_pages(fetch_page: Callable[[Optional[tuple], int], Any],
+                    key_columns: Sequence[str], limit: int) -> Iterator[Any]:
+        """
+        Recorre una consulta paginada pidiendo cada página con la clave de la
+        última fila de la anterior.
+        
+        Args:
+            fetch_page: Función (after_key, limit) que devuelve una página.
+            key_columns: Columnas de la clave.
+            limit: Filas por página.
+        
+        Yields:
+            Cada página no vacía, hasta la primera con menos de limit filas.
+        
+        Raises:
+            Exception: El error de la página que falló, para que un recorrido
+                      cortado no parezca completo.
+        """
+        after_key = None
+        while True:
+            page = fetch_page(after_key, limit)
+            if page:
+                yield page
+            if len(page) < limit:
+                return
+            last = page[-1]
+            after_key = tuple(last[column] for column in key_columns)
+    
+    def _iter_query(self, node: str, query: str, params: tuple,
+                    batch_size: int, description: str) -> Iterator[Dict[str, Any]]:
+        """
+        Itera los resultados de una consulta por lotes, informando los errores
+        igual que los métodos consultar_*.
+        
+        Args:
+            node: Nodo donde ejecutar.
+            query: Consulta SQL a ejecutar.
+            params: Parámetros para la consulta.
+            batch_size: Número de filas por lote.
+            description: Nombre de los datos para el mensaje de error.
+        
+        Yields:
+            Un diccionario por fila.
+        
+        Raises:
+            Exception: El error de la consulta, aunque ocurra a mitad del
+                      recorrido, para que un resultado cortado no parezca
+                      completo.
+        """
+        try:
+            yield from self.dist_conn.iter_query(node, query, params, batch_size,
+                                                 self._timeout(query))
+        except Exception as e:
+            print(f"Error al consultar {description}: {e}")
+            raise
+    
+    def _execute_batch(self, node: str, procedure: str, fields: Sequence[str],
+                       rows: Sequence[Dict[str, Any]],
+                       description: str) -> List[Tuple[bool, str]]:
+        """
+        Ejecuta un procedimiento para muchas filas en un solo viaje y transacción.
+        
+        Args:
+            node: Nodo donde ejecutar.
+            procedure: Nombre del procedimiento almacenado.
+            fields: Parámetros del procedimiento, en orden.
+            rows: Un diccionario por fila con los valores de fields.
+            description: Acción para el mensaje de error (ej: 'insertar libros').
+        
+        Returns:
+            Lista (éxito, mensaje de error) por fila, en el mismo orden.
+        """
+        try:
+            query = build_exec_statement(procedure, fields)
+            param_rows = [tuple(row[field] for field in fields) for row in rows]
+            return self.dist_conn.execute_batch(node, query, param_rows,
+                                                self._timeout(procedure))
+        except Exception as e:
+            print(f"Error al {description}: {e}")
+            return [(False, str(e))] * len(rows)
@@ -7,13 +7,26 @@ Nota: LIBRO usa replicación transaccional, no fragmentación.
 - FIS es el publicador (escrituras aquí)
 - FIQA es el suscriptor (recibe réplica automática)
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from .connection import DEFAULT_BATCH_SIZE
 from .distributed_connection import DistributedConnection
+from .s_p_base import DEFAULT_SEARCH_LIMIT, SP_Base
 
 
-class SP_Libro:
+class SP_Libro(SP_Base):
     """Gestiona llamadas a procedimientos almacenados de LIBRO."""
     
+    # Parámetros de sp_Insertar_Libro y sp_Actualizar_Libro
+    _CAMPOS_LIBRO = ("ISBN", "nombre_libro", "anio_edicion",
+                     "categoria_libro", "lugar_impresion_libro")
+    
+    # Segundos máximos por procedimiento (el resto usa query_timeout del nodo)
+    TIMEOUTS = {"sp_Consultar_Libro": 15, "sp_Buscar_Libro": 10}
+    
+    # Nodos con una copia completa de LIBRO, válidos para lectura
+    _REPLICAS = ("FIS", "FIQA")
+    _TABLE = "LIBRO"
+    
     def __init__(self, dist_conn: DistributedConnection):
         """
         Inicializa el gestor de procedimientos almacenados.
@@ -50,7 +63,8 @@ class SP_Libro:
         try:
             self.dist_conn.execute_non_query(
                 node, query, 
-                (ISBN, nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro)
+                (ISBN, nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro),
+                timeout=self._timeout(query)
             )
             return True
         except Exception as e:
@@ -84,13 +98,45 @@ class SP_Libro:
         try:
             self.dist_conn.execute_non_query(
                 node, query, 
-                (ISBN, nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro)
+                (ISBN, nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro),
+                timeout=self._timeout(query)
             )
             return True
         except Exception as e:
             print(f"Error al actualizar libro: {e}")
             return False
     
+    def insertar_libros(self, libros: List[Dict[str, Any]],
+                        node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Inserta muchos libros en un solo viaje y una sola transacción.
+        
+        Args:
+            libros: Un diccionario por libro con las claves ISBN, nombre_libro,
+                   anio_edicion, categoria_libro y lugar_impresion_libro.
+            node: Nodo donde ejecutar (siempre FIS para escrituras).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por libro, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Insertar_Libro", self._CAMPOS_LIBRO,
+                                   libros, "insertar libros")
+    
+    def actualizar_libros(self, libros: List[Dict[str, Any]],
+                          node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Actualiza muchos libros en un solo viaje y una sola transacción.
+        
+        Args:
+            libros: Un diccionario por libro con las mismas claves que insertar_libros.
+            node: Nodo donde ejecutar (siempre FIS para escrituras).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por libro, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Actualizar_Libro", self._CAMPOS_LIBRO,
+                                   libros, "actualizar libros")
+    
     def eliminar_libro(self, ISBN: str, node: str = "FIS") -> bool:
         """
         Elimina un libro de la base de datos.
@@ -105,34 +151,153 @@ class SP_Libro:
         """
         query = "EXEC sp_Eliminar_Libro @ISBN=?"
         try:
-            self.dist_conn.execute_non_query(node, query, (ISBN,))
+            self.dist_conn.execute_non_query(node, query, (ISBN,),
+                                             timeout=self._timeout(query))
             return True
         except Exception as e:
             print(f"Error al eliminar libro: {e}")
             return False
     
+    def nodo_lectura(self) -> str:
+        """
+        Réplica de LIBRO donde conviene leer ahora, según la latencia y la
+        carga observadas y las escrituras recientes (ver ReadRouter.choose).
+        
+        Returns:
+            Nombre del nodo (FIS o FIQA).
+        """
+        return self.dist_conn.read_router.choose(self._REPLICAS, table=self._TABLE)
+    
+    def _consulta_libro(self, ISBN: Optional[str]) -> tuple:
+        """Construye la llamada a sp_Consultar_Libro y sus parámetros."""
+        if ISBN is None:
+            return "EXEC sp_Consultar_Libro", ()
+        return "EXEC sp_Consultar_Libro @ISBN=?", (ISBN,)
+    
     def consultar_libro(self, ISBN: Optional[str] = None,
-                        node: str = "FIS") -> List[Dict[str, Any]]:
+                        node: Optional[str] = None,
+                        as_result_set: bool = False,
+                        hedged: bool = False,
+                        cached: bool = True) -> List[Dict[str, Any]]:
         """
         Consulta libros de la base de datos.
-        Puede leer desde FIS o FIQA (ambos tienen los mismos datos).
+        Puede leer desde FIS o FIQA (ambos tienen los mismos datos). El
+        resultado se guarda en la caché de la conexión hasta que venza o se
+        modifique LIBRO.
         
         Args:
             ISBN: ISBN del libro (opcional). Si es None, devuelve todos.
-            node: Nodo donde ejecutar (FIS o FIQA, ambos válidos para lectura).
+            node: Nodo donde ejecutar (FIS o FIQA). Si es None, se elige la
+                 réplica con menor latencia y carga (ver ReadRouter).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            hedged: Si es True y se consulta un solo ISBN sin fijar el nodo,
+                   una respuesta lenta se duplica en la otra réplica y se usa
+                   la primera que llegue.
+            cached: Si es False, se consulta el nodo sin usar ni llenar la
+                   caché (cargas completas de DeltaSync, que deben
+                   corresponder a la versión de cambios recién leída).
         
         Returns:
-            Lista de diccionarios con los datos de los libros.
+            Lista de diccionarios (o ResultSet si as_result_set es True)
+            con los datos de los libros.
         """
-        if ISBN is None:
-            query = "EXEC sp_Consultar_Libro"
-            params = ()
-        else:
-            query = "EXEC sp_Consultar_Libro @ISBN=?"
-            params = (ISBN,)
+        query, params = self._consulta_libro(ISBN)
+        
+        def fetch():
+            if node is None and hedged and ISBN is not None:
+                return self.dist_conn.execute_hedged(query, params, self._REPLICAS,
+                                                     as_result_set, self._timeout(query))
+            if node is None:
+                return self.dist_conn.execute_read(query, params, self._REPLICAS,
+                                                   as_result_set, self._timeout(query))
+            return self.dist_conn.execute_query(node, query, params, as_result_set,
+                                                timeout=self._timeout(query))
         
         try:
-            return self.dist_conn.execute_query(node, query, params)
+            return self._cached_query(node, query, params, as_result_set, fetch, cached)
         except Exception as e:
             print(f"Error al consultar libros: {e}")
             return []
+    
+    def consultar_libro_cambios(self, version: int,
+                                node: str = "FIS") -> Optional[List[Dict[str, Any]]]:
+        """
+        Consulta los libros insertados, modificados o eliminados desde una versión.
+        Cada réplica lleva su propio registro de cambios, así que la versión
+        debe haberse obtenido del mismo nodo.
+        
+        Args:
+            version: Última versión ya aplicada (ver version_cambios).
+            node: Nodo donde ejecutar (por defecto FIS, el publicador).
+        
+        Returns:
+            Lista de libros con 'operacion' ('U' o 'D', este último solo con
+            el ISBN) y 'version_cambio'.
+            None si falló o el nodo no tiene el procedimiento: hay que
+            volver a cargar todo.
+        """
+        return self._consultar_cambios(node, "sp_Cambios_Libro", version, "libros")
+    
+    def buscar_libro(self, texto: str = "",
+                     categoria: Optional[str] = None,
+                     limit: int = DEFAULT_SEARCH_LIMIT,
+                     node: Optional[str] = None,
+                     as_result_set: bool = False) -> List[Dict[str, Any]]:
+        """
+        Busca libros en el servidor con su índice de texto completo, sin
+        traer el catálogo al cliente.
+        
+        Args:
+            texto: Palabras a buscar en ISBN, nombre, categoría y lugar de
+                  impresión; cada una puede ser el comienzo de una palabra.
+            categoria: Categoría exacta (opcional).
+            limit: Número máximo de libros.
+            node: Nodo donde ejecutar (FIS o FIQA). Si es None, se elige la
+                 réplica con menor latencia y carga.
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+        
+        Returns:
+            Lista de diccionarios (o ResultSet si as_result_set es True),
+            los más relevantes primero.
+        """
+        query = "EXEC sp_Buscar_Libro @texto=?, @categoria=?, @limite=?"
+        params = (texto, categoria, limit)
+        try:
+            if node is None:
+                return self.dist_conn.execute_read(query, params, self._REPLICAS,
+                                                   as_result_set, self._timeout(query),
+                                                   table=self._TABLE)
+            return self.dist_conn.execute_query(node, query, params, as_result_set,
+                                                timeout=self._timeout(query))
+        except Exception as e:
+            if not self._note_missing("sp_Buscar_Libro", e):
+                print(f"Error al buscar libros: {e}")
+            return []
+    
+    def consultar_libro_iter(self, ISBN: Optional[str] = None, node: Optional[str] = None,
+                             batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que consultar_libro, pero entrega los libros por lotes sin
+        cargar todo el resultado en memoria.
+        
+        Args:
+            ISBN: ISBN del libro (opcional). Si es None, recorre todos.
+            node: Nodo donde ejecutar (FIS o FIQA). Si es None, se elige la
+                 réplica con menor latencia y carga.
+            batch_size: Número de filas pedidas al servidor por lote.
+        
+        Yields:
+            Un diccionario por libro.
+        
+        Raises:
+            Exception: Si la consulta falla, aunque sea a mitad del recorrido.
+        """
+        query, params = self._consulta_libro(ISBN)
+        node = node or self.nodo_lectura()
+        return self._iter_query(node, query, params, batch_size, "libros")
+    
+    async def consultar_libro_async(self, ISBN: Optional[str] = None,
+                                    node: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_libro."""
+        executor_node = node or self.nodo_lectura()
+        return await self.async_conn.run(executor_node, self.consultar_libro, ISBN, node)
@@ -3,13 +3,22 @@ Gestión de llamadas a procedimientos almacenados.
 Este módulo proporciona una interfaz Python para ejecutar los procedimientos
 almacenados CRUD de las tablas PASILLO, PRESTAMO y USUARIOS.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from .connection import DEFAULT_BATCH_SIZE
 from .distributed_connection import DistributedConnection
+from .s_p_base import SP_Base
 
 
-class SP_Pasillo:
+class SP_Pasillo(SP_Base):
     """Gestiona llamadas a procedimientos almacenados en la base de datos distribuida."""
     
+    # Parámetros de sp_Insertar_Pasillo y sp_Actualizar_Pasillo
+    _CAMPOS_INSERTAR = ("id_biblioteca", "num_pasillo")
+    _CAMPOS_ACTUALIZAR = ("id_biblioteca", "num_pasillo_actual", "num_pasillo_nuevo")
+    
+    # Segundos máximos por procedimiento (el resto usa query_timeout del nodo)
+    TIMEOUTS = {"sp_Consultar_Pasillo": 15}
+    
     def __init__(self, dist_conn: DistributedConnection):
         """
         Inicializa el gestor de procedimientos almacenados.
@@ -36,7 +45,8 @@ class SP_Pasillo:
         """
         query = "EXEC sp_Insertar_Pasillo @id_biblioteca=?, @num_pasillo=?"
         try:
-            self.dist_conn.execute_non_query(node, query, (id_biblioteca, num_pasillo))
+            self.dist_conn.execute_non_query(node, query, (id_biblioteca, num_pasillo),
+                                             timeout=self._timeout(query))
             return True
         except Exception as e:
             print(f"Error al insertar pasillo: {e}")
@@ -63,13 +73,46 @@ class SP_Pasillo:
         try:
             self.dist_conn.execute_non_query(
                 node, query, 
-                (id_biblioteca, num_pasillo_actual, num_pasillo_nuevo)
+                (id_biblioteca, num_pasillo_actual, num_pasillo_nuevo),
+                timeout=self._timeout(query)
             )
             return True
         except Exception as e:
             print(f"Error al actualizar pasillo: {e}")
             return False
     
+    def insertar_pasillos(self, pasillos: List[Dict[str, Any]],
+                          node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Inserta muchos pasillos en un solo viaje y una sola transacción.
+        
+        Args:
+            pasillos: Un diccionario por pasillo con las claves id_biblioteca
+                     y num_pasillo.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por pasillo, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Insertar_Pasillo", self._CAMPOS_INSERTAR,
+                                   pasillos, "insertar pasillos")
+    
+    def actualizar_pasillos(self, pasillos: List[Dict[str, Any]],
+                            node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Renumera muchos pasillos en un solo viaje y una sola transacción.
+        
+        Args:
+            pasillos: Un diccionario por pasillo con las claves id_biblioteca,
+                     num_pasillo_actual y num_pasillo_nuevo.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por pasillo, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Actualizar_Pasillo", self._CAMPOS_ACTUALIZAR,
+                                   pasillos, "actualizar pasillos")
+    
     def eliminar_pasillo(self, id_biblioteca: str, num_pasillo: int,
                         node: str = "FIS") -> bool:
         """
@@ -85,33 +128,90 @@ class SP_Pasillo:
         """
         query = "EXEC sp_Eliminar_Pasillo @id_biblioteca=?, @num_pasillo=?"
         try:
-            self.dist_conn.execute_non_query(node, query, (id_biblioteca, num_pasillo))
+            self.dist_conn.execute_non_query(node, query, (id_biblioteca, num_pasillo),
+                                             timeout=self._timeout(query))
             return True
         except Exception as e:
             print(f"Error al eliminar pasillo: {e}")
             return False
     
+    def _consulta_pasillo(self, id_biblioteca: Optional[str]) -> tuple:
+        """Construye la llamada a sp_Consultar_Pasillo y sus parámetros."""
+        if id_biblioteca is None:
+            return "EXEC sp_Consultar_Pasillo", ()
+        return "EXEC sp_Consultar_Pasillo @id_biblioteca=?", (id_biblioteca,)
+    
     def consultar_pasillo(self, id_biblioteca: Optional[str] = None,
-                         node: str = "FIS") -> List[Dict[str, Any]]:
+                         node: str = "FIS",
+                         as_result_set: bool = False,
+                         cached: bool = True) -> List[Dict[str, Any]]:
         """
         Consulta pasillos de la base de datos.
+        El resultado se guarda en la caché de la conexión hasta que venza
+        o se modifique PASILLO.
         
         Args:
             id_biblioteca: ID de la biblioteca (opcional). Si es None, devuelve todos.
             node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            cached: Si es False, se consulta el nodo sin usar ni llenar la
+                   caché (cargas completas de DeltaSync, que deben
+                   corresponder a la versión de cambios recién leída).
         
         Returns:
-            Lista de diccionarios con los datos de los pasillos.
+            Lista de diccionarios (o ResultSet si as_result_set es True)
+            con los datos de los pasillos.
         """
-        if id_biblioteca is None:
-            query = "EXEC sp_Consultar_Pasillo"
-            params = ()
-        else:
-            query = "EXEC sp_Consultar_Pasillo @id_biblioteca=?"
-            params = (id_biblioteca,)
-        
+        query, params = self._consulta_pasillo(id_biblioteca)
         try:
-            return self.dist_conn.execute_query(node, query, params)
+            return self._cached_query(
+                node, query, params, as_result_set,
+                lambda: self.dist_conn.execute_query(node, query, params, as_result_set,
+                                                     timeout=self._timeout(query)),
+                cached
+            )
         except Exception as e:
             print(f"Error al consultar pasillos: {e}")
             return []
+    
+    def consultar_pasillo_cambios(self, version: int,
+                                  node: str = "FIS") -> Optional[List[Dict[str, Any]]]:
+        """
+        Consulta los pasillos insertados, renumerados o eliminados desde una versión.
+        
+        Args:
+            version: Última versión ya aplicada (ver version_cambios).
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista de pasillos con 'operacion' ('U' o 'D') y 'version_cambio'.
+            None si falló o el nodo no tiene el procedimiento: hay que
+            volver a cargar todo.
+        """
+        return self._consultar_cambios(node, "sp_Cambios_Pasillo", version, "pasillos")
+    
+    def consultar_pasillo_iter(self, id_biblioteca: Optional[str] = None,
+                               node: str = "FIS",
+                               batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que consultar_pasillo, pero entrega los pasillos por lotes sin
+        cargar todo el resultado en memoria.
+        
+        Args:
+            id_biblioteca: ID de la biblioteca (opcional). Si es None, recorre todos.
+            node: Nodo donde ejecutar (por defecto FIS).
+            batch_size: Número de filas pedidas al servidor por lote.
+        
+        Yields:
+            Un diccionario por pasillo.
+        
+        Raises:
+            Exception: Si la consulta falla, aunque sea a mitad del recorrido.
+        """
+        query, params = self._consulta_pasillo(id_biblioteca)
+        return self._iter_query(node, query, params, batch_size, "pasillos")
+    
+    async def consultar_pasillo_async(self, id_biblioteca: Optional[str] = None,
+                                      node: str = "FIS") -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_pasillo."""
+        return await self.async_conn.run(node, self.consultar_pasillo, id_biblioteca, node)
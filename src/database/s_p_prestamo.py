@@ -3,14 +3,28 @@ Gestión de llamadas a procedimientos almacenados de PRESTAMO.
 Este módulo proporciona una interfaz Python para ejecutar los procedimientos
 almacenados CRUD de la tabla PRESTAMO.
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from datetime import date
+from .connection import DEFAULT_BATCH_SIZE
 from .distributed_connection import DistributedConnection
+from .s_p_base import DEFAULT_PAGE_SIZE, SP_Base
 
 
-class SP_Prestamo:
+class SP_Prestamo(SP_Base):
     """Gestiona llamadas a procedimientos almacenados de PRESTAMO."""
     
+    # Parámetros de sp_Insertar_Prestamo y sp_Actualizar_Prestamo
+    _CAMPOS_INSERTAR = ("id_biblioteca", "ISBN", "id_ejemplar", "cedula",
+                        "fecha_prestamo", "fecha_devolucion_tope")
+    _CAMPOS_ACTUALIZAR = ("id_biblioteca", "ISBN", "id_ejemplar", "cedula",
+                          "fecha_prestamo", "fecha_devolucion_nueva")
+    
+    # Clave natural de PRESTAMO, que ordena las páginas de sp_Pagina_Prestamo
+    _CLAVE = ("id_biblioteca", "ISBN", "id_ejemplar", "cedula", "fecha_prestamo")
+    
+    # Segundos máximos por procedimiento o vista (el resto usa query_timeout del nodo)
+    TIMEOUTS = {"sp_Consultar_Prestamo": 15, "sp_Pagina_Prestamo": 15, "v_Prestamo": 15}
+    
     def __init__(self, dist_conn: DistributedConnection):
         """
         Inicializa el gestor de procedimientos almacenados de PRESTAMO.
@@ -54,7 +68,8 @@ class SP_Prestamo:
             self.dist_conn.execute_non_query(
                 node, query, 
                 (id_biblioteca, ISBN, id_ejemplar, cedula, 
-                 fecha_prestamo, fecha_devolucion_tope)
+                 fecha_prestamo, fecha_devolucion_tope),
+                timeout=self._timeout(query)
             )
             print(f"Préstamo registrado exitosamente en nodo {node}")
             return True
@@ -96,7 +111,8 @@ class SP_Prestamo:
             self.dist_conn.execute_non_query(
                 node, query,
                 (id_biblioteca, ISBN, id_ejemplar, cedula, 
-                 fecha_prestamo, fecha_devolucion_nueva)
+                 fecha_prestamo, fecha_devolucion_nueva),
+                timeout=self._timeout(query)
             )
             print(f"Devolución registrada correctamente en nodo {node}")
             return True
@@ -104,6 +120,40 @@ class SP_Prestamo:
             print(f"Error al actualizar préstamo: {e}")
             return False
     
+    def insertar_prestamos(self, prestamos: List[Dict[str, Any]],
+                           node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Inserta muchos préstamos en un solo viaje y una sola transacción.
+        
+        Args:
+            prestamos: Un diccionario por préstamo con las claves id_biblioteca,
+                      ISBN, id_ejemplar, cedula, fecha_prestamo y
+                      fecha_devolucion_tope.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por préstamo, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Insertar_Prestamo", self._CAMPOS_INSERTAR,
+                                   prestamos, "insertar préstamos")
+    
+    def actualizar_prestamos(self, prestamos: List[Dict[str, Any]],
+                             node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Registra muchas devoluciones en un solo viaje y una sola transacción.
+        
+        Args:
+            prestamos: Un diccionario por préstamo con las claves id_biblioteca,
+                      ISBN, id_ejemplar, cedula, fecha_prestamo y
+                      fecha_devolucion_nueva.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por préstamo, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Actualizar_Prestamo", self._CAMPOS_ACTUALIZAR,
+                                   prestamos, "actualizar préstamos")
+    
     def eliminar_prestamo(self,
                          id_biblioteca: str,
                          ISBN: str,
@@ -134,7 +184,8 @@ class SP_Prestamo:
         try:
             self.dist_conn.execute_non_query(
                 node, query,
-                (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo)
+                (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo),
+                timeout=self._timeout(query)
             )
             print(f"Préstamo eliminado correctamente en nodo {node}")
             return True
@@ -142,32 +193,114 @@ class SP_Prestamo:
             print(f"Error al eliminar préstamo: {e}")
             return False
     
+    def _consulta_prestamo(self, id_biblioteca: Optional[str]) -> tuple:
+        """Construye la llamada a sp_Consultar_Prestamo y sus parámetros."""
+        if id_biblioteca is None:
+            return "EXEC sp_Consultar_Prestamo", ()
+        return "EXEC sp_Consultar_Prestamo @id_biblioteca=?", (id_biblioteca,)
+    
     def consultar_prestamo(self, 
                           id_biblioteca: Optional[str] = None,
-                          node: str = "FIS") -> List[Dict[str, Any]]:
+                          node: str = "FIS",
+                          as_result_set: bool = False,
+                          cached: bool = True) -> List[Dict[str, Any]]:
         """
         Consulta préstamos de la base de datos.
+        El resultado se guarda en la caché de la conexión hasta que venza
+        o se modifique PRESTAMO.
         
         Args:
             id_biblioteca: ID de la biblioteca (opcional). Si es None, devuelve todos.
             node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            cached: Si es False, se consulta el nodo sin usar ni llenar la
+                   caché (cargas completas de DeltaSync, que deben
+                   corresponder a la versión de cambios recién leída).
         
         Returns:
-            Lista de diccionarios con los datos de los préstamos.
+            Lista de diccionarios (o ResultSet si as_result_set es True)
+            con los datos de los préstamos.
         """
-        if id_biblioteca is None:
-            query = "EXEC sp_Consultar_Prestamo"
-            params = ()
-        else:
-            query = "EXEC sp_Consultar_Prestamo @id_biblioteca=?"
-            params = (id_biblioteca,)
-        
+        query, params = self._consulta_prestamo(id_biblioteca)
         try:
-            return self.dist_conn.execute_query(node, query, params)
+            return self._cached_query(
+                node, query, params, as_result_set,
+                lambda: self.dist_conn.execute_query(node, query, params, as_result_set,
+                                                     timeout=self._timeout(query)),
+                cached
+            )
         except Exception as e:
             print(f"Error al consultar préstamos: {e}")
             return []
     
+    def consultar_prestamo_cambios(self, version: int,
+                                   node: str = "FIS") -> Optional[List[Dict[str, Any]]]:
+        """
+        Consulta los préstamos registrados, devueltos o eliminados desde una versión.
+        
+        Args:
+            version: Última versión ya aplicada (ver version_cambios).
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista de préstamos con 'operacion' ('U' o 'D', este último solo
+            con la clave) y 'version_cambio'.
+            None si falló o el nodo no tiene el procedimiento: hay que
+            volver a cargar todo.
+        """
+        return self._consultar_cambios(node, "sp_Cambios_Prestamo", version, "préstamos")
+    
+    def consultar_prestamo_page(self,
+                                after_key: Optional[Tuple] = None,
+                                limit: int = DEFAULT_PAGE_SIZE,
+                                node: str = "FIS",
+                                as_result_set: bool = False) -> List[Dict[str, Any]]:
+        """
+        Consulta una página del historial de préstamos, ordenado por su clave
+        (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo). Cada
+        página cuesta lo mismo sin importar cuánto historial haya antes.
+        
+        Args:
+            after_key: Clave del último préstamo de la página anterior, o None
+                      para la primera página.
+            limit: Número máximo de préstamos.
+            node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+        
+        Returns:
+            Lista de diccionarios (o ResultSet si as_result_set es True);
+            menos de limit préstamos si es la última página.
+        
+        Raises:
+            Exception: Si la consulta falla.
+        """
+        return self._consultar_pagina(node, "sp_Pagina_Prestamo", self._CLAVE, after_key,
+                                      limit, as_result_set, "préstamos")
+    
+    def consultar_prestamo_pages(self,
+                                 limit: int = DEFAULT_PAGE_SIZE,
+                                 node: str = "FIS",
+                                 as_result_set: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre todo el historial de préstamos página por página.
+        
+        Args:
+            limit: Número de préstamos por página.
+            node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, cada página es un ResultSet compacto.
+        
+        Yields:
+            Cada página de préstamos (ver consultar_prestamo_page).
+        
+        Raises:
+            Exception: Si falla la consulta de alguna página.
+        """
+        return self._iter_pages(
+            lambda after_key, limit: self.consultar_prestamo_page(after_key, limit, node,
+                                                                  as_result_set),
+            self._CLAVE, limit
+        )
+    
     def consultar_prestamos_activos(self, node: str = "FIS") -> List[Dict[str, Any]]:
         """
         Consulta préstamos activos (no devueltos).
@@ -180,7 +313,7 @@ class SP_Prestamo:
         """
         query = "SELECT * FROM v_Prestamo WHERE fecha_devolucion IS NULL"
         try:
-            return self.dist_conn.execute_query(node, query)
+            return self.dist_conn.execute_query(node, query, timeout=self._timeout("v_Prestamo"))
         except Exception as e:
             print(f"Error al consultar préstamos activos: {e}")
             return []
@@ -199,7 +332,43 @@ class SP_Prestamo:
                    WHERE fecha_devolucion IS NULL 
                    AND fecha_devolucion_tope < GETDATE()"""
         try:
-            return self.dist_conn.execute_query(node, query)
+            return self.dist_conn.execute_query(node, query, timeout=self._timeout("v_Prestamo"))
         except Exception as e:
             print(f"Error al consultar préstamos vencidos: {e}")
             return []
+    
+    def consultar_prestamo_iter(self,
+                                id_biblioteca: Optional[str] = None,
+                                node: str = "FIS",
+                                batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que consultar_prestamo, pero entrega los préstamos por lotes sin
+        cargar todo el historial en memoria.
+        
+        Args:
+            id_biblioteca: ID de la biblioteca (opcional). Si es None, recorre todos.
+            node: Nodo donde ejecutar (por defecto FIS).
+            batch_size: Número de filas pedidas al servidor por lote.
+        
+        Yields:
+            Un diccionario por préstamo.
+        
+        Raises:
+            Exception: Si la consulta falla, aunque sea a mitad del recorrido.
+        """
+        query, params = self._consulta_prestamo(id_biblioteca)
+        return self._iter_query(node, query, params, batch_size, "préstamos")
+    
+    async def consultar_prestamo_async(self,
+                                       id_biblioteca: Optional[str] = None,
+                                       node: str = "FIS") -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_prestamo."""
+        return await self.async_conn.run(node, self.consultar_prestamo, id_biblioteca, node)
+    
+    async def consultar_prestamos_activos_async(self, node: str = "FIS") -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_prestamos_activos."""
+        return await self.async_conn.run(node, self.consultar_prestamos_activos, node)
+    
+    async def consultar_prestamos_vencidos_async(self, node: str = "FIS") -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_prestamos_vencidos."""
+        return await self.async_conn.run(node, self.consultar_prestamos_vencidos, node)
@@ -3,13 +3,34 @@ Gestión de llamadas a procedimientos almacenados de USUARIOS.
 Este módulo proporciona una interfaz Python para ejecutar los procedimientos
 almacenados CRUD de la tabla USUARIOS (fragmentación mixta).
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+from .connection import DEFAULT_BATCH_SIZE
 from .distributed_connection import DistributedConnection
+from .s_p_base import DEFAULT_PAGE_SIZE, DEFAULT_SEARCH_LIMIT, SP_Base
 
 
-class SP_Usuarios:
+class SP_Usuarios(SP_Base):
     """Gestiona llamadas a procedimientos almacenados de USUARIOS."""
     
+    # Parámetros de sp_Insertar_Usuario y sp_Actualizar_Usuario
+    _CAMPOS_USUARIO = ("id_biblioteca", "cedula", "nombre_usuario",
+                       "apellido_usuario", "email_usuario", "celular_usuario")
+    
+    # Clave natural de v_Usuario, que ordena las páginas de sp_Pagina_Usuario
+    _CLAVE = ("id_biblioteca", "cedula")
+    
+    # Segundos máximos por procedimiento (el resto usa query_timeout del nodo).
+    # v_Usuario cruza el servidor vinculado, así que la consulta se corta antes
+    # y las escrituras con fragmentación mixta reciben más margen.
+    TIMEOUTS = {
+        "sp_Consultar_Usuario": 15,
+        "sp_Pagina_Usuario": 15,
+        "sp_Buscar_Usuario": 10,
+        "sp_Insertar_Usuario": 45,
+        "sp_Actualizar_Usuario": 45,
+        "sp_Eliminar_Usuario": 45,
+    }
+    
     def __init__(self, dist_conn: DistributedConnection):
         """
         Inicializa el gestor de procedimientos almacenados de USUARIOS.
@@ -57,7 +78,8 @@ class SP_Usuarios:
             self.dist_conn.execute_non_query(
                 node, query,
                 (id_biblioteca, cedula, nombre_usuario, apellido_usuario,
-                 email_usuario, celular_usuario)
+                 email_usuario, celular_usuario),
+                timeout=self._timeout(query)
             )
             print(f"Usuario registrado correctamente en nodo {node} (Fragmentación Mixta)")
             return True
@@ -103,7 +125,8 @@ class SP_Usuarios:
             self.dist_conn.execute_non_query(
                 node, query,
                 (id_biblioteca, cedula, nombre_usuario, apellido_usuario,
-                 email_usuario, celular_usuario)
+                 email_usuario, celular_usuario),
+                timeout=self._timeout(query)
             )
             print(f"Datos de usuario actualizados en nodo {node}")
             return True
@@ -111,6 +134,38 @@ class SP_Usuarios:
             print(f"Error al actualizar usuario: {e}")
             return False
     
+    def insertar_usuarios(self, usuarios: List[Dict[str, Any]],
+                          node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Inserta muchos usuarios en un solo viaje y una sola transacción.
+        
+        Args:
+            usuarios: Un diccionario por usuario con las claves id_biblioteca,
+                     cedula, nombre_usuario, apellido_usuario, email_usuario
+                     y celular_usuario.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por usuario, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Insertar_Usuario", self._CAMPOS_USUARIO,
+                                   usuarios, "insertar usuarios")
+    
+    def actualizar_usuarios(self, usuarios: List[Dict[str, Any]],
+                            node: str = "FIS") -> List[Tuple[bool, str]]:
+        """
+        Actualiza muchos usuarios en un solo viaje y una sola transacción.
+        
+        Args:
+            usuarios: Un diccionario por usuario con las mismas claves que insertar_usuarios.
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista (éxito, mensaje de error) por usuario, en el mismo orden.
+        """
+        return self._execute_batch(node, "sp_Actualizar_Usuario", self._CAMPOS_USUARIO,
+                                   usuarios, "actualizar usuarios")
+    
     def eliminar_usuario(self,
                         id_biblioteca: str,
                         cedula: str,
@@ -134,16 +189,25 @@ class SP_Usuarios:
                    @id_biblioteca=?, 
                    @cedula=?"""
         try:
-            self.dist_conn.execute_non_query(node, query, (id_biblioteca, cedula))
+            self.dist_conn.execute_non_query(node, query, (id_biblioteca, cedula),
+                                             timeout=self._timeout(query))
             print(f"Usuario eliminado del sistema en nodo {node}")
             return True
         except Exception as e:
             print(f"Error al eliminar usuario: {e}")
             return False
     
+    def _consulta_usuario(self, cedula: Optional[str]) -> tuple:
+        """Construye la llamada a sp_Consultar_Usuario y sus parámetros."""
+        if cedula is None:
+            return "EXEC sp_Consultar_Usuario", ()
+        return "EXEC sp_Consultar_Usuario @cedula=?", (cedula,)
+    
     def consultar_usuario(self,
                          cedula: Optional[str] = None,
-                         node: str = "FIS") -> List[Dict[str, Any]]:
+                         node: str = "FIS",
+                         as_result_set: bool = False,
+                         cached: bool = True) -> List[Dict[str, Any]]:
         """
         Consulta usuarios de la base de datos usando la vista.
         
@@ -151,22 +215,154 @@ class SP_Usuarios:
         - Usuario_contacto (vertical)
         - Usuarios_info_01 y Usuarios_info_02 (horizontal)
         
+        El resultado se guarda en la caché de la conexión hasta que venza
+        o se modifique algún usuario.
+        
         Args:
             cedula: Cédula del usuario (opcional). Si es None, devuelve todos.
             node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+            cached: Si es False, se consulta el nodo sin usar ni llenar la
+                   caché (cargas completas de DeltaSync, que deben
+                   corresponder a la versión de cambios recién leída).
         
         Returns:
-            Lista de diccionarios con los datos de los usuarios.
+            Lista de diccionarios (o ResultSet si as_result_set es True)
+            con los datos de los usuarios.
         """
-        if cedula is None:
-            query = "EXEC sp_Consultar_Usuario"
-            params = ()
-        else:
-            query = "EXEC sp_Consultar_Usuario @cedula=?"
-            params = (cedula,)
-        
+        query, params = self._consulta_usuario(cedula)
         try:
-            return self.dist_conn.execute_query(node, query, params)
+            return self._cached_query(
+                node, query, params, as_result_set,
+                lambda: self.dist_conn.execute_query(node, query, params, as_result_set,
+                                                     timeout=self._timeout(query)),
+                cached
+            )
         except Exception as e:
             print(f"Error al consultar usuarios: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def consultar_usuario_cambios(self, version: int,
+                                  node: str = "FIS") -> Optional[List[Dict[str, Any]]]:
+        """
+        Consulta los usuarios insertados, modificados o eliminados desde una versión.
+        
+        Args:
+            version: Última versión ya aplicada (ver version_cambios).
+            node: Nodo donde ejecutar (por defecto FIS).
+        
+        Returns:
+            Lista de usuarios con 'operacion' ('U' o 'D', este último solo
+            con id_biblioteca y cédula) y 'version_cambio'.
+            None si falló o el nodo no tiene el procedimiento: hay que
+            volver a cargar todo.
+        """
+        return self._consultar_cambios(node, "sp_Cambios_Usuario", version, "usuarios")
+    
+    def buscar_usuario(self,
+                       texto: str,
+                       limit: int = DEFAULT_SEARCH_LIMIT,
+                       id_biblioteca: Optional[str] = None,
+                       node: str = "FIS",
+                       as_result_set: bool = False) -> List[Dict[str, Any]]:
+        """
+        Busca usuarios en el servidor por el comienzo de su cédula, nombre,
+        apellido o email, usando los índices de cada columna.
+        
+        Args:
+            texto: Comienzo a buscar (sin distinguir mayúsculas).
+            limit: Número máximo de usuarios.
+            id_biblioteca: Solo usuarios de esta biblioteca (opcional).
+            node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+        
+        Returns:
+            Lista de diccionarios (o ResultSet si as_result_set es True),
+            ordenados por apellido y nombre.
+        """
+        query = "EXEC sp_Buscar_Usuario @texto=?, @limite=?, @id_biblioteca=?"
+        try:
+            return self.dist_conn.execute_query(node, query, (texto, limit, id_biblioteca),
+                                                as_result_set, timeout=self._timeout(query))
+        except Exception as e:
+            if not self._note_missing("sp_Buscar_Usuario", e):
+                print(f"Error al buscar usuarios: {e}")
+            return []
+    
+    def consultar_usuario_page(self,
+                               after_key: Optional[Tuple] = None,
+                               limit: int = DEFAULT_PAGE_SIZE,
+                               node: str = "FIS",
+                               as_result_set: bool = False) -> List[Dict[str, Any]]:
+        """
+        Consulta una página de usuarios de v_Usuario, ordenados por
+        (id_biblioteca, cedula).
+        
+        Args:
+            after_key: Tupla (id_biblioteca, cedula) del último usuario de la
+                      página anterior, o None para la primera página.
+            limit: Número máximo de usuarios.
+            node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, devuelve un ResultSet compacto.
+        
+        Returns:
+            Lista de diccionarios (o ResultSet si as_result_set es True);
+            menos de limit usuarios si es la última página.
+        
+        Raises:
+            Exception: Si la consulta falla.
+        """
+        return self._consultar_pagina(node, "sp_Pagina_Usuario", self._CLAVE, after_key,
+                                      limit, as_result_set, "usuarios")
+    
+    def consultar_usuario_pages(self,
+                                limit: int = DEFAULT_PAGE_SIZE,
+                                node: str = "FIS",
+                                as_result_set: bool = False) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Recorre todos los usuarios página por página.
+        
+        Args:
+            limit: Número de usuarios por página.
+            node: Nodo donde ejecutar (por defecto FIS).
+            as_result_set: Si es True, cada página es un ResultSet compacto.
+        
+        Yields:
+            Cada página de usuarios (ver consultar_usuario_page).
+        
+        Raises:
+            Exception: Si falla la consulta de alguna página.
+        """
+        return self._iter_pages(
+            lambda after_key, limit: self.consultar_usuario_page(after_key, limit, node,
+                                                                 as_result_set),
+            self._CLAVE, limit
+        )
+    
+    def consultar_usuario_iter(self,
+                               cedula: Optional[str] = None,
+                               node: str = "FIS",
+                               batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        Igual que consultar_usuario, pero entrega los usuarios por lotes sin
+        cargar todo el resultado en memoria.
+        
+        Args:
+            cedula: Cédula del usuario (opcional). Si es None, recorre todos.
+            node: Nodo donde ejecutar (por defecto FIS).
+            batch_size: Número de filas pedidas al servidor por lote.
+        
+        Yields:
+            Un diccionario por usuario.
+        
+        Raises:
+            Exception: Si la consulta falla, aunque sea a mitad del recorrido.
+        """
+        query, params = self._consulta_usuario(cedula)
+        return self._iter_query(node, query, params, batch_size, "usuarios")
+    
+    async def consultar_usuario_async(self,
+                                      cedula: Optional[str] = None,
+                                      node: str = "FIS") -> List[Dict[str, Any]]:
+        """Versión asíncrona de consultar_usuario."""
+        return await self.async_conn.run(node, self.consultar_usuario, cedula, node)
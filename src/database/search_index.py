@@ -0,0 +1,196 @@
+"""
+Índice de trigramas para buscar texto en resultados cargados en memoria.
+Cada fila se reduce a un texto normalizado (minúsculas y sin tildes) con sus
+columnas de búsqueda. El índice tiene dos niveles: cada palabra distinta
+apunta a las filas que la contienen, y cada trigrama apunta a las palabras
+que lo contienen. Una búsqueda busca primero las palabras que contienen la
+palabra más selectiva del texto (por su trigrama menos frecuente) y solo
+compara las filas de esas palabras, en lugar de recorrer todo el resultado.
+Indexar por palabras y no por fila hace que la construcción cueste según el
+número de palabras, porque el vocabulario se repite mucho entre filas.
+"""
+import re
+import unicodedata
+from array import array
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set
+
+
+_ACCENTS = re.compile(r"[\u0300-\u036f]")
+_WORD = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    """Texto en minúsculas y sin tildes, para comparar sin distinguirlas."""
+    text = text.lower()
+    if text.isascii():
+        return text
+    return _ACCENTS.sub("", unicodedata.normalize("NFKD", text))
+
+
+def trigrams(word: str) -> Set[str]:
+    """Trigramas distintos de una palabra ya normalizada."""
+    return {word[position:position + 3] for position in range(len(word) - 2)}
+
+
+class TrigramIndex:
+    """Índice de trigramas de unas columnas, con actualización por fila."""
+    
+    def __init__(self, columns: Sequence[str]):
+        """
+        Inicializa el índice vacío.
+        
+        Args:
+            columns: Columnas cuyo texto se busca (ej: ISBN y nombre_libro).
+        """
+        self.columns = tuple(columns)
+        self._positions: List[int] = []
+        # clave de la fila -> número interno; número -> clave y texto normalizado
+        self._ids: Dict[Hashable, int] = {}
+        self._keys: Dict[int, Hashable] = {}
+        self._texts: Dict[int, str] = {}
+        # palabra -> números de las filas que la contienen
+        self._rows_by_word: Dict[str, array] = {}
+        # trigrama -> palabras que lo contienen
+        self._words_by_trigram: Dict[str, List[str]] = {}
+        self._next_id = 0
+        self._stale = 0
+    
+    def reset(self, columns: Sequence[str], rows: Dict[Hashable, tuple]):
+        """
+        Reemplaza todo el contenido indexando todas las filas. Con muchas
+        filas conviene hacerlo fuera del hilo de la interfaz, en un índice
+        nuevo que luego se adopta con take() (ver DeltaSync.prepare).
+        
+        Args:
+            columns: Columnas del resultado, en el orden de los valores.
+            rows: Diccionario clave -> valores de la fila.
+        """
+        self._positions = [list(columns).index(column) for column in self.columns]
+        self._ids = {}
+        self._keys = {}
+        self._texts = {}
+        self._rows_by_word = {}
+        self._words_by_trigram = {}
+        self._stale = 0
+        for key, values in rows.items():
+            self.add(key, values)
+    
+    def take(self, other: "TrigramIndex"):
+        """
+        Adopta el contenido de otro índice de las mismas columnas, sin copiarlo.
+        
+        Args:
+            other: Índice ya construido, que deja de usarse.
+        """
+        self._positions = other._positions
+        self._ids = other._ids
+        self._keys = other._keys
+        self._texts = other._texts
+        self._rows_by_word = other._rows_by_word
+        self._words_by_trigram = other._words_by_trigram
+        self._next_id = other._next_id
+        self._stale = other._stale
+    
+    def _text(self, values: tuple) -> str:
+        """Texto de búsqueda de una fila (columnas separadas por un salto de línea)."""
+        return normalize("\n".join(
+            "" if values[position] is None else str(values[position])
+            for position in self._positions
+        ))
+    
+    def _index_row(self, row_id: int, text: str):
+        """Agrega una fila a las listas de sus palabras."""
+        rows_by_word = self._rows_by_word
+        for word in set(_WORD.findall(text)):
+            rows = rows_by_word.get(word)
+            if rows is None:
+                rows = rows_by_word[word] = array("I")
+                for trigram in trigrams(word):
+                    self._words_by_trigram.setdefault(trigram, []).append(word)
+            rows.append(row_id)
+    
+    def add(self, key: Hashable, values: tuple):
+        """
+        Indexa una fila nueva o reemplaza la de la misma clave.
+        
+        Args:
+            key: Clave de la fila.
+            values: Valores en el orden de las columnas de reset().
+        """
+        self.remove(key)
+        row_id = self._next_id
+        self._next_id += 1
+        text = self._text(values)
+        self._ids[key] = row_id
+        self._keys[row_id] = key
+        self._texts[row_id] = text
+        self._index_row(row_id, text)
+    
+    def remove(self, key: Hashable):
+        """
+        Quita una fila. Sus entradas en las listas se descartan al buscar.
+        
+        Args:
+            key: Clave de la fila.
+        """
+        row_id = self._ids.pop(key, None)
+        if row_id is None:
+            return
+        del self._keys[row_id]
+        del self._texts[row_id]
+        self._stale += 1
+        if self._stale > max(len(self._texts), 1000):
+            # Demasiadas entradas muertas: se reconstruye desde los textos vivos
+            self._rows_by_word.clear()
+            self._words_by_trigram.clear()
+            for row_id, text in self._texts.items():
+                self._index_row(row_id, text)
+            self._stale = 0
+    
+    def _rows_with(self, fragment: str) -> List[array]:
+        """Listas de filas de las palabras que contienen un fragmento de palabra."""
+        fragment_trigrams = trigrams(fragment)
+        if fragment_trigrams:
+            candidates = [self._words_by_trigram.get(trigram) for trigram in fragment_trigrams]
+            if any(words is None for words in candidates):
+                return []
+            words: Iterable[str] = min(candidates, key=len)
+        else:
+            # Menos de tres caracteres: se recorre el vocabulario
+            words = self._rows_by_word
+        return [self._rows_by_word[word] for word in words if fragment in word]
+    
+    def search(self, text: str) -> Optional[Set[Hashable]]:
+        """
+        Busca las filas cuyo texto contiene el texto dado.
+        
+        Args:
+            text: Texto a buscar (sin distinguir mayúsculas ni tildes).
+        
+        Returns:
+            Conjunto de claves de las filas encontradas, o None si el texto
+            está vacío (no hay filtro).
+        """
+        query = normalize(text.strip())
+        if not query:
+            return None
+        
+        # Cada palabra del texto buscado está dentro de una palabra de la
+        # fila; basta revisar las filas de la palabra más selectiva
+        fragments = set(_WORD.findall(query))
+        if fragments:
+            candidates: Iterable[int] = set().union(*min(
+                (self._rows_with(fragment) for fragment in fragments),
+                key=lambda lists: sum(map(len, lists))
+            ))
+        else:
+            candidates = self._texts
+        
+        texts, keys = self._texts, self._keys
+        return {
+            keys[row_id] for row_id in candidates
+            if row_id in texts and query in texts[row_id]
+        }
+    
+    def __len__(self) -> int:
+        return len(self._texts)
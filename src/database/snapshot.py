@@ -0,0 +1,212 @@
+"""
+Copia local de los últimos datos cargados.
+Guarda en un archivo SQLite del usuario el último resultado de cada consulta
+completa (catálogo, usuarios, préstamos y pasillos), de modo que al iniciar
+sesión las vistas se dibujen al instante con esos datos mientras se
+consultan los nodos. Cada resultado se guarda como un solo registro JSON con
+sus columnas y sus filas, que se lee de una vez.
+Los resultados se separan por conexión (ver connection_scope), para no
+mostrar los datos de otros servidores, y se borran al cerrar sesión.
+"""
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+from database.result_set import ResultSet
+
+
+def connection_scope(config) -> str:
+    """
+    Identificador de los servidores de una configuración distribuida, usado
+    para separar sus copias locales.
+    
+    Args:
+        config: DistributedDatabaseConfig de la conexión.
+    
+    Returns:
+        Resumen hexadecimal de los servidores, bases y archivos de cada nodo.
+    """
+    nodes = sorted(
+        (name.upper(), node.backend, node.server, node.port, node.database,
+         node.sqlite_path, node.sqlite_remote_path)
+        for name, node in config.nodes.items()
+    )
+    return hashlib.sha256(repr(nodes).encode("utf-8")).hexdigest()[:32]
+
+
+def _default_path() -> str:
+    """Ruta del archivo en la carpeta de datos del usuario (DB_SNAPSHOT_PATH la reemplaza)."""
+    path = os.getenv("DB_SNAPSHOT_PATH")
+    if path:
+        return path
+    base = (os.getenv("LOCALAPPDATA") or os.getenv("XDG_DATA_HOME")
+            or os.path.join(os.path.expanduser("~"), ".local", "share"))
+    return os.path.join(base, "bd_distribuidas", "snapshot.db")
+
+
+def _encode(value: Any) -> Any:
+    """Convierte a JSON los tipos que devuelven los nodos y JSON no admite."""
+    if isinstance(value, datetime.datetime):
+        return {"$": "datetime", "v": value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {"$": "date", "v": value.isoformat()}
+    if isinstance(value, datetime.time):
+        return {"$": "time", "v": value.isoformat()}
+    if isinstance(value, decimal.Decimal):
+        return {"$": "decimal", "v": str(value)}
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$": "bytes", "v": base64.b64encode(bytes(value)).decode("ascii")}
+    raise TypeError(f"Tipo no admitido en la copia local: {type(value).__name__}")
+
+
+_DECODERS = {
+    "datetime": datetime.datetime.fromisoformat,
+    "date": datetime.date.fromisoformat,
+    "time": datetime.time.fromisoformat,
+    "decimal": decimal.Decimal,
+    "bytes": base64.b64decode,
+}
+
+
+def _decode(obj: dict) -> Any:
+    """Recupera los valores convertidos por _encode."""
+    decoder = _DECODERS.get(obj.get("$"))
+    return decoder(obj["v"]) if decoder is not None and "v" in obj else obj
+
+
+class SnapshotStore:
+    """Archivo local con el último ResultSet de cada conjunto de datos."""
+    
+    def __init__(self, path: str):
+        """
+        Inicializa el almacén. El archivo se crea al guardar por primera vez.
+        
+        Args:
+            path: Ruta del archivo SQLite.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        # Aumenta con cada clear(): los guardados pedidos antes se descartan
+        self.session = 0
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Abre el archivo, solo accesible para el usuario, y crea la tabla si no existe."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not os.path.exists(self.path):
+            os.close(os.open(self.path, os.O_CREAT | os.O_WRONLY, 0o600))
+        connection = sqlite3.connect(self.path)
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS resultado (
+                   scope TEXT NOT NULL,
+                   name TEXT NOT NULL,
+                   saved_at REAL NOT NULL,
+                   data TEXT NOT NULL,
+                   PRIMARY KEY (scope, name))"""
+        )
+        return connection
+    
+    def load(self, name: str, scope: str = "") -> Optional[ResultSet]:
+        """
+        Lee el último resultado guardado de un conjunto de datos.
+        
+        Args:
+            name: Nombre del conjunto (ej: 'libros').
+            scope: Conexión a la que pertenece (ver connection_scope).
+        
+        Returns:
+            ResultSet guardado, o None si no existe o no se puede leer.
+        """
+        return self.load_with_version(name, scope)[0]
+    
+    def load_with_version(self, name: str, scope: str = "") -> Tuple[
+            Optional[ResultSet], Optional[int], Optional[str]]:
+        """
+        Lee el último resultado guardado y la versión de cambios a la que
+        corresponde, con el nodo que la dio.
+        
+        Args:
+            name: Nombre del conjunto (ej: 'libros').
+            scope: Conexión a la que pertenece (ver connection_scope).
+        
+        Returns:
+            Tupla (ResultSet o None, versión o None, nodo o None).
+        """
+        if not os.path.exists(self.path):
+            return None, None, None
+        try:
+            with self._lock:
+                connection = self._connect()
+                try:
+                    row = connection.execute(
+                        "SELECT data FROM resultado WHERE scope = ? AND name = ?",
+                        (scope, name)
+                    ).fetchone()
+                finally:
+                    connection.close()
+            if row is None:
+                return None, None, None
+            data = json.loads(row[0], object_hook=_decode)
+            rows = [tuple(values) for values in data["rows"]]
+            return ResultSet(data["columns"], rows), data["version"], data.get("node")
+        except Exception as e:
+            print(f"Error al leer la copia local de {name}: {e}")
+            return None, None, None
+    
+    def save(self, name: str, result: ResultSet, version: Optional[int] = None,
+             scope: str = "", session: Optional[int] = None, node: Optional[str] = None):
+        """
+        Reemplaza el resultado guardado de un conjunto de datos.
+        
+        Args:
+            name: Nombre del conjunto (ej: 'libros').
+            result: Resultado completo recién consultado.
+            version: Versión del registro de cambios a la que corresponde
+                    (ver DeltaSync), para continuar con solo los cambios.
+            scope: Conexión a la que pertenece (ver connection_scope).
+            session: Valor de session al pedir el guardado; si desde entonces
+                    se llamó a clear() (se cerró la sesión), no se guarda.
+            node: Nodo del que se leyó la versión (ver DeltaSync.node).
+        """
+        try:
+            data = json.dumps(
+                {"columns": list(result.columns), "rows": result.rows,
+                 "version": version, "node": node},
+                default=_encode, ensure_ascii=False, separators=(",", ":")
+            )
+            with self._lock:
+                if session is not None and session != self.session:
+                    return
+                connection = self._connect()
+                try:
+                    with connection:
+                        connection.execute(
+                            "INSERT OR REPLACE INTO resultado VALUES (?, ?, ?, ?)",
+                            (scope, name, time.time(), data)
+                        )
+                finally:
+                    connection.close()
+        except Exception as e:
+            print(f"Error al guardar la copia local de {name}: {e}")
+    
+    def clear(self):
+        """Elimina el archivo con todas las copias (al cerrar sesión)."""
+        with self._lock:
+            self.session += 1
+            try:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            except OSError as e:
+                print(f"Error al borrar la copia local: {e}")
+
+
+# Almacén usado por defecto por las vistas
+snapshot_store = SnapshotStore(_default_path())
@@ -0,0 +1,728 @@
+"""
+Backend local con SQLite que emula los nodos FIS y FIQA.
+Cada nodo es un archivo SQLite con sus propios fragmentos; el archivo del
+otro nodo se adjunta (ATTACH) como si fuera el servidor vinculado, y sobre
+ambos se crean las vistas v_* y se emulan los procedimientos sp_* con las
+mismas columnas que devuelve SQL Server. Unos disparadores anotan cada
+escritura en la tabla Cambios, que emula Change Tracking para las
+consultas incrementales sp_Cambios_*; los sp_Pagina_* devuelven los
+resultados grandes por páginas ordenadas por su clave y los sp_Buscar_*
+filtran con índices de texto y de prefijo. Las clases
+SQLiteConnection y SQLiteCursor imitan la parte de la API de pyodbc que usa
+DatabaseConnection, de modo que el resto de la aplicación funciona sin
+cambios y sin servidor.
+"""
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Sequence, Set, Tuple
+
+from config.database import DatabaseConfig
+
+
+# Fragmento horizontal que guarda cada nodo (id_biblioteca)
+FRAGMENTS = {"FIS": "01", "FIQA": "02"}
+# Nodo publicador de la replicación de LIBRO
+PUBLISHER = "FIS"
+# Nombre con el que se adjunta la base del otro nodo
+REMOTE = "remoto"
+
+# Pares de archivos (nodo, otro nodo) cuyo esquema ya se creó en este proceso
+_initialized: Set[Tuple[str, str]] = set()
+_initialized_lock = threading.Lock()
+
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+
+
+class ProcedureError(sqlite3.DatabaseError):
+    """Error lanzado por un procedimiento emulado (equivalente a RAISERROR)."""
+
+
+def _node_tables(fragment: str, with_contact: bool) -> List[str]:
+    """Sentencias CREATE TABLE de los fragmentos de un nodo."""
+    tables = [
+        """CREATE TABLE IF NOT EXISTS {schema}.LIBRO (
+               ISBN TEXT PRIMARY KEY,
+               nombre_libro TEXT NOT NULL,
+               anio_edicion INTEGER,
+               categoria_libro TEXT,
+               lugar_impresion_libro TEXT)""",
+        f"""CREATE TABLE IF NOT EXISTS {{schema}}.Biblioteca_{fragment} (
+               id_biblioteca TEXT PRIMARY KEY,
+               nombre_biblioteca TEXT NOT NULL)""",
+        f"""CREATE TABLE IF NOT EXISTS {{schema}}.Pasillo_{fragment} (
+               id_biblioteca TEXT NOT NULL,
+               num_pasillo INTEGER NOT NULL,
+               PRIMARY KEY (id_biblioteca, num_pasillo))""",
+        f"""CREATE TABLE IF NOT EXISTS {{schema}}.Usuarios_info_{fragment} (
+               id_biblioteca TEXT NOT NULL,
+               cedula TEXT NOT NULL,
+               nombre_usuario TEXT NOT NULL,
+               apellido_usuario TEXT NOT NULL,
+               PRIMARY KEY (id_biblioteca, cedula))""",
+        f"""CREATE TABLE IF NOT EXISTS {{schema}}.Prestamo_{fragment} (
+               id_biblioteca TEXT NOT NULL,
+               ISBN TEXT NOT NULL,
+               id_ejemplar INTEGER NOT NULL,
+               cedula TEXT NOT NULL,
+               fecha_prestamo DATE NOT NULL,
+               fecha_devolucion_tope DATE NOT NULL,
+               fecha_devolucion DATE,
+               PRIMARY KEY (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo))""",
+        f"""INSERT OR IGNORE INTO {{schema}}.Biblioteca_{fragment}
+               VALUES ('{fragment}', 'Biblioteca {fragment}')""",
+    ]
+    if with_contact:
+        # Fragmentación vertical: el contacto de los usuarios solo vive en FIS
+        tables.append(
+            """CREATE TABLE IF NOT EXISTS {schema}.Usuario_contacto (
+                   cedula TEXT PRIMARY KEY,
+                   email_usuario TEXT,
+                   celular_usuario TEXT)"""
+        )
+    
+    # Registro de cambios (equivalente a Change Tracking): cada escritura
+    # anota la clave de la fila con una versión creciente
+    tables += [
+        """CREATE TABLE IF NOT EXISTS {schema}.Cambios (
+               version INTEGER NOT NULL,
+               tabla TEXT NOT NULL,
+               clave TEXT NOT NULL)""",
+        "CREATE INDEX IF NOT EXISTS {schema}.ix_Cambios ON Cambios (tabla, version)",
+        f"""CREATE INDEX IF NOT EXISTS {{schema}}.ix_Usuarios_info_{fragment}_cedula
+               ON Usuarios_info_{fragment} (cedula)""",
+    ]
+    tracked = [
+        ("LIBRO", "LIBRO", ("ISBN",)),
+        (f"Pasillo_{fragment}", "PASILLO", ("id_biblioteca", "num_pasillo")),
+        (f"Prestamo_{fragment}", "PRESTAMO",
+         ("id_biblioteca", "ISBN", "id_ejemplar", "cedula", "fecha_prestamo")),
+        (f"Usuarios_info_{fragment}", "USUARIO", ("id_biblioteca", "cedula")),
+    ]
+    if with_contact:
+        # Un cambio de contacto afecta al usuario en todas sus bibliotecas
+        tracked.append(("Usuario_contacto", "USUARIO", ("NULL", "cedula")))
+    for table, dataset, keys in tracked:
+        tables += _change_triggers(table, dataset, keys)
+    
+    # Índices de búsqueda: texto completo sobre LIBRO (equivalente a un
+    # índice FULLTEXT con CONTAINS) y prefijos sin mayúsculas en los usuarios
+    tables += _search_index()
+    tables.append(
+        """CREATE INDEX IF NOT EXISTS {schema}.ix_LIBRO_categoria
+               ON LIBRO (categoria_libro, nombre_libro)"""
+    )
+    tables += [
+        f"""CREATE INDEX IF NOT EXISTS {{schema}}.ix_Usuarios_info_{fragment}_{column}
+               ON Usuarios_info_{fragment} ({column} COLLATE NOCASE)"""
+        for column in ("nombre_usuario", "apellido_usuario")
+    ]
+    if with_contact:
+        tables.append(
+            """CREATE INDEX IF NOT EXISTS {schema}.ix_Usuario_contacto_email
+                   ON Usuario_contacto (email_usuario COLLATE NOCASE)"""
+        )
+    return tables
+
+
+def _change_triggers(table: str, dataset: str, keys: Sequence[str]) -> List[str]:
+    """Disparadores que anotan en Cambios las claves que modifica cada escritura."""
+    def record(row: str) -> str:
+        values = ", ".join(key if key == "NULL" else f"{row}.{key}" for key in keys)
+        return f"INSERT INTO Cambios VALUES (VERSION_CAMBIO(), '{dataset}', json_array({values}));"
+    
+    rows = {"INSERT": ("NEW",), "UPDATE": ("OLD", "NEW"), "DELETE": ("OLD",)}
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {{schema}}.{table}_cambios_{event.lower()}
+               AFTER {event} ON {table}
+               BEGIN {" ".join(record(row) for row in names)} END"""
+        for event, names in rows.items()
+    ]
+
+
+# Columnas de LIBRO incluidas en la búsqueda de texto
+SEARCH_COLUMNS = ("ISBN", "nombre_libro", "categoria_libro", "lugar_impresion_libro")
+
+
+def _search_index() -> List[str]:
+    """Tabla FTS5 de LIBRO y los disparadores que la mantienen al día."""
+    columns = ", ".join(SEARCH_COLUMNS)
+    
+    def values(row: str) -> str:
+        return ", ".join(f"{row}.{column}" for column in SEARCH_COLUMNS)
+    
+    insert = f"INSERT INTO LIBRO_busqueda (rowid, {columns}) VALUES (NEW.rowid, {values('NEW')});"
+    delete = (f"INSERT INTO LIBRO_busqueda (LIBRO_busqueda, rowid, {columns}) "
+              f"VALUES ('delete', OLD.rowid, {values('OLD')});")
+    events = {"INSERT": insert, "UPDATE": delete + " " + insert, "DELETE": delete}
+    return [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {{schema}}.LIBRO_busqueda USING fts5(
+               {columns}, content='LIBRO', tokenize='unicode61 remove_diacritics 2')"""
+    ] + [
+        f"""CREATE TRIGGER IF NOT EXISTS {{schema}}.LIBRO_busqueda_{event.lower()}
+               AFTER {event} ON LIBRO BEGIN {body} END"""
+        for event, body in events.items()
+    ]
+
+
+# Versión de la última escritura anotada en Cambios por este proceso
+_last_version = 0
+_version_lock = threading.Lock()
+
+
+def _next_version() -> int:
+    """Versión estrictamente creciente para el registro de cambios (µs desde 1970)."""
+    global _last_version
+    with _version_lock:
+        _last_version = max(_last_version + 1, time.time_ns() // 1000)
+        return _last_version
+
+
+# Vista, columnas clave y esquemas con registro de cambios de cada conjunto
+# de datos. LIBRO está completa en cada nodo, así que basta el registro local.
+CHANGE_SOURCES = {
+    "LIBRO": ("LIBRO", ("ISBN",), ("main",)),
+    "PASILLO": ("v_Pasillo", ("id_biblioteca", "num_pasillo"), ("main", REMOTE)),
+    "PRESTAMO": ("v_Prestamo", ("id_biblioteca", "ISBN", "id_ejemplar", "cedula",
+                                "fecha_prestamo"), ("main", REMOTE)),
+    "USUARIO": ("v_Usuario", ("id_biblioteca", "cedula"), ("main", REMOTE)),
+}
+
+
+def _union(table: str) -> str:
+    """Une los fragmentos horizontales de ambos nodos."""
+    return " UNION ALL ".join(
+        f"SELECT * FROM {table}_{fragment}" for fragment in FRAGMENTS.values()
+    )
+
+
+# Vistas globales, iguales en ambos nodos (los nombres se resuelven en la
+# base local o en la adjunta según dónde esté cada fragmento)
+VIEWS = {
+    "v_Biblioteca": _union("Biblioteca"),
+    "v_Pasillo": _union("Pasillo"),
+    "v_Prestamo": _union("Prestamo"),
+    "v_Usuario": f"""SELECT i.id_biblioteca, i.cedula, i.nombre_usuario, i.apellido_usuario,
+                            c.email_usuario, c.celular_usuario
+                     FROM ({_union("Usuarios_info")}) AS i
+                     JOIN Usuario_contacto AS c ON c.cedula = i.cedula""",
+}
+
+
+def _info_table(id_biblioteca: str) -> str:
+    """Fragmento de Usuarios_info de una biblioteca."""
+    return f"Usuarios_info_{_fragment(id_biblioteca)}"
+
+
+def _fragment(id_biblioteca: str) -> str:
+    """Valida id_biblioteca y devuelve el sufijo de su fragmento."""
+    if id_biblioteca not in FRAGMENTS.values():
+        raise ProcedureError(f"Biblioteca '{id_biblioteca}' no válida")
+    return id_biblioteca
+
+
+def _require_change(cursor: sqlite3.Cursor, message: str):
+    """Lanza ProcedureError si la última sentencia no afectó filas."""
+    if cursor.rowcount == 0:
+        raise ProcedureError(message)
+
+
+# --- Procedimientos emulados ------------------------------------------------
+# Cada función recibe el cursor SQLite y los parámetros nombrados del EXEC.
+# Las de consulta dejan el resultado en el cursor con un SELECT final.
+
+def sp_Consultar_Libro(cursor, ISBN=None):
+    """Libros del catálogo, todos o uno por ISBN."""
+    if ISBN is None:
+        cursor.execute("SELECT * FROM LIBRO")
+    else:
+        cursor.execute("SELECT * FROM LIBRO WHERE ISBN = ?", (ISBN,))
+
+
+def sp_Insertar_Libro(cursor, ISBN, nombre_libro, anio_edicion, categoria_libro,
+                      lugar_impresion_libro):
+    """Inserta un libro en el publicador y su réplica."""
+    # Replicación transaccional: el publicador y el suscriptor reciben la fila
+    for schema in ("main", REMOTE):
+        cursor.execute(
+            f"INSERT INTO {schema}.LIBRO VALUES (?, ?, ?, ?, ?)",
+            (ISBN, nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro)
+        )
+
+
+def sp_Actualizar_Libro(cursor, ISBN, nombre_libro, anio_edicion, categoria_libro,
+                        lugar_impresion_libro):
+    """Actualiza un libro en el publicador y su réplica."""
+    for schema in ("main", REMOTE):
+        cursor.execute(
+            f"""UPDATE {schema}.LIBRO SET nombre_libro = ?, anio_edicion = ?,
+                   categoria_libro = ?, lugar_impresion_libro = ? WHERE ISBN = ?""",
+            (nombre_libro, anio_edicion, categoria_libro, lugar_impresion_libro, ISBN)
+        )
+        _require_change(cursor, f"El libro {ISBN} no existe")
+
+
+def sp_Eliminar_Libro(cursor, ISBN):
+    """Elimina un libro del publicador y su réplica."""
+    for schema in ("main", REMOTE):
+        cursor.execute(f"DELETE FROM {schema}.LIBRO WHERE ISBN = ?", (ISBN,))
+        _require_change(cursor, f"El libro {ISBN} no existe")
+
+
+def sp_Consultar_Usuario(cursor, cedula=None):
+    """Usuarios de v_Usuario, todos o uno por cédula."""
+    if cedula is None:
+        cursor.execute("SELECT * FROM v_Usuario")
+    else:
+        cursor.execute("SELECT * FROM v_Usuario WHERE cedula = ?", (cedula,))
+
+
+def sp_Insertar_Usuario(cursor, id_biblioteca, cedula, nombre_usuario, apellido_usuario,
+                        email_usuario, celular_usuario):
+    """Inserta la información en el fragmento de la biblioteca y el contacto en FIS."""
+    cursor.execute(
+        f"INSERT INTO {_info_table(id_biblioteca)} VALUES (?, ?, ?, ?)",
+        (id_biblioteca, cedula, nombre_usuario, apellido_usuario)
+    )
+    cursor.execute(
+        "INSERT OR REPLACE INTO Usuario_contacto VALUES (?, ?, ?)",
+        (cedula, email_usuario, celular_usuario)
+    )
+
+
+def sp_Actualizar_Usuario(cursor, id_biblioteca, cedula, nombre_usuario, apellido_usuario,
+                          email_usuario, celular_usuario):
+    """Actualiza la información y el contacto de un usuario."""
+    cursor.execute(
+        f"""UPDATE {_info_table(id_biblioteca)} SET nombre_usuario = ?, apellido_usuario = ?
+            WHERE cedula = ?""",
+        (nombre_usuario, apellido_usuario, cedula)
+    )
+    _require_change(cursor, f"El usuario {cedula} no existe en la biblioteca {id_biblioteca}")
+    cursor.execute(
+        "UPDATE Usuario_contacto SET email_usuario = ?, celular_usuario = ? WHERE cedula = ?",
+        (email_usuario, celular_usuario, cedula)
+    )
+
+
+def sp_Eliminar_Usuario(cursor, id_biblioteca, cedula):
+    """Elimina al usuario de una biblioteca y su contacto si ya no está en ninguna."""
+    cursor.execute(f"DELETE FROM {_info_table(id_biblioteca)} WHERE cedula = ?", (cedula,))
+    _require_change(cursor, f"El usuario {cedula} no existe en la biblioteca {id_biblioteca}")
+    remaining = " UNION ALL ".join(
+        f"SELECT 1 FROM Usuarios_info_{fragment} WHERE cedula = ?"
+        for fragment in FRAGMENTS.values()
+    )
+    cursor.execute(f"SELECT EXISTS ({remaining})", (cedula,) * len(FRAGMENTS))
+    if not cursor.fetchone()[0]:
+        cursor.execute("DELETE FROM Usuario_contacto WHERE cedula = ?", (cedula,))
+
+
+def sp_Consultar_Pasillo(cursor, id_biblioteca=None):
+    """Pasillos de todas las bibliotecas o de una."""
+    if id_biblioteca is None:
+        cursor.execute("SELECT * FROM v_Pasillo")
+    else:
+        cursor.execute(f"SELECT * FROM Pasillo_{_fragment(id_biblioteca)}")
+
+
+def sp_Insertar_Pasillo(cursor, id_biblioteca, num_pasillo):
+    """Inserta un pasillo en el fragmento de su biblioteca."""
+    cursor.execute(
+        f"INSERT INTO Pasillo_{_fragment(id_biblioteca)} VALUES (?, ?)",
+        (id_biblioteca, num_pasillo)
+    )
+
+
+def sp_Actualizar_Pasillo(cursor, id_biblioteca, num_pasillo_actual, num_pasillo_nuevo):
+    """Cambia el número de un pasillo."""
+    cursor.execute(
+        f"UPDATE Pasillo_{_fragment(id_biblioteca)} SET num_pasillo = ? WHERE num_pasillo = ?",
+        (num_pasillo_nuevo, num_pasillo_actual)
+    )
+    _require_change(cursor, f"El pasillo {num_pasillo_actual} no existe")
+
+
+def sp_Eliminar_Pasillo(cursor, id_biblioteca, num_pasillo):
+    """Elimina un pasillo."""
+    cursor.execute(
+        f"DELETE FROM Pasillo_{_fragment(id_biblioteca)} WHERE num_pasillo = ?",
+        (num_pasillo,)
+    )
+    _require_change(cursor, f"El pasillo {num_pasillo} no existe")
+
+
+def sp_Consultar_Prestamo(cursor, id_biblioteca=None):
+    """Préstamos de todas las bibliotecas o de una."""
+    if id_biblioteca is None:
+        cursor.execute("SELECT * FROM v_Prestamo")
+    else:
+        cursor.execute(f"SELECT * FROM Prestamo_{_fragment(id_biblioteca)}")
+
+
+def sp_Insertar_Prestamo(cursor, id_biblioteca, ISBN, id_ejemplar, cedula,
+                         fecha_prestamo, fecha_devolucion_tope):
+    """Registra un préstamo en el fragmento de su biblioteca."""
+    cursor.execute(
+        f"INSERT INTO Prestamo_{_fragment(id_biblioteca)} VALUES (?, ?, ?, ?, ?, ?, NULL)",
+        (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo, fecha_devolucion_tope)
+    )
+
+
+def sp_Actualizar_Prestamo(cursor, id_biblioteca, ISBN, id_ejemplar, cedula,
+                           fecha_prestamo, fecha_devolucion_nueva):
+    """Registra la devolución de un préstamo."""
+    cursor.execute(
+        f"""UPDATE Prestamo_{_fragment(id_biblioteca)} SET fecha_devolucion = ?
+            WHERE ISBN = ? AND id_ejemplar = ? AND cedula = ? AND fecha_prestamo = ?""",
+        (fecha_devolucion_nueva, ISBN, id_ejemplar, cedula, fecha_prestamo)
+    )
+    _require_change(cursor, "El préstamo no existe")
+
+
+def sp_Eliminar_Prestamo(cursor, id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo):
+    """Elimina un préstamo."""
+    cursor.execute(
+        f"""DELETE FROM Prestamo_{_fragment(id_biblioteca)}
+            WHERE ISBN = ? AND id_ejemplar = ? AND cedula = ? AND fecha_prestamo = ?""",
+        (ISBN, id_ejemplar, cedula, fecha_prestamo)
+    )
+    _require_change(cursor, "El préstamo no existe")
+
+
+def _changes(cursor, dataset: str, version: int):
+    """
+    Filas modificadas de un conjunto de datos desde una versión, como
+    CHANGETABLE(CHANGES ...): una por clave con su último cambio, con
+    operacion 'U' (fila actual) o 'D' (solo la clave) y version_cambio.
+    """
+    view, keys, schemas = CHANGE_SOURCES[dataset]
+    log = " UNION ALL ".join(
+        f"SELECT version, clave FROM {schema}.Cambios WHERE tabla = ? AND version > ?"
+        for schema in schemas
+    )
+    values = [f"json_extract(c.clave, '$[{position}]')" for position in range(len(keys))]
+    # Solo la clave de un cambio de contacto trae id_biblioteca nulo
+    match = " AND ".join(
+        f"({value} IS NULL OR v.{key} = {value})" if dataset == "USUARIO" and key == "id_biblioteca"
+        else f"v.{key} = {value}"
+        for key, value in zip(keys, values)
+    )
+    cursor.execute(f"SELECT * FROM {view} LIMIT 0")
+    columns = [column[0] for column in cursor.description]
+    deleted = ", ".join(
+        values[keys.index(column)] if column in keys else "NULL" for column in columns
+    )
+    cursor.execute(
+        f"""WITH cambio AS (SELECT clave, MAX(version) AS version FROM ({log}) GROUP BY clave)
+            SELECT v.*, 'U' AS operacion, c.version AS version_cambio
+            FROM cambio AS c JOIN {view} AS v ON {match}
+            UNION ALL
+            SELECT {deleted}, 'D', c.version FROM cambio AS c
+            WHERE {values[0]} IS NOT NULL AND NOT EXISTS (SELECT 1 FROM {view} AS v WHERE {match})""",
+        (dataset, version) * len(schemas)
+    )
+
+
+def sp_Version_Cambios(cursor):
+    """Versión actual del registro de cambios (CHANGE_TRACKING_CURRENT_VERSION)."""
+    cursor.execute("SELECT VERSION_CAMBIO() AS version")
+
+
+def sp_Cambios_Libro(cursor, version):
+    """Libros modificados desde una versión."""
+    _changes(cursor, "LIBRO", version)
+
+
+def sp_Cambios_Usuario(cursor, version):
+    """Usuarios modificados desde una versión."""
+    _changes(cursor, "USUARIO", version)
+
+
+def sp_Cambios_Pasillo(cursor, version):
+    """Pasillos modificados desde una versión."""
+    _changes(cursor, "PASILLO", version)
+
+
+def sp_Cambios_Prestamo(cursor, version):
+    """Préstamos modificados desde una versión."""
+    _changes(cursor, "PRESTAMO", version)
+
+
+def _match_expression(texto: str) -> str:
+    """Consulta FTS5 con cada palabra del texto como prefijo (todas deben aparecer)."""
+    words = texto.split()
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def sp_Buscar_Libro(cursor, texto, categoria, limite):
+    """
+    Libros con palabras (en ISBN, nombre, categoría o lugar) que empiezan por
+    cada palabra del texto, ordenados por relevancia, y de una categoría si
+    se indica. Sin texto, los de la categoría por nombre.
+    """
+    params = []
+    if texto and texto.split():
+        query = """SELECT l.* FROM LIBRO_busqueda AS b JOIN LIBRO AS l ON l.rowid = b.rowid
+                   WHERE b.LIBRO_busqueda MATCH ?"""
+        params.append(_match_expression(texto))
+        order = "b.rank"
+    else:
+        query = "SELECT l.* FROM LIBRO AS l WHERE 1 = 1"
+        order = "l.nombre_libro"
+    if categoria:
+        query += " AND l.categoria_libro = ?"
+        params.append(categoria)
+    cursor.execute(f"{query} ORDER BY {order} LIMIT ?", (*params, limite))
+
+
+def sp_Buscar_Usuario(cursor, texto, limite, id_biblioteca=None):
+    """
+    Usuarios cuya cédula, nombre, apellido o email empiezan por el texto
+    (sin distinguir mayúsculas), de una biblioteca si se indica.
+    """
+    desde = (texto or "").strip()
+    hasta = desde + "\U0010ffff"
+    
+    def prefix(column: str) -> str:
+        # La cédula son dígitos: se compara con la intercalación de su índice
+        collate = "" if column == "cedula" else " COLLATE NOCASE"
+        return f"({column}{collate} >= :desde AND {column}{collate} < :hasta)"
+    
+    # Una consulta por columna, para que cada una use su índice
+    searched = [(f"Usuarios_info_{fragment}", column) for fragment in FRAGMENTS.values()
+                for column in ("cedula", "nombre_usuario", "apellido_usuario")]
+    searched.append(("Usuario_contacto", "email_usuario"))
+    matches = " UNION ".join(
+        f"SELECT cedula FROM {table} WHERE {prefix(column)}" for table, column in searched
+    )
+    library = "AND id_biblioteca = :id_biblioteca" if id_biblioteca else ""
+    cursor.execute(
+        f"""SELECT * FROM v_Usuario WHERE cedula IN ({matches}) {library}
+            ORDER BY apellido_usuario, nombre_usuario LIMIT :limite""",
+        {"desde": desde, "hasta": hasta, "id_biblioteca": id_biblioteca, "limite": limite}
+    )
+
+
+def _page(cursor, view: str, keys: Sequence[str], limite: int, after: Sequence[Any]):
+    """
+    Hasta limite filas de una vista en el orden de su clave, a partir de la
+    siguiente a la clave after (paginación por clave, sin OFFSET). Si la
+    clave viene nula se devuelve la primera página. La comparación se
+    escribe columna por columna, como en scripts/sql/paginacion.sql, porque
+    T-SQL no admite comparar filas ((a, b) > (?, ?)).
+    """
+    order = ", ".join(keys)
+    if any(value is None for value in after):
+        cursor.execute(f"SELECT * FROM {view} ORDER BY {order} LIMIT ?", (limite,))
+        return
+    # k1 > ? OR (k1 = ? AND k2 > ?) OR (k1 = ? AND k2 = ? AND k3 > ?) ...
+    terms, params = [], []
+    for position, key in enumerate(keys):
+        equal = [f"{previous} = ?" for previous in keys[:position]]
+        terms.append("(" + " AND ".join(equal + [f"{key} > ?"]) + ")")
+        params.extend(after[:position + 1])
+    cursor.execute(
+        f"SELECT * FROM {view} WHERE {' OR '.join(terms)} ORDER BY {order} LIMIT ?",
+        (*params, limite)
+    )
+
+
+def sp_Pagina_Usuario(cursor, limite, id_biblioteca=None, cedula=None):
+    """Página de v_Usuario siguiente a (id_biblioteca, cedula)."""
+    _page(cursor, "v_Usuario", CHANGE_SOURCES["USUARIO"][1], limite, (id_biblioteca, cedula))
+
+
+def sp_Pagina_Prestamo(cursor, limite, id_biblioteca=None, ISBN=None, id_ejemplar=None,
+                       cedula=None, fecha_prestamo=None):
+    """Página de v_Prestamo siguiente a la clave del último préstamo recibido."""
+    _page(cursor, "v_Prestamo", CHANGE_SOURCES["PRESTAMO"][1], limite,
+          (id_biblioteca, ISBN, id_ejemplar, cedula, fecha_prestamo))
+
+
+PROCEDURES: Dict[str, Callable[..., None]] = {
+    name: function for name, function in list(globals().items())
+    if name.startswith("sp_") and callable(function)
+}
+
+
+# --- Traducción de T-SQL ----------------------------------------------------
+
+_EXEC = re.compile(r"^\s*EXEC(?:UTE)?\s+(\w+)(.*)$", re.IGNORECASE | re.DOTALL)
+_PARAM = re.compile(r"@(\w+)\s*=\s*\?")
+_TRANSLATIONS = [
+    (re.compile(r"^\s*IF @@TRANCOUNT = 0 BEGIN TRANSACTION;\s*SAVE TRANSACTION (\w+)\s*$",
+                re.IGNORECASE), r"SAVEPOINT \1"),
+    (re.compile(r"^\s*ROLLBACK TRANSACTION (\w+)\s*$", re.IGNORECASE), r"ROLLBACK TO \1"),
+    (re.compile(r"^\s*SELECT XACT_STATE\(\)\s*$", re.IGNORECASE), "SELECT 1"),
+    (re.compile(r"@@VERSION", re.IGNORECASE), "'SQLite ' || sqlite_version()"),
+]
+
+
+def translate(query: str) -> str:
+    """Adapta las sentencias T-SQL que usa la aplicación a SQLite."""
+    for pattern, replacement in _TRANSLATIONS:
+        query = pattern.sub(replacement, query)
+    return query
+
+
+class SQLiteCursor:
+    """Cursor con la interfaz de pyodbc.Cursor sobre una conexión SQLite."""
+    
+    def __init__(self, connection: "SQLiteConnection"):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self._timeout = connection.timeout
+        self._rowcount = -1
+        self.fast_executemany = False
+    
+    def execute(self, query: str, params: Sequence[Any] = ()) -> "SQLiteCursor":
+        """Ejecuta una sentencia o la llamada EXEC a un procedimiento emulado."""
+        with self._connection.deadline(self._timeout):
+            match = _EXEC.match(query)
+            if match is None:
+                self._cursor.execute(translate(query), tuple(params))
+                self._rowcount = self._cursor.rowcount
+                return self
+            
+            name, arguments = match.groups()
+            procedure = PROCEDURES.get(name)
+            if procedure is None:
+                raise ProcedureError(f"No se encontró el procedimiento almacenado '{name}'. (2812)")
+            names = _PARAM.findall(arguments)
+            if len(names) != len(params):
+                raise ProcedureError(f"{name}: se esperaban {len(names)} parámetros")
+            procedure(self._cursor, **dict(zip(names, params)))
+            self._rowcount = self._cursor.rowcount
+            return self
+    
+    def executemany(self, query: str, param_rows: Sequence[Sequence[Any]]):
+        """Ejecuta la misma sentencia para cada fila de parámetros."""
+        total = 0
+        for params in param_rows:
+            self.execute(query, params)
+            total += max(self._rowcount, 0)
+        self._rowcount = total
+    
+    @property
+    def description(self):
+        return self._cursor.description
+    
+    @property
+    def rowcount(self) -> int:
+        return self._rowcount
+    
+    def fetchone(self):
+        return self._cursor.fetchone()
+    
+    def fetchmany(self, size: int):
+        return self._cursor.fetchmany(size)
+    
+    def fetchall(self):
+        return self._cursor.fetchall()
+    
+    def nextset(self) -> bool:
+        return False
+    
+    def cancel(self):
+        """Interrumpe la sentencia en curso (seguro desde otro hilo)."""
+        self._connection.raw.interrupt()
+    
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """Conexión con la interfaz de pyodbc.Connection sobre un archivo por nodo."""
+    
+    def __init__(self, config: DatabaseConfig):
+        """
+        Abre la base del nodo, adjunta la del otro nodo y crea el esquema.
+        
+        Args:
+            config: Configuración del nodo; database es el nombre del nodo
+                   (FIS o FIQA) y sqlite_path / sqlite_remote_path sus archivos.
+        """
+        self.node = config.database.upper()
+        if self.node not in FRAGMENTS:
+            raise ProcedureError(f"Nodo '{config.database}' no soportado por el backend SQLite")
+        self.timeout = 0
+        self.raw = sqlite3.connect(
+            config.sqlite_path or ":memory:",
+            timeout=config.connect_timeout or 5,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # El pool garantiza un solo hilo a la vez
+        )
+        self.raw.create_function("GETDATE", 0, lambda: date.today().isoformat())
+        self.raw.create_function("VERSION_CAMBIO", 0, _next_version)
+        self.raw.execute(f"ATTACH DATABASE ? AS {REMOTE}", (config.sqlite_remote_path or ":memory:",))
+        with _initialized_lock:
+            key = (config.sqlite_path, config.sqlite_remote_path)
+            if key not in _initialized or not config.sqlite_path:
+                # WAL permite leer mientras otra conexión del pool escribe
+                for schema in ("main", REMOTE):
+                    self.raw.execute(f"PRAGMA {schema}.journal_mode=WAL")
+                remote = next(node for node in FRAGMENTS if node != self.node)
+                self._create_schema("main", self.node)
+                self._create_schema(REMOTE, remote)
+                self.raw.commit()
+                _initialized.add(key)
+        for view, definition in VIEWS.items():
+            self.raw.execute(f"CREATE TEMP VIEW IF NOT EXISTS {view} AS {definition}")
+        self.raw.commit()
+    
+    def _create_schema(self, schema: str, node: str):
+        """Crea (si faltan) las tablas de los fragmentos de un nodo."""
+        indexed = self.raw.execute(
+            f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'LIBRO_busqueda'"
+        ).fetchone()
+        for statement in _node_tables(FRAGMENTS[node], with_contact=node == PUBLISHER):
+            self.raw.execute(statement.format(schema=schema))
+        if not indexed:
+            # Base creada antes del índice de búsqueda: se indexan los libros que ya tenga
+            self.raw.execute(f"INSERT INTO {schema}.LIBRO_busqueda (LIBRO_busqueda) VALUES ('rebuild')")
+    
+    def deadline(self, seconds: int):
+        """Contexto que interrumpe la sentencia si dura más de seconds (0 = sin límite)."""
+        return _Deadline(self.raw, seconds)
+    
+    def cursor(self) -> SQLiteCursor:
+        return SQLiteCursor(self)
+    
+    def commit(self):
+        self.raw.commit()
+    
+    def rollback(self):
+        self.raw.rollback()
+    
+    def close(self):
+        self.raw.close()
+
+
+class _Deadline:
+    """Límite de tiempo de una sentencia mediante el progress handler de SQLite."""
+    
+    __slots__ = ("raw", "seconds")
+    
+    def __init__(self, raw: sqlite3.Connection, seconds: int):
+        self.raw = raw
+        self.seconds = seconds
+    
+    def __enter__(self):
+        if self.seconds:
+            limit = time.monotonic() + self.seconds
+            self.raw.set_progress_handler(lambda: int(time.monotonic() > limit), 10000)
+    
+    def __exit__(self, exc_type, exc, traceback):
+        if self.seconds:
+            self.raw.set_progress_handler(None, 0)
+        return False
+
+
+def connect(config: DatabaseConfig) -> SQLiteConnection:
+    """Equivalente a pyodbc.connect para el backend SQLite."""
+    return SQLiteConnection(config)
@@ -0,0 +1,68 @@
+"""
+Unidad de trabajo sobre una conexión de un nodo.
+Agrupa varias escrituras (por ejemplo, registrar una devolución y actualizar
+al usuario) en una sola transacción: se confirman juntas al final del bloque
+o se revierten todas si alguna falla.
+"""
+from typing import Any, Dict, List, Optional, Set, Union
+
+from database.connection import DatabaseConnection
+from database.instrumentation import statement_name
+from database.query_cache import written_table
+from database.result_set import ResultSet
+
+
+class UnitOfWork:
+    """Transacción abierta en un nodo, ligada al hilo que la inició."""
+    
+    def __init__(self, node: str, connection: DatabaseConnection):
+        """
+        Inicializa la unidad de trabajo.
+        
+        Args:
+            node: Nombre del nodo de la transacción.
+            connection: Conexión prestada del pool durante toda la transacción.
+        """
+        self.node = node
+        self.connection = connection
+        # Primer error ocurrido dentro de la transacción, aunque el llamador
+        # lo haya capturado (los métodos SP_* informan y devuelven False)
+        self.error: Optional[BaseException] = None
+        # Tablas modificadas, cuyos resultados en caché se descartan al terminar
+        self.written_tables: Set[str] = set()
+    
+    @property
+    def failed(self) -> bool:
+        """Indica si alguna operación de la transacción falló."""
+        return self.error is not None
+    
+    def record_error(self, error: BaseException):
+        """Registra un error para revertir la transacción al terminar."""
+        if self.error is None:
+            self.error = error
+    
+    def execute_query(self, query: str, params: tuple = (),
+                      as_result_set: bool = False,
+                      timeout: Optional[int] = None) -> Union[List[Dict[str, Any]], ResultSet]:
+        """Ejecuta una consulta SELECT dentro de la transacción."""
+        try:
+            return self.connection.execute_query(query, params, as_result_set, timeout)
+        except Exception as e:
+            self.record_error(e)
+            raise
+    
+    def record_write(self, query: str):
+        """Registra la tabla que modifica una escritura de la transacción."""
+        table = written_table(statement_name(query))
+        if table is not None:
+            self.written_tables.add(table)
+    
+    def execute_non_query(self, query: str, params: tuple = (),
+                          timeout: Optional[int] = None) -> int:
+        """Ejecuta una escritura dentro de la transacción, sin confirmarla."""
+        self.record_write(query)
+        try:
+            return self.connection.execute_non_query(query, params, timeout)
+        except Exception as e:
+            self.record_error(e)
+            raise
@@ -1,6 +1,6 @@
 """
 Componentes reutilizables de la interfaz gráfica.
 """
-from .tables import DataTable
+from .tables import DataTable, ResultSetModel, ResultTableView, RowFilter
 from .forms import FormBuilder
 from .dialogs import ConfirmDialog, InputDialog
@@ -1,12 +1,360 @@
 """
 Componente de tabla de datos - PyQt5.
+Las tablas leen directamente de un ResultSet mediante un modelo de Qt: no se
+crea un objeto por celda, y el texto de cada celda se calcula solo cuando la
+vista la dibuja, de modo que mostrar un millón de filas cuesta lo mismo que
+mostrar mil. Los filtros (RowFilter) se compilan en una función sobre las
+tuplas del resultado y se aplican en una sola pasada, con un único cambio de
+disposición de la tabla.
 """
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QTableWidget, QTableWidgetItem,
-    QHeaderView, QAbstractItemView
+    QWidget, QVBoxLayout, QTableView, QHeaderView, QAbstractItemView
 )
-from PyQt5.QtCore import Qt, pyqtSignal
-from typing import List, Dict, Any, Optional
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QBrush, QColor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from database.result_set import ResultSet, Row
+from database.search_index import normalize
+
+
+def _sort_key(value: Any):
+    """Clave de orden que admite valores nulos (van al final)."""
+    return (value is None, value)
+
+
+class RowFilter:
+    """Filtro de filas: texto contenido en unas columnas y valores exactos por campo."""
+    
+    def __init__(
+        self,
+        text: str = "",
+        text_fields: Sequence[str] = (),
+        equals: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Inicializa el filtro.
+        
+        Args:
+            text: Texto a buscar (sin distinguir mayúsculas ni tildes). Vacío
+                 para no filtrar por texto.
+            text_fields: Campos en los que se busca el texto.
+            equals: Valor exigido por campo (ej: {'id_biblioteca': '01'}).
+                   Los valores None no filtran.
+        """
+        self.text = normalize(text.strip())
+        self.text_fields = tuple(text_fields)
+        self.equals = {
+            field: value for field, value in (equals or {}).items() if value is not None
+        }
+    
+    def __bool__(self) -> bool:
+        return bool(self.equals) or bool(self.text and self.text_fields)
+    
+    def compile(self, columns: Sequence[str]) -> Optional[Callable[[tuple], bool]]:
+        """
+        Convierte el filtro en una función sobre las tuplas de un resultado.
+        
+        Args:
+            columns: Columnas del resultado, en el orden de las tuplas.
+        
+        Returns:
+            Función que recibe los valores de una fila y devuelve True si se
+            muestra, o None si el filtro no descarta ninguna fila.
+        """
+        index = {name: position for position, name in enumerate(columns)}
+        if any(field not in index for field in self.equals):
+            # Se exige un campo que el resultado no tiene: ninguna fila cumple
+            return lambda values: False
+        
+        checks = []
+        if self.equals:
+            positions = tuple(index[field] for field in self.equals)
+            expected = tuple(self.equals.values())
+            if len(positions) == 1:
+                position, value = positions[0], expected[0]
+                checks.append(lambda values: values[position] == value)
+            else:
+                checks.append(lambda values: tuple(values[p] for p in positions) == expected)
+        
+        text = self.text
+        text_positions = tuple(index[field] for field in self.text_fields if field in index)
+        if text and text_positions:
+            def contains(values):
+                for position in text_positions:
+                    value = values[position]
+                    if value is not None and text in normalize(str(value)):
+                        return True
+                return False
+            checks.append(contains)
+        
+        if not checks:
+            return None
+        if len(checks) == 1:
+            return checks[0]
+        first, second = checks
+        return lambda values: first(values) and second(values)
+
+
+class ResultSetModel(QAbstractTableModel):
+    """Modelo de solo lectura sobre las filas de un ResultSet."""
+    
+    def __init__(
+        self,
+        fields: Sequence[str],
+        headers: Optional[Sequence[str]] = None,
+        alignments: Optional[Dict[str, int]] = None,
+        formatters: Optional[Dict[str, Callable[[Any], str]]] = None,
+        colors: Optional[Dict[str, Callable[[Any], Any]]] = None,
+        parent=None
+    ):
+        """
+        Inicializa el modelo sin filas.
+        
+        Args:
+            fields: Columnas del resultado que se muestran, en orden.
+            headers: Títulos de las columnas. Si es None, se usan los campos.
+            alignments: Alineación por campo (por defecto, a la izquierda).
+            formatters: Función por campo que convierte el valor en texto
+                       (por defecto str, y los nulos como texto vacío).
+            colors: Función por campo que devuelve el color del texto según
+                   el valor, o None para el color normal.
+            parent: Objeto padre.
+        """
+        super().__init__(parent)
+        self.fields = list(fields)
+        self.headers = list(headers) if headers is not None else list(self.fields)
+        alignments = alignments or {}
+        formatters = formatters or {}
+        colors = colors or {}
+        default_alignment = int(Qt.AlignLeft | Qt.AlignVCenter)
+        self._alignments = [int(alignments.get(field, default_alignment)) for field in self.fields]
+        self._formatters = [formatters.get(field) for field in self.fields]
+        self._colors = [colors.get(field) for field in self.fields]
+        self._result = ResultSet(self.fields)
+        # Filas en el orden mostrado y posición de cada campo en ellas
+        self._rows: List[tuple] = []
+        self._positions: List[Optional[int]] = [None] * len(self.fields)
+        self._sort_column = -1
+        self._sort_order = Qt.AscendingOrder
+        self._filter: Optional[RowFilter] = None
+    
+    @property
+    def result(self) -> ResultSet:
+        """Resultado mostrado, en su orden original."""
+        return self._result
+    
+    def set_result(self, result):
+        """
+        Reemplaza las filas mostradas, conservando el filtro y el orden elegidos.
+        
+        Args:
+            result: ResultSet, o lista de diccionarios con los campos.
+        """
+        if not isinstance(result, ResultSet):
+            result = ResultSet.from_dicts(result or [], self.fields)
+        self.beginResetModel()
+        self._result = result
+        self._positions = [
+            result.columns.index(field) if field in result.columns else None
+            for field in self.fields
+        ]
+        self._apply_view()
+        self.endResetModel()
+    
+    def clear(self):
+        """Quita todas las filas."""
+        self.set_result(ResultSet(self.fields))
+    
+    def _apply_view(self):
+        """Calcula las filas mostradas: filtradas en una pasada y luego ordenadas."""
+        rows = self._result.rows
+        predicate = self._filter.compile(self._result.columns) if self._filter else None
+        if predicate is not None:
+            rows = [values for values in rows if predicate(values)]
+        
+        position = (self._positions[self._sort_column]
+                    if 0 <= self._sort_column < len(self.fields) else None)
+        if position is None:
+            self._rows = rows
+            return
+        reverse = self._sort_order == Qt.DescendingOrder
+        try:
+            self._rows = sorted(rows, key=lambda values: _sort_key(values[position]),
+                                reverse=reverse)
+        except TypeError:
+            # Tipos mezclados en la columna: se ordena por el texto
+            self._rows = sorted(rows, key=lambda values: str(values[position]),
+                                reverse=reverse)
+    
+    def _relayout(self):
+        """Recalcula las filas mostradas con un solo cambio de disposición."""
+        self.layoutAboutToBeChanged.emit()
+        # Las filas seleccionadas siguen seleccionadas en su nueva posición
+        persistent = self.persistentIndexList()
+        keys = [id(self._rows[index.row()]) for index in persistent]
+        self._apply_view()
+        if persistent:
+            tracked = set(keys)
+            moved = {id(values): row for row, values in enumerate(self._rows)
+                     if id(values) in tracked}
+            self.changePersistentIndexList(persistent, [
+                self.index(moved[key], index.column()) if key in moved else QModelIndex()
+                for index, key in zip(persistent, keys)
+            ])
+        self.layoutChanged.emit()
+    
+    def set_filter(self, row_filter: Optional[RowFilter]):
+        """
+        Muestra solo las filas que cumplen un filtro.
+        
+        Args:
+            row_filter: Filtro a aplicar, o None para mostrar todas las filas.
+        """
+        self._filter = row_filter
+        self._relayout()
+    
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+    
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.fields)
+    
+    def value(self, row: int, column: int) -> Any:
+        """Valor original de una celda."""
+        position = self._positions[column]
+        return None if position is None else self._rows[row][position]
+    
+    def text(self, row: int, column: int) -> str:
+        """Texto mostrado en una celda."""
+        value = self.value(row, column)
+        formatter = self._formatters[column]
+        if formatter is not None:
+            return formatter(value)
+        return "" if value is None else str(value)
+    
+    def record(self, row: int) -> Row:
+        """Fila mostrada en una posición, como diccionario de solo lectura."""
+        return self._result.row(self._rows[row])
+    
+    def column(self, field: str) -> List[Any]:
+        """Valores de un campo en las filas mostradas."""
+        position = self._result.columns.index(field)
+        return [values[position] for values in self._rows]
+    
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        column = index.column()
+        if role == Qt.DisplayRole:
+            return self.text(index.row(), column)
+        if role == Qt.TextAlignmentRole:
+            return self._alignments[column]
+        if role == Qt.ForegroundRole and self._colors[column] is not None:
+            color = self._colors[column](self.value(index.row(), column))
+            return None if color is None else QBrush(QColor(color))
+        return None
+    
+    def headerData(self, section: int, orientation, role: int = Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+    
+    def sort(self, column: int, order=Qt.AscendingOrder):
+        """Ordena por una columna (-1 vuelve al orden original)."""
+        self._sort_column = column
+        self._sort_order = order
+        self._relayout()
+
+
+class ResultTableView(QTableView):
+    """Tabla de solo lectura, con selección por filas, sobre un ResultSetModel."""
+    
+    # Señal emitida cuando cambia la fila seleccionada (o se reemplazan las filas)
+    selection_changed = pyqtSignal()
+    
+    def __init__(
+        self,
+        fields: Sequence[str],
+        headers: Optional[Sequence[str]] = None,
+        alignments: Optional[Dict[str, int]] = None,
+        formatters: Optional[Dict[str, Callable[[Any], str]]] = None,
+        colors: Optional[Dict[str, Callable[[Any], Any]]] = None,
+        parent=None
+    ):
+        """
+        Inicializa la tabla vacía.
+        
+        Args:
+            fields: Columnas del resultado que se muestran, en orden.
+            headers: Títulos de las columnas.
+            alignments: Alineación por campo.
+            formatters: Función por campo que convierte el valor en texto.
+            colors: Función por campo que devuelve el color del texto.
+            parent: Widget padre.
+        """
+        super().__init__(parent)
+        self.result_model = ResultSetModel(fields, headers, alignments, formatters, colors, self)
+        self.setModel(self.result_model)
+        
+        self.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.setAlternatingRowColors(True)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        # Sin orden inicial: se ordena al pulsar una cabecera
+        self.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.setSortingEnabled(True)
+        
+        self.selectionModel().selectionChanged.connect(lambda *_: self.selection_changed.emit())
+        self.result_model.modelReset.connect(self.selection_changed.emit)
+    
+    def set_result(self, result):
+        """
+        Muestra un resultado.
+        
+        Args:
+            result: ResultSet, o lista de diccionarios con los campos.
+        """
+        self.result_model.set_result(result)
+    
+    def clear(self):
+        """Quita todas las filas."""
+        self.result_model.clear()
+    
+    def set_filter(self, row_filter: Optional[RowFilter]):
+        """
+        Muestra solo las filas que cumplen un filtro; se mantiene al cambiar
+        el resultado con set_result().
+        
+        Args:
+            row_filter: Filtro a aplicar, o None para mostrar todas las filas.
+        """
+        self.result_model.set_filter(row_filter)
+        self.selection_changed.emit()
+    
+    def row_count(self) -> int:
+        """Número de filas mostradas."""
+        return self.result_model.rowCount()
+    
+    def current_row(self) -> int:
+        """Fila actual, o -1 si no hay ninguna."""
+        index = self.currentIndex()
+        return index.row() if index.isValid() else -1
+    
+    def selected_row(self) -> int:
+        """Fila seleccionada, o -1 si no hay selección."""
+        rows = self.selectionModel().selectedRows()
+        return rows[0].row() if rows else -1
+    
+    def text(self, row: int, column: int) -> str:
+        """Texto mostrado en una celda."""
+        return self.result_model.text(row, column)
+    
+    def record(self, row: int) -> Row:
+        """Valores originales de una fila."""
+        return self.result_model.record(row)
 
 
 class DataTable(QWidget):
@@ -26,13 +374,12 @@ class DataTable(QWidget):
         
         Args:
             columns: Lista de nombres de columnas.
-            data: Datos iniciales para mostrar.
+            data: Datos iniciales para mostrar (ResultSet o lista de diccionarios).
             parent: Widget padre.
         """
         super().__init__(parent)
         
         self.columns = columns
-        self._data: List[Dict[str, Any]] = []
         
         self._create_widgets()
         
@@ -45,15 +392,7 @@ class DataTable(QWidget):
         layout.setContentsMargins(0, 0, 0, 0)
         
         # Crear tabla
-        self.table = QTableWidget()
-        self.table.setColumnCount(len(self.columns))
-        self.table.setHorizontalHeaderLabels(self.columns)
-        
-        # Configurar comportamiento
-        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
-        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
+        self.table = ResultTableView(self.columns)
         
         # Configurar headers
         header = self.table.horizontalHeader()
@@ -62,16 +401,16 @@ class DataTable(QWidget):
         
         # Estilo
         self.table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background-color: white;
                 border: 1px solid #E0E0E0;
                 border-radius: 4px;
                 gridline-color: #E0E0E0;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 5px;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: #2196F3;
                 color: white;
             }
@@ -85,40 +424,28 @@ class DataTable(QWidget):
         """)
         
         # Conectar señal de selección
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)
+        self.table.selection_changed.connect(self._on_selection_changed)
         
         layout.addWidget(self.table)
     
-    def load_data(self, data: List[Dict[str, Any]]):
+    def load_data(self, data):
         """
         Carga datos en la tabla.
         
         Args:
-            data: Lista de diccionarios con los datos.
+            data: ResultSet o lista de diccionarios con los datos.
         """
-        self.clear()
-        self._data = data
-        
-        self.table.setRowCount(len(data))
-        
-        for row_idx, row_data in enumerate(data):
-            for col_idx, col_name in enumerate(self.columns):
-                value = row_data.get(col_name, '')
-                item = QTableWidgetItem(str(value))
-                item.setFlags(item.flags() & ~Qt.ItemIsEditable)
-                self.table.setItem(row_idx, col_idx, item)
+        self.table.set_result(data)
     
     def clear(self):
         """Limpia todos los datos de la tabla."""
-        self._data = []
-        self.table.setRowCount(0)
+        self.table.clear()
     
     def get_selected(self) -> Optional[Dict[str, Any]]:
         """Obtiene la fila seleccionada."""
-        selected_rows = self.table.selectionModel().selectedRows()
-        if selected_rows:
-            row_idx = selected_rows[0].row()
-            return self._data[row_idx] if row_idx < len(self._data) else None
+        row_idx = self.table.selected_row()
+        if row_idx >= 0:
+            return dict(self.table.record(row_idx))
         return None
     
     def _on_selection_changed(self):
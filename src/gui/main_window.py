@@ -1,16 +1,20 @@
 """
 Ventana principal de la aplicación - Sistema de Gestión Bibliotecaria.
 """
+import time
+
 from PyQt5.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QPushButton, QLabel, QFrame, QStackedWidget,
     QMenuBar, QMenu, QAction, QStatusBar, QMessageBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QEvent, QThreadPool, QTimer
 from PyQt5.QtGui import QFont, QIcon
 
 from config.settings import Settings
 from database.connection import DatabaseConnection
+from database.registry import connection_registry
+from database.snapshot import snapshot_store
 from gui.views.login_view import LoginView
 from gui.views.libros_view import LibrosView
 from gui.views.usuarios_view import UsuariosView
@@ -22,11 +26,32 @@ from gui.views.pasillo_view import PasilloView
 class MainWindow(QMainWindow):
     """Ventana principal de la aplicación."""
     
+    # Vistas del panel de contenido, en el orden de los botones de navegación
+    VIEW_CLASSES = (LibrosView, UsuariosView, PrestamosView, EjemplaresView, PasilloView)
+    
+    # Eventos que cuentan como actividad del usuario (ver _prefetch_next_view)
+    INPUT_EVENTS = frozenset((
+        QEvent.KeyPress, QEvent.MouseButtonPress, QEvent.MouseButtonDblClick,
+        QEvent.MouseMove, QEvent.Wheel
+    ))
+    
     def __init__(self):
         """Inicializa la ventana principal."""
         super().__init__()
         self.db_connection = DatabaseConnection()
+        # Conexión distribuida compartida por todas las vistas de la sesión
+        self.dist_conn = None
         self.current_user = None
+        # Vistas ya creadas, por posición en VIEW_CLASSES
+        self._views = {}
+        # Creación anticipada de las vistas aún no abiertas
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(Settings.PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self._prefetch_next_view)
+        # Momento del último uso del teclado o el ratón en la aplicación
+        self._last_input = 0.0
+        QApplication.instance().installEventFilter(self)
         
         self._setup_window()
         self._create_stacked_widget()
@@ -119,6 +144,9 @@ class MainWindow(QMainWindow):
     
     def _show_login(self):
         """Muestra la pantalla de login."""
+        self._prefetch_timer.stop()
+        self._views = {}
+        
         # Limpiar widgets anteriores
         while self.stacked_widget.count() > 0:
             widget = self.stacked_widget.widget(0)
@@ -139,8 +167,16 @@ class MainWindow(QMainWindow):
     def _on_login_success(self, user_data: dict):
         """Maneja el login exitoso."""
         self.current_user = user_data
+        if self.dist_conn is None:
+            self.dist_conn = connection_registry.acquire()
         self._setup_main_interface()
     
+    def _release_connection(self):
+        """Libera la conexión distribuida compartida de la sesión."""
+        if self.dist_conn is not None:
+            self.dist_conn = None
+            connection_registry.release()
+    
     def _setup_main_interface(self):
         """Configura la interfaz principal después del login."""
         # Limpiar stacked widget
@@ -170,18 +206,10 @@ class MainWindow(QMainWindow):
         theme = Settings.get_theme()
         self.content_stack.setStyleSheet(f"background-color: {theme['BG_COLOR']};")
         
-        # Crear vistas con información del usuario para control de acceso
-        self.libros_view = LibrosView(self.db_connection, self.current_user)
-        self.usuarios_view = UsuariosView(self.db_connection, self.current_user)
-        self.prestamos_view = PrestamosView(self.db_connection, self.current_user)
-        self.ejemplares_view = EjemplaresView(self.db_connection, self.current_user)
-        self.pasillo_view = PasilloView(self.db_connection, self.current_user)
-        
-        self.content_stack.addWidget(self.libros_view)
-        self.content_stack.addWidget(self.usuarios_view)
-        self.content_stack.addWidget(self.prestamos_view)
-        self.content_stack.addWidget(self.ejemplares_view)
-        self.content_stack.addWidget(self.pasillo_view)
+        # Las vistas se crean al navegar a ellas (ver _view); al iniciar
+        # sesión solo se carga el catálogo
+        self._prefetch_timer.stop()
+        self._views = {}
         
         main_layout.addWidget(self.content_stack, 1)
         
@@ -193,6 +221,52 @@ class MainWindow(QMainWindow):
         
         # Mostrar vista de libros por defecto
         self._show_books()
+        
+        # Crear las demás vistas cuando la interfaz quede libre
+        if Settings.PREFETCH_VIEWS:
+            self._prefetch_timer.start()
+    
+    def _view(self, index: int) -> QWidget:
+        """
+        Obtiene una vista del panel de contenido, creándola la primera vez.
+        
+        Args:
+            index: Posición de la vista en VIEW_CLASSES.
+        
+        Returns:
+            Vista creada o la existente.
+        """
+        view = self._views.get(index)
+        if view is None:
+            # Crear la vista con información del usuario y la conexión compartida
+            view = self.VIEW_CLASSES[index](self.dist_conn, self.current_user)
+            self._views[index] = view
+            self.content_stack.addWidget(view)
+        return view
+    
+    def eventFilter(self, watched, event) -> bool:
+        """Anota la actividad del usuario; no filtra ningún evento."""
+        if event.type() in self.INPUT_EVENTS:
+            self._last_input = time.monotonic()
+        return super().eventFilter(watched, event)
+    
+    def _prefetch_next_view(self):
+        """
+        Crea la siguiente vista aún no abierta y programa la siguiente. Si el
+        usuario usó hace poco el teclado o el ratón, o hay consultas en curso
+        (por ejemplo, la carga de la vista abierta), se vuelve a intentar más
+        tarde para no competir con ellas.
+        """
+        pending = [index for index in range(len(self.VIEW_CLASSES)) if index not in self._views]
+        if not pending:
+            return
+        idle_ms = (time.monotonic() - self._last_input) * 1000
+        if idle_ms < Settings.PREFETCH_DELAY_MS or QThreadPool.globalInstance().activeThreadCount():
+            self._prefetch_timer.start()
+            return
+        self._view(pending[0])
+        if len(pending) > 1:
+            self._prefetch_timer.start()
     
     def _create_nav_panel(self) -> QFrame:
         """Crea el panel de navegación."""
@@ -368,31 +442,31 @@ class MainWindow(QMainWindow):
     
     def _show_books(self):
         """Muestra la vista de libros."""
-        self.content_stack.setCurrentWidget(self.libros_view)
+        self.content_stack.setCurrentWidget(self._view(0))
         self._update_nav_buttons(0)
         self._update_status("Catálogo de Libros")
     
     def _show_users(self):
         """Muestra la vista de usuarios."""
-        self.content_stack.setCurrentWidget(self.usuarios_view)
+        self.content_stack.setCurrentWidget(self._view(1))
         self._update_nav_buttons(1)
         self._update_status("Usuarios Registrados")
     
     def _show_loans(self):
         """Muestra la vista de préstamos."""
-        self.content_stack.setCurrentWidget(self.prestamos_view)
+        self.content_stack.setCurrentWidget(self._view(2))
         self._update_nav_buttons(2)
         self._update_status("Historial de Préstamos")
     
     def _show_copies(self):
         """Muestra la vista de ejemplares."""
-        self.content_stack.setCurrentWidget(self.ejemplares_view)
+        self.content_stack.setCurrentWidget(self._view(3))
         self._update_nav_buttons(3)
         self._update_status("Ejemplares de Libros")
     
     def _show_pasillos(self):
         """Muestra la vista de pasillos."""
-        self.content_stack.setCurrentWidget(self.pasillo_view)
+        self.content_stack.setCurrentWidget(self._view(4))
         self._update_nav_buttons(4)
         self._update_status("Gestión de Pasillos")
     
@@ -425,6 +499,14 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes:
             self.current_user = None
             self._show_login()
+            self._release_connection()
+            # La copia local tiene datos personales: no se conserva para otro usuario
+            snapshot_store.clear()
+    
+    def closeEvent(self, event):
+        """Cierra las conexiones compartidas al salir de la aplicación."""
+        self._release_connection()
+        super().closeEvent(event)
     
     def _toggle_theme(self):
         """Alterna entre modo claro y oscuro."""
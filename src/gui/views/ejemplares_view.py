@@ -3,17 +3,30 @@ Vista de ejemplares de libros - PyQt5.
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QFrame, QTableWidget,
-    QTableWidgetItem, QHeaderView, QComboBox, QMessageBox
+    QLineEdit, QPushButton, QFrame, QHeaderView,
+    QComboBox, QMessageBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 from config.settings import Settings
+from database.result_set import ResultSet
+from gui.components.tables import ResultTableView, RowFilter
+
+
+# Color del estado de cada ejemplar (los demás estados, como "Dado de baja", en rojo)
+_ESTADO_COLORS = {
+    "Disponible": Qt.darkGreen,
+    "Prestado": Qt.blue,
+    "En reparación": Qt.darkYellow,
+}
 
 
 class EjemplaresView(QWidget):
     """Vista de ejemplares de libros."""
     
+    # Campos: ISBN, Número Ejemplar, Estado Ejemplar, Número Estante, Número Pasillo
+    FIELDS = ("ISBN", "num_ejemplar", "estado_ejemplar", "num_estante", "num_pasillo")
+    
     def __init__(self, db_connection=None, current_user=None):
         """
         Inicializa la vista de ejemplares.
@@ -39,6 +52,12 @@ class EjemplaresView(QWidget):
         else:
             self.allowed_biblioteca = None
         
+        # Filtro de la búsqueda, aplicado cuando se deja de escribir
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(Settings.SEARCH_DELAY_MS)
+        self._filter_timer.timeout.connect(self._filter_copies)
+        
         self._create_widgets()
         self._load_sample_data()
     
@@ -109,7 +128,7 @@ class EjemplaresView(QWidget):
                 color: {theme['TEXT_COLOR']};
             }}
         """)
-        self.search_input.textChanged.connect(self._filter_copies)
+        self.search_input.textChanged.connect(lambda _=None: self._filter_timer.start())
         filter_layout.addWidget(self.search_input, 1)
         
         # Filtro por estado
@@ -134,17 +153,12 @@ class EjemplaresView(QWidget):
         layout.addWidget(filter_frame)
         
         # Tabla de ejemplares
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
-            "ISBN", "Número Ejemplar", "Estado Ejemplar", "Número Estante", "Número Pasillo"
-        ])
-        
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table = ResultTableView(
+            self.FIELDS,
+            ["ISBN", "Número Ejemplar", "Estado Ejemplar", "Número Estante", "Número Pasillo"],
+            alignments={field: Qt.AlignCenter for field in self.FIELDS},
+            colors={'estado_ejemplar': lambda estado: _ESTADO_COLORS.get(estado, Qt.red)}
+        )
         
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
@@ -154,7 +168,7 @@ class EjemplaresView(QWidget):
         header.setSectionResizeMode(4, QHeaderView.ResizeToContents)
         
         self.table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {theme['CARD_BG']};
                 border: 1px solid {theme['BORDER_COLOR']};
                 border-radius: 8px;
@@ -162,11 +176,11 @@ class EjemplaresView(QWidget):
                 color: {theme['TEXT_COLOR']};
                 alternate-background-color: {theme['TABLE_ALT_ROW']};
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 color: {theme['TEXT_COLOR']};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {Settings.PRIMARY_COLOR};
                 color: white;
             }}
@@ -224,73 +238,33 @@ class EjemplaresView(QWidget):
             ("978-0062316097", "1", "Dado de baja", "3", "C"),
         ]
         
-        self._populate_table(sample_copies)
+        self._populate_table(ResultSet(list(self.FIELDS), sample_copies))
     
     def _populate_table(self, copies):
         """Llena la tabla con los ejemplares."""
-        self.table.setRowCount(len(copies))
-        
-        for row, copy in enumerate(copies):
-            for col, value in enumerate(copy):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                
-                # Colorear estado
-                if col == 2:  # Estado Ejemplar
-                    if value == "Disponible":
-                        item.setForeground(Qt.darkGreen)
-                    elif value == "Prestado":
-                        item.setForeground(Qt.blue)
-                    elif value == "En reparación":
-                        item.setForeground(Qt.darkYellow)
-                    else:  # Dado de baja
-                        item.setForeground(Qt.red)
-                
-                self.table.setItem(row, col, item)
-        
+        self.table.set_result(copies)
         self._update_stats()
     
     def _update_stats(self):
         """Actualiza las estadísticas."""
-        total = self.table.rowCount()
-        available = 0
-        loaned = 0
-        
-        for row in range(total):
-            item = self.table.item(row, 2)  # Columna Estado Ejemplar
-            if item:
-                if item.text() == "Disponible":
-                    available += 1
-                elif item.text() == "Prestado":
-                    loaned += 1
+        total = self.table.row_count()
+        estados = self.table.result_model.column('estado_ejemplar')
+        available = estados.count("Disponible")
+        loaned = estados.count("Prestado")
         
         self.total_label.setText(f"Total: {total} ejemplares")
         self.available_label.setText(f"Disponibles: {available}")
         self.loaned_label.setText(f"Prestados: {loaned}")
     
     def _filter_copies(self):
-        """Filtra los ejemplares según la búsqueda."""
-        search_text = self.search_input.text().lower()
+        """Filtra los ejemplares según la búsqueda y el estado."""
         status = self.status_filter.currentText()
-        
-        for row in range(self.table.rowCount()):
-            show = True
-            
-            if search_text:
-                match = False
-                for col in [0, 1]:  # ISBN, Número Ejemplar
-                    item = self.table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match = True
-                        break
-                show = match
-            
-            if show and status != "Todos":
-                status_item = self.table.item(row, 2)  # Estado Ejemplar
-                if status_item and status_item.text() != status:
-                    show = False
-            
-            self.table.setRowHidden(row, not show)
+        self.table.set_filter(RowFilter(
+            self.search_input.text(),
+            ("ISBN", "num_ejemplar"),
+            {'estado_ejemplar': None if status == "Todos" else status}
+        ))
+        self._update_stats()
     
     def _add_copy(self):
         """Abre el diálogo para agregar ejemplar."""
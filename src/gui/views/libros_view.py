@@ -4,16 +4,20 @@ Conectada a la base de datos distribuida.
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QFrame, QTableWidget,
-    QTableWidgetItem, QHeaderView, QComboBox, QMessageBox,
-    QDialog, QFormLayout, QSpinBox
+    QLineEdit, QPushButton, QFrame, QHeaderView,
+    QComboBox, QMessageBox, QDialog, QFormLayout, QSpinBox
 )
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon
 
 from config.settings import Settings
-from database.distributed_connection import DistributedConnection
+from database.delta_sync import DeltaSync, SyncUpdate
+from database.registry import connection_registry
 from database.s_p_libro import SP_Libro
+from database.search_index import TrigramIndex
+from database.snapshot import connection_scope, snapshot_store
+from gui.components.tables import ResultTableView, RowFilter
+from gui.workers import BackgroundLoader, run_in_background
 
 
 class LibrosView(QWidget):
@@ -22,12 +26,13 @@ class LibrosView(QWidget):
     # Señal para solicitar préstamo
     loan_requested = pyqtSignal(dict)
     
-    def __init__(self, db_connection=None, current_user=None):
+    def __init__(self, dist_conn=None, current_user=None):
         """
         Inicializa la vista de libros.
         
         Args:
-            db_connection: Conexión legacy (ignorada, se usa DistributedConnection).
+            dist_conn: Conexión distribuida compartida. Si es None, se toma
+                      del registro de conexiones del proceso.
             current_user: Datos del usuario autenticado para control de acceso.
         """
         super().__init__()
@@ -39,12 +44,52 @@ class LibrosView(QWidget):
         # Para libros (replicación transaccional), todos los gestores tienen CRUD completo
         # No hay filtrado por biblioteca
         
-        # Crear conexión distribuida propia
-        self.dist_conn = DistributedConnection()
+        # Usar la conexión distribuida compartida
+        if dist_conn is None:
+            dist_conn = connection_registry.acquire()
+            self.destroyed.connect(lambda _=None: connection_registry.release())
+        self.dist_conn = dist_conn
         self.sp_libro = SP_Libro(self.dist_conn)
+        # Libros en memoria; tras la primera carga solo se piden los cambios,
+        # a la misma réplica que dio la carga completa
+        self._sync = DeltaSync(
+            ("ISBN",),
+            lambda node, cached: self.sp_libro.consultar_libro(
+                node=node, as_result_set=True, cached=cached
+            ),
+            lambda node, version: self.sp_libro.consultar_libro_cambios(version, node=node),
+            lambda node: self.sp_libro.version_cambios(node, "sp_Cambios_Libro"),
+            self.sp_libro.nodo_lectura
+        )
+        # Índice para buscar en memoria, al día con cada cambio aplicado
+        self._search_index = TrigramIndex(
+            ("ISBN", "nombre_libro", "categoria_libro", "lugar_impresion_libro")
+        )
+        self._sync.attach(self._search_index)
+        # Búsqueda en el servidor, lanzada cuando se deja de escribir
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(Settings.SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._search_books)
         
         self._create_widgets()
-        self.load_data()  # Cargar datos reales de la BD
+        # Las consultas se hacen en el pool de hilos; la vista solo aplica el resultado
+        self._loader = BackgroundLoader(self)
+        self._loader.progress.connect(self.status_label.setText)
+        self._loader.finished.connect(self.status_label.clear)
+        self._loader.loaded.connect(self._on_data_loaded)
+        self._loader.failed.connect(self._on_load_failed)
+        # Las búsquedas en el servidor van aparte, sin cancelar la carga
+        self._search_loader = BackgroundLoader(self)
+        self._search_loader.progress.connect(self.status_label.setText)
+        self._search_loader.finished.connect(self.status_label.clear)
+        self._search_loader.loaded.connect(self._on_search_loaded)
+        self._search_loader.failed.connect(self._on_load_failed)
+        # Copia local de esta conexión: se lee en el pool, se dibuja y luego
+        # se consultan los nodos
+        self._snapshot_scope = connection_scope(self.dist_conn.config)
+        self._snapshot_session = snapshot_store.session
+        self._loader.start(self._fetch_snapshot)
     
     def _create_widgets(self):
         """Crea los widgets de la vista."""
@@ -213,24 +258,18 @@ class LibrosView(QWidget):
                 color: {theme['TEXT_COLOR']};
             }}
         """)
-        self.category_filter.currentTextChanged.connect(self._filter_books)
+        self.category_filter.currentTextChanged.connect(self._filter_category)
         search_layout.addWidget(self.category_filter)
         
         layout.addWidget(search_frame)
         
         # Tabla de libros
-        self.table = QTableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels([
-            "ISBN", "Nombre", "Año de edición", "Categoría", "Lugar de impresión"
-        ])
-        
-        # Configurar tabla
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # Columnas: ISBN, Nombre, Año de edición, Categoría, Lugar de impresión
+        self.table = ResultTableView(
+            ("ISBN", "nombre_libro", "anio_edicion", "categoria_libro", "lugar_impresion_libro"),
+            ["ISBN", "Nombre", "Año de edición", "Categoría", "Lugar de impresión"],
+            alignments={'ISBN': Qt.AlignCenter, 'anio_edicion': Qt.AlignCenter}
+        )
         
         # Configurar headers
         header = self.table.horizontalHeader()
@@ -241,7 +280,7 @@ class LibrosView(QWidget):
         header.setSectionResizeMode(4, QHeaderView.Stretch)
         
         self.table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {theme['CARD_BG']};
                 border: 1px solid {theme['BORDER_COLOR']};
                 border-radius: 8px;
@@ -249,11 +288,11 @@ class LibrosView(QWidget):
                 color: {theme['TEXT_COLOR']};
                 alternate-background-color: {theme['TABLE_ALT_ROW']};
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 color: {theme['TEXT_COLOR']};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {Settings.PRIMARY_COLOR};
                 color: white;
             }}
@@ -267,7 +306,7 @@ class LibrosView(QWidget):
             }}
         """)
         
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)
+        self.table.selection_changed.connect(self._on_selection_changed)
         self.table.doubleClicked.connect(self._show_book_details)
         
         layout.addWidget(self.table, 1)
@@ -286,6 +325,9 @@ class LibrosView(QWidget):
         self.total_label = QLabel("Total: 0 libros")
         self.total_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
         stats_layout.addWidget(self.total_label)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
+        stats_layout.addWidget(self.status_label)
         stats_layout.addStretch()
         self.available_label = QLabel("Disponibles: 0")
         self.available_label.setStyleSheet(f"color: {Settings.SUCCESS_COLOR};")
@@ -293,96 +335,149 @@ class LibrosView(QWidget):
         
         layout.addWidget(stats_frame)
     
+    def _fetch_snapshot(self, progress):
+        """Lee la copia local de la última sesión y prepara sus índices; se ejecuta en el pool."""
+        libros, version, node = snapshot_store.load_with_version(
+            "libros", self._snapshot_scope
+        )
+        if libros is None:
+            return self._fetch_data(progress, None)
+        return self._sync.prepare(SyncUpdate(True, libros, version, node, from_snapshot=True))
+    
     def load_data(self):
-        """Carga los datos de libros desde la base de datos distribuida."""
+        """Consulta el catálogo en segundo plano; el resultado se aplica en _on_data_loaded."""
+        self._loader.start(self._fetch_data, self._sync.checkpoint)
+    
+    def _fetch_data(self, progress, checkpoint):
+        """Consulta los cambios desde checkpoint (o todo); se ejecuta en el pool."""
+        # La versión, la carga completa y los cambios se leen de la réplica
+        # elegida en la última carga completa: la versión solo vale en ese nodo
+        progress("Actualizando...")
+        return self._sync.fetch(checkpoint)
+    
+    def _on_data_loaded(self, update):
+        """Aplica los datos consultados y redibuja la tabla si cambiaron."""
         try:
-            # Consultar libros desde el nodo FIS (publicador en replicación)
-            libros = self.sp_libro.consultar_libro(node="FIS")
+            changed = self._sync.apply(update)
+            if update.from_snapshot:
+                # Datos de la sesión anterior: se dibujan y se consultan los nodos
+                self.load_data()
+            elif changed:
+                run_in_background(snapshot_store.save, "libros", self._sync.result,
+                                  self._sync.version, self._snapshot_scope,
+                                  self._snapshot_session, self._sync.node)
+            if not changed:
+                # Sin cambios (o la consulta falló, ya informado): no se redibuja
+                return
+            libros = self._sync.result
             
-            if libros:
+            if self._searching():
+                # La tabla muestra una búsqueda: se repite sobre los datos nuevos
+                self._filter_books()
+            elif libros:
                 self._populate_table(libros)
             else:
-                self.table.setRowCount(0)
+                self.table.clear()
                 self._update_stats()
                 
         except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Error al cargar libros: {str(e)}"
-            )
+            self._on_load_failed(str(e))
+    
+    def _on_load_failed(self, message):
+        """Informa un error de la carga."""
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Error al cargar libros: {message}"
+        )
     
     def _populate_table(self, libros):
         """Llena la tabla con los libros desde la BD."""
-        self.table.setSortingEnabled(False)
-        
-        self.table.setRowCount(len(libros))
-        
-        for row, libro in enumerate(libros):
-            # Columnas: ISBN, Nombre, Año de edición, Categoría, Lugar de impresión
-            columns = [
-                libro.get('ISBN', ''),
-                libro.get('nombre_libro', ''),
-                libro.get('anio_edicion', ''),
-                libro.get('categoria_libro', ''),
-                libro.get('lugar_impresion_libro', '')
-            ]
-            
-            for col, value in enumerate(columns):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter if col in [0, 2] else Qt.AlignLeft | Qt.AlignVCenter)
-                self.table.setItem(row, col, item)
-        
-        self.table.setSortingEnabled(True)
+        # El modelo lee el ResultSet; solo se dibujan las filas visibles
+        self.table.set_result(libros)
         self._update_stats()
     
     def _update_stats(self):
         """Actualiza las estadísticas."""
-        total = self.table.rowCount()
+        total = self.table.row_count()
         self.total_label.setText(f"Total: {total} libros")
         self.available_label.setText("")
     
+    def _search_on_server(self) -> bool:
+        """
+        Indica si se busca en el servidor: mientras el catálogo no está
+        cargado o si es tan grande que no conviene indexarlo en memoria.
+        """
+        if not self.sp_libro.has_procedure("sp_Buscar_Libro"):
+            return False
+        return not self._sync.loaded or len(self._sync.result) > Settings.SEARCH_SERVER_ROWS
+    
+    def _searching(self) -> bool:
+        """Indica si hay texto de búsqueda (la categoría la filtra la tabla)."""
+        return bool(self.search_input.text().strip())
+    
+    def _search_books(self):
+        """Lanza la búsqueda en el servidor; el resultado se muestra en _on_search_loaded."""
+        if not self._searching():
+            self._search_loader.cancel()
+            self._populate_table(self._sync.result)
+            return
+        category = self.category_filter.currentText()
+        self._search_loader.start(
+            self._fetch_search, self.search_input.text().strip(),
+            None if category == "Todas" else category
+        )
+    
+    def _fetch_search(self, progress, texto, categoria):
+        """Busca los libros en el servidor; se ejecuta en el pool."""
+        progress("Buscando...")
+        return self.sp_libro.buscar_libro(texto, categoria, as_result_set=True)
+    
+    def _on_search_loaded(self, libros):
+        """Muestra los libros encontrados, si la búsqueda sigue siendo en el servidor."""
+        if self._searching() and self._search_on_server():
+            self._populate_table(libros)
+    
     def _filter_books(self):
         """Filtra los libros según la búsqueda."""
-        search_text = self.search_input.text().lower()
-        category = self.category_filter.currentText()
+        if self._search_on_server():
+            # Catálogo sin cargar o grande: se busca en el servidor al dejar
+            # de escribir (la búsqueda anterior ya no sirve)
+            self._search_loader.cancel()
+            self._search_timer.start()
+            return
+        self._search_timer.stop()
+        self._search_loader.cancel()
         
-        for row in range(self.table.rowCount()):
-            show = True
-            
-            # Filtrar por texto
-            if search_text:
-                match = False
-                for col in [1, 2, 3]:  # Título, Autor, ISBN
-                    item = self.table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match = True
-                        break
-                show = match
-            
-            # Filtrar por categoría
-            if show and category != "Todas":
-                cat_item = self.table.item(row, 4)
-                if cat_item and cat_item.text() != category:
-                    show = False
-            
-            self.table.setRowHidden(row, not show)
+        # Solo se dibujan los libros que devuelve el índice, sin recorrer la tabla;
+        # el filtro de categoría de la tabla se aplica sobre ellos
+        matches = self._search_index.search(self.search_input.text())
+        self._populate_table(self._sync.result if matches is None else self._sync.subset(matches))
+    
+    def _filter_category(self):
+        """Filtra los libros mostrados según la categoría elegida."""
+        category = self.category_filter.currentText()
+        self.table.set_filter(RowFilter(
+            equals={'categoria_libro': None if category == "Todas" else category}
+        ))
+        self._update_stats()
+        if self._search_on_server() and self._searching():
+            # La búsqueda en el servidor también filtra por categoría
+            self._search_timer.start()
     
     def _on_selection_changed(self):
         """Maneja el cambio de selección."""
-        selected = self.table.selectedItems()
-        self.loan_btn.setEnabled(len(selected) > 0)
+        self.loan_btn.setEnabled(self.table.selected_row() >= 0)
     
     def _request_loan(self):
         """Solicita un préstamo del libro seleccionado."""
-        selected = self.table.selectedItems()
-        if selected:
-            row = selected[0].row()
+        row = self.table.selected_row()
+        if row >= 0:
             book_data = {
-                'isbn': self.table.item(row, 0).text(),
-                'title': self.table.item(row, 1).text(),
-                'year': self.table.item(row, 2).text(),
-                'category': self.table.item(row, 3).text(),
+                'isbn': self.table.text(row, 0),
+                'title': self.table.text(row, 1),
+                'year': self.table.text(row, 2),
+                'category': self.table.text(row, 3),
             }
             
             reply = QMessageBox.question(
@@ -404,11 +499,11 @@ class LibrosView(QWidget):
         """Muestra los detalles del libro."""
         row = index.row()
         book_info = f"""
-        <b>ISBN:</b> {self.table.item(row, 0).text()}<br>
-        <b>Nombre:</b> {self.table.item(row, 1).text()}<br>
-        <b>Año de edición:</b> {self.table.item(row, 2).text()}<br>
-        <b>Categoría:</b> {self.table.item(row, 3).text()}<br>
-        <b>Lugar de impresión:</b> {self.table.item(row, 4).text()}
+        <b>ISBN:</b> {self.table.text(row, 0)}<br>
+        <b>Nombre:</b> {self.table.text(row, 1)}<br>
+        <b>Año de edición:</b> {self.table.text(row, 2)}<br>
+        <b>Categoría:</b> {self.table.text(row, 3)}<br>
+        <b>Lugar de impresión:</b> {self.table.text(row, 4)}
         """
         
         QMessageBox.information(self, "Detalles del Libro", book_info)
@@ -454,7 +549,7 @@ class LibrosView(QWidget):
     
     def _edit_libro(self):
         """Abre el diálogo para editar el libro seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -465,11 +560,11 @@ class LibrosView(QWidget):
             return
         
         libro_data = {
-            'ISBN': self.table.item(current_row, 0).text(),
-            'nombre_libro': self.table.item(current_row, 1).text(),
-            'anio_edicion': self.table.item(current_row, 2).text(),
-            'categoria_libro': self.table.item(current_row, 3).text(),
-            'lugar_impresion_libro': self.table.item(current_row, 4).text()
+            'ISBN': self.table.text(current_row, 0),
+            'nombre_libro': self.table.text(current_row, 1),
+            'anio_edicion': self.table.text(current_row, 2),
+            'categoria_libro': self.table.text(current_row, 3),
+            'lugar_impresion_libro': self.table.text(current_row, 4)
         }
         
         dialog = LibroDialog(self, modo="editar", libro_data=libro_data)
@@ -511,7 +606,7 @@ class LibrosView(QWidget):
     
     def _delete_libro(self):
         """Elimina el libro seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -521,8 +616,8 @@ class LibrosView(QWidget):
             )
             return
         
-        isbn = self.table.item(current_row, 0).text()
-        nombre = self.table.item(current_row, 1).text()
+        isbn = self.table.text(current_row, 0)
+        nombre = self.table.text(current_row, 1)
         
         reply = QMessageBox.question(
             self,
@@ -4,15 +4,18 @@ Conectada a la base de datos distribuida.
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QFrame, QTableWidget,
-    QTableWidgetItem, QHeaderView, QMessageBox, QDialog,
-    QFormLayout, QComboBox, QSpinBox
+    QLineEdit, QPushButton, QFrame, QHeaderView,
+    QMessageBox, QDialog, QFormLayout, QComboBox, QSpinBox
 )
 from PyQt5.QtCore import Qt
 
 from config.settings import Settings
-from database.distributed_connection import DistributedConnection
+from database.delta_sync import DeltaSync, SyncUpdate
+from database.registry import connection_registry
 from database.s_p_pasillo import SP_Pasillo
+from database.snapshot import connection_scope, snapshot_store
+from gui.components.tables import ResultTableView, RowFilter
+from gui.workers import BackgroundLoader, run_in_background
 
 
 class PasilloDialog(QDialog):
@@ -153,12 +156,13 @@ class PasilloDialog(QDialog):
 class PasilloView(QWidget):
     """Vista de gestión de pasillos."""
     
-    def __init__(self, db_connection=None, current_user=None):
+    def __init__(self, dist_conn=None, current_user=None):
         """
         Inicializa la vista de pasillos.
         
         Args:
-            db_connection: Conexión legacy (ignorada, se usa DistributedConnection).
+            dist_conn: Conexión distribuida compartida. Si es None, se toma
+                      del registro de conexiones del proceso.
             current_user: Datos del usuario autenticado para control de acceso.
         """
         super().__init__()
@@ -177,12 +181,35 @@ class PasilloView(QWidget):
         else:
             self.allowed_biblioteca = None  # Solo lectura
         
-        # Crear conexión distribuida propia
-        self.dist_conn = DistributedConnection()
+        # Usar la conexión distribuida compartida
+        if dist_conn is None:
+            dist_conn = connection_registry.acquire()
+            self.destroyed.connect(lambda _=None: connection_registry.release())
+        self.dist_conn = dist_conn
         self.sp_pasillo = SP_Pasillo(self.dist_conn)
+        # Pasillos en memoria (sin filtrar); tras la primera carga solo se piden los cambios
+        self._sync = DeltaSync(
+            ("id_biblioteca", "num_pasillo"),
+            lambda node, cached: self.sp_pasillo.consultar_pasillo(
+                node=node, as_result_set=True, cached=cached
+            ),
+            lambda node, version: self.sp_pasillo.consultar_pasillo_cambios(version, node=node),
+            lambda node: self.sp_pasillo.version_cambios(node, "sp_Cambios_Pasillo"),
+            lambda: "FIS"
+        )
         
         self._create_widgets()
-        self.load_data()  # Cargar datos reales de la BD
+        # Las consultas se hacen en el pool de hilos; la vista solo aplica el resultado
+        self._loader = BackgroundLoader(self)
+        self._loader.progress.connect(self.status_label.setText)
+        self._loader.finished.connect(self.status_label.clear)
+        self._loader.loaded.connect(self._on_data_loaded)
+        self._loader.failed.connect(self._on_load_failed)
+        # Copia local de esta conexión: se lee en el pool, se dibuja y luego
+        # se consultan los nodos
+        self._snapshot_scope = connection_scope(self.dist_conn.config)
+        self._snapshot_session = snapshot_store.session
+        self._loader.start(self._fetch_snapshot)
     
     def _create_widgets(self):
         """Crea los widgets de la vista."""
@@ -282,24 +309,20 @@ class PasilloView(QWidget):
         layout.addLayout(header_layout)
         
         # Tabla de pasillos
-        self.table = QTableWidget()
-        self.table.setColumnCount(2)
-        self.table.setHorizontalHeaderLabels([
-            "ID Biblioteca", "Número Pasillo"
-        ])
-        
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table = ResultTableView(
+            ("id_biblioteca", "num_pasillo"),
+            ["ID Biblioteca", "Número Pasillo"],
+            alignments={'id_biblioteca': Qt.AlignCenter, 'num_pasillo': Qt.AlignCenter}
+        )
+        # Solo los pasillos de la biblioteca permitida según el rol
+        self.table.set_filter(RowFilter(equals={'id_biblioteca': self.allowed_biblioteca}))
         
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.Stretch)
         header.setSectionResizeMode(1, QHeaderView.Stretch)
         
         self.table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {theme['CARD_BG']};
                 border: 1px solid {theme['BORDER_COLOR']};
                 border-radius: 8px;
@@ -307,11 +330,11 @@ class PasilloView(QWidget):
                 color: {theme['TEXT_COLOR']};
                 alternate-background-color: {theme['TABLE_ALT_ROW']};
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 color: {theme['TEXT_COLOR']};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {Settings.PRIMARY_COLOR};
                 color: white;
             }}
@@ -341,56 +364,69 @@ class PasilloView(QWidget):
         self.total_label = QLabel("Total: 0 pasillos")
         self.total_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
         stats_layout.addWidget(self.total_label)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
+        stats_layout.addWidget(self.status_label)
         stats_layout.addStretch()
         
         layout.addWidget(stats_frame)
     
+    def _fetch_snapshot(self, progress):
+        """Lee la copia local de la última sesión y prepara sus índices; se ejecuta en el pool."""
+        pasillos, version, node = snapshot_store.load_with_version(
+            "pasillos", self._snapshot_scope
+        )
+        if pasillos is None:
+            return self._fetch_data(progress, None)
+        return self._sync.prepare(SyncUpdate(True, pasillos, version, node, from_snapshot=True))
+    
     def load_data(self):
-        """Carga los datos de pasillos desde la base de datos distribuida."""
+        """Consulta los pasillos en segundo plano; el resultado se aplica en _on_data_loaded."""
+        self._loader.start(self._fetch_data, self._sync.checkpoint)
+    
+    def _fetch_data(self, progress, checkpoint):
+        """Consulta los cambios desde checkpoint (o todo); se ejecuta en el pool."""
+        # Consultar pasillos desde el nodo FIS
+        progress("Actualizando...")
+        return self._sync.fetch(checkpoint)
+    
+    def _on_data_loaded(self, update):
+        """Aplica los datos consultados y redibuja la tabla si cambiaron."""
         try:
-            # Consultar pasillos desde el nodo FIS
-            pasillos = self.sp_pasillo.consultar_pasillo(node="FIS")
+            changed = self._sync.apply(update)
+            if update.from_snapshot:
+                # Datos de la sesión anterior: se dibujan y se consultan los nodos
+                self.load_data()
+            elif changed:
+                run_in_background(snapshot_store.save, "pasillos", self._sync.result,
+                                  self._sync.version, self._snapshot_scope,
+                                  self._snapshot_session, self._sync.node)
+            if not changed:
+                # Sin cambios (o la consulta falló, ya informado): no se redibuja
+                return
+            pasillos = self._sync.result
             
-            # Filtrar por biblioteca permitida según rol
-            if self.allowed_biblioteca and pasillos:
-                pasillos = [p for p in pasillos if p.get('id_biblioteca') == self.allowed_biblioteca]
-            
-            if pasillos:
-                self._populate_table(pasillos)
-            else:
-                self.table.setRowCount(0)
-                self._update_stats()
+            self._populate_table(pasillos)
                 
         except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Error al cargar pasillos: {str(e)}"
-            )
+            self._on_load_failed(str(e))
+    
+    def _on_load_failed(self, message):
+        """Informa un error de la carga."""
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Error al cargar pasillos: {message}"
+        )
     
     def _populate_table(self, pasillos):
         """Llena la tabla con los pasillos desde la BD."""
-        self.table.setSortingEnabled(False)
-        
-        self.table.setRowCount(len(pasillos))
-        
-        for row, pasillo in enumerate(pasillos):
-            columns = [
-                pasillo.get('id_biblioteca', ''),
-                pasillo.get('num_pasillo', '')
-            ]
-            
-            for col, value in enumerate(columns):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                self.table.setItem(row, col, item)
-        
-        self.table.setSortingEnabled(True)
+        self.table.set_result(pasillos)
         self._update_stats()
     
     def _update_stats(self):
         """Actualiza las estadísticas."""
-        total = self.table.rowCount()
+        total = self.table.row_count()
         self.total_label.setText(f"Total: {total} pasillos")
     
     def _add_pasillo(self):
@@ -431,7 +467,7 @@ class PasilloView(QWidget):
     
     def _edit_pasillo(self):
         """Abre el diálogo para editar pasillo seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -442,8 +478,8 @@ class PasilloView(QWidget):
             return
         
         pasillo_data = {
-            'id_biblioteca': self.table.item(current_row, 0).text(),
-            'num_pasillo': self.table.item(current_row, 1).text()
+            'id_biblioteca': self.table.text(current_row, 0),
+            'num_pasillo': self.table.text(current_row, 1)
         }
         
         dialog = PasilloDialog(self, modo="editar", pasillo_data=pasillo_data, allowed_biblioteca=self.allowed_biblioteca)
@@ -483,7 +519,7 @@ class PasilloView(QWidget):
     
     def _delete_pasillo(self):
         """Elimina el pasillo seleccionado."""
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -493,8 +529,8 @@ class PasilloView(QWidget):
             )
             return
         
-        id_biblioteca = self.table.item(current_row, 0).text()
-        num_pasillo = int(self.table.item(current_row, 1).text())
+        id_biblioteca = self.table.text(current_row, 0)
+        num_pasillo = int(self.table.text(current_row, 1))
         
         reply = QMessageBox.question(
             self,
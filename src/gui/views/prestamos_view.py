@@ -5,25 +5,30 @@ Conectada a la base de datos distribuida.
 from datetime import date
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QFrame, QTableWidget,
-    QTableWidgetItem, QHeaderView, QComboBox, QMessageBox
+    QLineEdit, QPushButton, QFrame, QHeaderView,
+    QComboBox, QMessageBox
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 from config.settings import Settings
-from database.distributed_connection import DistributedConnection
+from database.delta_sync import DeltaSync, SyncUpdate
+from database.registry import connection_registry
 from database.s_p_prestamo import SP_Prestamo
+from database.snapshot import connection_scope, snapshot_store
+from gui.components.tables import ResultTableView, RowFilter
+from gui.workers import BackgroundLoader, run_in_background
 
 
 class PrestamosView(QWidget):
     """Vista de historial de préstamos."""
     
-    def __init__(self, db_connection=None, current_user=None):
+    def __init__(self, dist_conn=None, current_user=None):
         """
         Inicializa la vista de préstamos.
         
         Args:
-            db_connection: Conexión legacy (ignorada, se usa DistributedConnection).
+            dist_conn: Conexión distribuida compartida. Si es None, se toma
+                      del registro de conexiones del proceso.
             current_user: Datos del usuario autenticado para control de acceso.
         """
         super().__init__()
@@ -42,12 +47,41 @@ class PrestamosView(QWidget):
         else:
             self.allowed_biblioteca = None  # Solo lectura
         
-        # Crear conexión distribuida propia
-        self.dist_conn = DistributedConnection()
+        # Usar la conexión distribuida compartida
+        if dist_conn is None:
+            dist_conn = connection_registry.acquire()
+            self.destroyed.connect(lambda _=None: connection_registry.release())
+        self.dist_conn = dist_conn
         self.sp_prestamo = SP_Prestamo(self.dist_conn)
+        # Préstamos en memoria (sin filtrar); tras la primera carga solo se piden los cambios
+        self._sync = DeltaSync(
+            ("id_biblioteca", "ISBN", "id_ejemplar", "cedula", "fecha_prestamo"),
+            lambda node, cached: self.sp_prestamo.consultar_prestamo(
+                node=node, as_result_set=True, cached=cached
+            ),
+            lambda node, version: self.sp_prestamo.consultar_prestamo_cambios(version, node=node),
+            lambda node: self.sp_prestamo.version_cambios(node, "sp_Cambios_Prestamo"),
+            lambda: "FIS"
+        )
+        # Filtro de la búsqueda, aplicado cuando se deja de escribir
+        self._filter_timer = QTimer(self)
+        self._filter_timer.setSingleShot(True)
+        self._filter_timer.setInterval(Settings.SEARCH_DELAY_MS)
+        self._filter_timer.timeout.connect(self._filter_loans)
         
         self._create_widgets()
-        self.load_data()  # Cargar datos reales de la BD
+        # Las consultas se hacen en el pool de hilos; la vista solo aplica el resultado
+        self._loader = BackgroundLoader(self)
+        self._loader.progress.connect(self.status_label.setText)
+        self._loader.finished.connect(self.status_label.clear)
+        self._loader.loaded.connect(self._on_data_loaded)
+        self._loader.failed.connect(self._on_load_failed)
+        self._filter_loans()
+        # Copia local de esta conexión: se lee en el pool, se dibuja y luego
+        # se consultan los nodos
+        self._snapshot_scope = connection_scope(self.dist_conn.config)
+        self._snapshot_session = snapshot_store.session
+        self._loader.start(self._fetch_snapshot)
     
     def _create_widgets(self):
         """Crea los widgets de la vista."""
@@ -139,23 +173,22 @@ class PrestamosView(QWidget):
                 color: {theme['TEXT_COLOR']};
             }}
         """)
-        self.search_input.textChanged.connect(self._filter_loans)
+        self.search_input.textChanged.connect(lambda _=None: self._filter_timer.start())
         filter_layout.addWidget(self.search_input, 1)
         
         layout.addWidget(filter_frame)
         
         # Tabla de préstamos
-        self.table = QTableWidget()
-        self.table.setColumnCount(7)
-        self.table.setHorizontalHeaderLabels([
-            "ID Biblioteca", "ISBN", "ID Ejemplar", "Cédula", "Fecha Préstamo", "Fecha Devolución", "Fecha Dev. Máx."
-        ])
-        
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # Fecha Devolución: "-" si está pendiente (amarillo) y verde si se devolvió
+        fields = ("id_biblioteca", "ISBN", "id_ejemplar", "cedula",
+                  "fecha_prestamo", "fecha_devolucion", "fecha_devolucion_tope")
+        self.table = ResultTableView(
+            fields,
+            ["ID Biblioteca", "ISBN", "ID Ejemplar", "Cédula", "Fecha Préstamo", "Fecha Devolución", "Fecha Dev. Máx."],
+            alignments={field: Qt.AlignCenter for field in fields},
+            formatters={'fecha_devolucion': lambda value: str(value) if value else "-"},
+            colors={'fecha_devolucion': lambda value: Qt.darkGreen if value else Qt.darkYellow}
+        )
         
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
@@ -167,7 +200,7 @@ class PrestamosView(QWidget):
         header.setSectionResizeMode(6, QHeaderView.ResizeToContents)
         
         self.table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {theme['CARD_BG']};
                 border: 1px solid {theme['BORDER_COLOR']};
                 border-radius: 8px;
@@ -175,11 +208,11 @@ class PrestamosView(QWidget):
                 color: {theme['TEXT_COLOR']};
                 alternate-background-color: {theme['TABLE_ALT_ROW']};
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 color: {theme['TEXT_COLOR']};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {Settings.PRIMARY_COLOR};
                 color: white;
             }}
@@ -193,7 +226,7 @@ class PrestamosView(QWidget):
             }}
         """)
         
-        self.table.itemSelectionChanged.connect(self._on_selection_changed)
+        self.table.selection_changed.connect(self._on_selection_changed)
         
         layout.addWidget(self.table, 1)
         
@@ -211,6 +244,9 @@ class PrestamosView(QWidget):
         self.total_label = QLabel("Total: 0 préstamos")
         self.total_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
         stats_layout.addWidget(self.total_label)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
+        stats_layout.addWidget(self.status_label)
         stats_layout.addStretch()
         
         self.pending_label = QLabel("Pendientes: 0")
@@ -223,131 +259,104 @@ class PrestamosView(QWidget):
         
         layout.addWidget(stats_frame)
     
+    def _fetch_snapshot(self, progress):
+        """Lee la copia local de la última sesión y prepara sus índices; se ejecuta en el pool."""
+        prestamos, version, node = snapshot_store.load_with_version(
+            "prestamos", self._snapshot_scope
+        )
+        if prestamos is None:
+            return self._fetch_data(progress, None)
+        return self._sync.prepare(SyncUpdate(True, prestamos, version, node, from_snapshot=True))
+    
     def load_data(self):
-        """Carga los datos de préstamos desde la base de datos distribuida."""
+        """Consulta los préstamos en segundo plano; el resultado se aplica en _on_data_loaded."""
+        self._loader.start(self._fetch_data, self._sync.checkpoint)
+    
+    def _fetch_data(self, progress, checkpoint):
+        """Consulta los cambios desde checkpoint (o todo); se ejecuta en el pool."""
+        # Consultar préstamos desde el nodo FIS (los SP con vistas están en FIS)
+        progress("Actualizando...")
+        return self._sync.fetch(checkpoint)
+    
+    def _on_data_loaded(self, update):
+        """Aplica los datos consultados y redibuja la tabla si cambiaron."""
         try:
-            # Consultar préstamos desde el nodo FIS (los SP con vistas están en FIS)
-            prestamos = self.sp_prestamo.consultar_prestamo(node="FIS")
-            
-            # Filtrar por biblioteca permitida según rol
-            if self.allowed_biblioteca and prestamos:
-                prestamos = [p for p in prestamos if p.get('id_biblioteca') == self.allowed_biblioteca]
+            changed = self._sync.apply(update)
+            if update.from_snapshot:
+                # Datos de la sesión anterior: se dibujan y se consultan los nodos
+                self.load_data()
+            elif changed:
+                run_in_background(snapshot_store.save, "prestamos", self._sync.result,
+                                  self._sync.version, self._snapshot_scope,
+                                  self._snapshot_session, self._sync.node)
+            if not changed:
+                # Sin cambios (o la consulta falló, ya informado): no se redibuja
+                return
+            prestamos = self._sync.result
             
-            if prestamos:
-                self._populate_table(prestamos)
-            else:
-                self.table.setRowCount(0)
-                self._update_stats()
+            self._populate_table(prestamos)
                 
         except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Error al cargar préstamos: {str(e)}"
-            )
+            self._on_load_failed(str(e))
+    
+    def _on_load_failed(self, message):
+        """Informa un error de la carga."""
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Error al cargar préstamos: {message}"
+        )
     
     def _populate_table(self, prestamos):
         """Llena la tabla con los préstamos desde la BD."""
-        # Deshabilitar sorting temporalmente para evitar problemas
-        self.table.setSortingEnabled(False)
-        
-        self.table.setRowCount(len(prestamos))
-        
-        for row, prestamo in enumerate(prestamos):
-            # Columnas: ID Biblioteca, ISBN, ID Ejemplar, Cédula, Fecha Préstamo, Fecha Devolución, Fecha Dev. Máx.
-            fecha_devolucion = prestamo.get('fecha_devolucion', None)
-            fecha_devolucion_str = str(fecha_devolucion) if fecha_devolucion else "-"
-            
-            columns = [
-                prestamo.get('id_biblioteca', ''),
-                prestamo.get('ISBN', ''),
-                prestamo.get('id_ejemplar', ''),
-                prestamo.get('cedula', ''),
-                str(prestamo.get('fecha_prestamo', '')),
-                fecha_devolucion_str,
-                str(prestamo.get('fecha_devolucion_tope', ''))
-            ]
-            
-            for col, value in enumerate(columns):
-                item = QTableWidgetItem(str(value))
-                item.setTextAlignment(Qt.AlignCenter)
-                
-                # Colorear fecha devolución (pendiente = amarillo, devuelto = verde)
-                if col == 5:  # Fecha Devolución
-                    if value == "-" or value == "None":
-                        item.setForeground(Qt.darkYellow)
-                        item.setText("-")
-                    else:
-                        item.setForeground(Qt.darkGreen)
-                
-                self.table.setItem(row, col, item)
-        
-        # Rehabilitar sorting
-        self.table.setSortingEnabled(True)
-        
+        # El modelo lee el ResultSet; solo se dibujan las filas visibles
+        self.table.set_result(prestamos)
         self._update_stats()
     
     def _update_stats(self):
         """Actualiza las estadísticas."""
-        total = self.table.rowCount()
-        pending = 0
-        returned = 0
-        
-        for row in range(total):
-            item = self.table.item(row, 5)  # Columna Fecha Devolución (índice 5)
-            if item:
-                if item.text() == "-":
-                    pending += 1
-                else:
-                    returned += 1
+        total = self.table.row_count()
+        # Se cuentan sobre los datos mostrados, sin recorrer la tabla
+        pending = sum(
+            1 for fecha in self.table.result_model.column('fecha_devolucion')
+            if not fecha
+        )
+        returned = total - pending
         
         self.total_label.setText(f"Total: {total} préstamos")
         self.pending_label.setText(f"Pendientes: {pending}")
         self.returned_label.setText(f"Devueltos: {returned}")
     
     def _filter_loans(self):
-        """Filtra los préstamos según la búsqueda."""
-        search_text = self.search_input.text().lower()
-        
-        for row in range(self.table.rowCount()):
-            show = True
-            
-            if search_text:
-                match = False
-                for col in [1, 3]:  # ISBN (índice 1), Cédula (índice 3)
-                    item = self.table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match = True
-                        break
-                show = match
-            
-            self.table.setRowHidden(row, not show)
+        """Filtra los préstamos según la búsqueda y la biblioteca permitida según el rol."""
+        self.table.set_filter(RowFilter(
+            self.search_input.text(),
+            ("ISBN", "cedula"),
+            {'id_biblioteca': self.allowed_biblioteca}
+        ))
+        self._update_stats()
     
     def _on_selection_changed(self):
         """Maneja el cambio de selección."""
-        selected = self.table.selectedItems()
-        if selected:
-            row = selected[0].row()
+        row = self.table.selected_row()
+        if row >= 0:
             # Habilitar devolución si no tiene fecha de devolución
-            return_date_item = self.table.item(row, 5)  # Fecha Devolución (índice 5)
             self.return_btn.setEnabled(
-                return_date_item and return_date_item.text() == "-"
+                self.table.text(row, 5) == "-"  # Fecha Devolución (índice 5)
             )
         else:
             self.return_btn.setEnabled(False)
     
     def _register_return(self):
         """Registra la devolución de un préstamo."""
-        selected = self.table.selectedItems()
-        if selected:
-            row = selected[0].row()
-            
+        row = self.table.selected_row()
+        if row >= 0:
             # Obtener datos de la fila seleccionada
-            id_biblioteca = self.table.item(row, 0).text()
-            isbn = self.table.item(row, 1).text()
-            id_ejemplar = int(self.table.item(row, 2).text())
-            cedula = self.table.item(row, 3).text()
-            fecha_prestamo_str = self.table.item(row, 4).text()
+            id_biblioteca = self.table.text(row, 0)
+            isbn = self.table.text(row, 1)
+            id_ejemplar = int(self.table.text(row, 2))
+            cedula = self.table.text(row, 3)
+            fecha_prestamo_str = self.table.text(row, 4)
             
             reply = QMessageBox.question(
                 self,
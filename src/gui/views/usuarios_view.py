@@ -4,26 +4,32 @@ Conectada a la base de datos distribuida.
 """
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QLabel,
-    QLineEdit, QPushButton, QFrame, QTableWidget,
-    QTableWidgetItem, QHeaderView, QMessageBox, QDialog
+    QLineEdit, QPushButton, QFrame, QHeaderView,
+    QMessageBox, QDialog
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 from config.settings import Settings
-from database.distributed_connection import DistributedConnection
+from database.delta_sync import DeltaSync, SyncUpdate
+from database.registry import connection_registry
 from database.s_p_usuarios import SP_Usuarios
+from database.search_index import TrigramIndex
+from database.snapshot import connection_scope, snapshot_store
+from gui.components.tables import ResultTableView, RowFilter
 from gui.dialogs.usuario_dialog import UsuarioDialog
+from gui.workers import BackgroundLoader, run_in_background
 
 
 class UsuariosView(QWidget):
     """Vista de usuarios registrados."""
     
-    def __init__(self, db_connection=None, current_user=None):
+    def __init__(self, dist_conn=None, current_user=None):
         """
         Inicializa la vista de usuarios.
         
         Args:
-            db_connection: Conexión legacy (ignorada, se usa DistributedConnection).
+            dist_conn: Conexión distribuida compartida. Si es None, se toma
+                      del registro de conexiones del proceso.
             current_user: Datos del usuario autenticado para control de acceso.
         """
         super().__init__()
@@ -42,12 +48,54 @@ class UsuariosView(QWidget):
         else:
             self.allowed_biblioteca = None  # Solo lectura
         
-        # Crear conexión distribuida propia
-        self.dist_conn = DistributedConnection()
+        # Usar la conexión distribuida compartida
+        if dist_conn is None:
+            dist_conn = connection_registry.acquire()
+            self.destroyed.connect(lambda _=None: connection_registry.release())
+        self.dist_conn = dist_conn
         self.sp_usuarios = SP_Usuarios(self.dist_conn)
+        # Usuarios en memoria (sin filtrar); tras la primera carga solo se piden los cambios
+        self._sync = DeltaSync(
+            ("id_biblioteca", "cedula"),
+            lambda node, cached: self.sp_usuarios.consultar_usuario(
+                node=node, as_result_set=True, cached=cached
+            ),
+            lambda node, version: self.sp_usuarios.consultar_usuario_cambios(version, node=node),
+            lambda node: self.sp_usuarios.version_cambios(node, "sp_Cambios_Usuario"),
+            lambda: "FIS"
+        )
+        # Índice para buscar en memoria, al día con cada cambio aplicado
+        self._search_index = TrigramIndex(
+            ("cedula", "nombre_usuario", "apellido_usuario", "email_usuario")
+        )
+        self._sync.attach(self._search_index)
+        # Búsqueda en el servidor, lanzada cuando se deja de escribir
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(Settings.SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._search_users)
         
         self._create_widgets()
-        self.load_data()  # Cargar datos reales de la BD
+        # Las consultas se hacen en el pool de hilos; la vista solo aplica el resultado
+        self._loader = BackgroundLoader(self)
+        self._loader.progress.connect(self.status_label.setText)
+        self._loader.finished.connect(self.status_label.clear)
+        self._loader.loaded.connect(self._on_data_loaded)
+        self._loader.failed.connect(self._on_load_failed)
+        # Las búsquedas en el servidor van aparte, sin cancelar la carga
+        self._search_loader = BackgroundLoader(self)
+        self._search_loader.progress.connect(self.status_label.setText)
+        self._search_loader.finished.connect(self.status_label.clear)
+        self._search_loader.loaded.connect(self._on_search_loaded)
+        self._search_loader.failed.connect(self._on_load_failed)
+        # Copia local de esta conexión: se lee en el pool, se dibuja y luego
+        # se consultan los nodos
+        self._snapshot_scope = connection_scope(self.dist_conn.config)
+        # Un gestor guarda solo los usuarios de su biblioteca, en su propia copia
+        self._snapshot_name = ("usuarios" if self.allowed_biblioteca is None
+                               else f"usuarios_{self.allowed_biblioteca}")
+        self._snapshot_session = snapshot_store.session
+        self._loader.start(self._fetch_snapshot)
     
     def _create_widgets(self):
         """Crea los widgets de la vista."""
@@ -178,17 +226,19 @@ class UsuariosView(QWidget):
         layout.addWidget(search_frame)
         
         # Tabla de usuarios
-        self.table = QTableWidget()
-        self.table.setColumnCount(6)
-        self.table.setHorizontalHeaderLabels([
-            "ID Biblioteca", "Cédula", "Nombre", "Apellido", "Email", "Celular"
-        ])
-        
-        self.table.setSelectionBehavior(QTableWidget.SelectRows)
-        self.table.setSelectionMode(QTableWidget.SingleSelection)
-        self.table.setAlternatingRowColors(True)
-        self.table.setSortingEnabled(True)
-        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        # Centrar ID Biblioteca, Cédula y Celular
+        self.table = ResultTableView(
+            ("id_biblioteca", "cedula", "nombre_usuario", "apellido_usuario",
+             "email_usuario", "celular_usuario"),
+            ["ID Biblioteca", "Cédula", "Nombre", "Apellido", "Email", "Celular"],
+            alignments={
+                'id_biblioteca': Qt.AlignCenter,
+                'cedula': Qt.AlignCenter,
+                'celular_usuario': Qt.AlignCenter
+            }
+        )
+        # Solo los usuarios de la biblioteca permitida según el rol
+        self.table.set_filter(RowFilter(equals={'id_biblioteca': self.allowed_biblioteca}))
         
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QHeaderView.ResizeToContents)
@@ -199,7 +249,7 @@ class UsuariosView(QWidget):
         header.setSectionResizeMode(5, QHeaderView.ResizeToContents)
         
         self.table.setStyleSheet(f"""
-            QTableWidget {{
+            QTableView {{
                 background-color: {theme['CARD_BG']};
                 border: 1px solid {theme['BORDER_COLOR']};
                 border-radius: 8px;
@@ -207,11 +257,11 @@ class UsuariosView(QWidget):
                 color: {theme['TEXT_COLOR']};
                 alternate-background-color: {theme['TABLE_ALT_ROW']};
             }}
-            QTableWidget::item {{
+            QTableView::item {{
                 padding: 8px;
                 color: {theme['TEXT_COLOR']};
             }}
-            QTableWidget::item:selected {{
+            QTableView::item:selected {{
                 background-color: {Settings.PRIMARY_COLOR};
                 color: white;
             }}
@@ -243,89 +293,129 @@ class UsuariosView(QWidget):
         self.total_label = QLabel("Total: 0 usuarios")
         self.total_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
         stats_layout.addWidget(self.total_label)
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet(f"color: {theme['TEXT_COLOR']};")
+        stats_layout.addWidget(self.status_label)
         stats_layout.addStretch()
         
         layout.addWidget(stats_frame)
     
+    def _fetch_snapshot(self, progress):
+        """Lee la copia local de la última sesión y prepara sus índices; se ejecuta en el pool."""
+        usuarios, version, node = snapshot_store.load_with_version(
+            self._snapshot_name, self._snapshot_scope
+        )
+        if usuarios is None:
+            return self._fetch_data(progress, None)
+        return self._sync.prepare(SyncUpdate(True, usuarios, version, node, from_snapshot=True))
+    
     def load_data(self):
-        """Carga los datos de usuarios desde la base de datos distribuida."""
+        """Consulta los usuarios en segundo plano; el resultado se aplica en _on_data_loaded."""
+        self._loader.start(self._fetch_data, self._sync.checkpoint)
+    
+    def _fetch_data(self, progress, checkpoint):
+        """Consulta los cambios desde checkpoint (o todo); se ejecuta en el pool."""
+        # Siempre consultar FIS - las vistas con linked servers traen usuarios
+        # de ambas bibliotecas ('01' de FIS y '02' de FIQA) automáticamente
+        progress("Actualizando...")
+        return self._sync.fetch(checkpoint)
+    
+    def _save_snapshot(self, usuarios, version, node):
+        """Guarda en la copia local solo los usuarios que el rol puede ver; se ejecuta en el pool."""
+        if self.allowed_biblioteca is not None:
+            usuarios = usuarios.filter(
+                lambda row: row['id_biblioteca'] == self.allowed_biblioteca
+            )
+        snapshot_store.save(self._snapshot_name, usuarios, version, self._snapshot_scope,
+                            self._snapshot_session, node)
+    
+    def _on_data_loaded(self, update):
+        """Aplica los datos consultados y redibuja la tabla si cambiaron."""
         try:
-            # Siempre consultar FIS - las vistas con linked servers traen usuarios
-            # de ambas bibliotecas ('01' de FIS y '02' de FIQA) automáticamente
-            usuarios = self.sp_usuarios.consultar_usuario(node="FIS")
-            
-            # Filtrar por biblioteca permitida según rol
-            if self.allowed_biblioteca and usuarios:
-                usuarios = [u for u in usuarios if u.get('id_biblioteca') == self.allowed_biblioteca]
+            changed = self._sync.apply(update)
+            if update.from_snapshot:
+                # Datos de la sesión anterior: se dibujan y se consultan los nodos
+                self.load_data()
+            elif changed:
+                run_in_background(self._save_snapshot, self._sync.result,
+                                  self._sync.version, self._sync.node)
+            if not changed:
+                # Sin cambios (o la consulta falló, ya informado): no se redibuja
+                return
+            usuarios = self._sync.result
             
-            if usuarios:
-                self._populate_table(usuarios)
+            if self.search_input.text().strip():
+                # La tabla muestra una búsqueda: se repite sobre los datos nuevos
+                self._filter_users()
             else:
-                self.table.setRowCount(0)
-                self._update_stats()
+                self._populate_table(usuarios)
                 
         except Exception as e:
-            QMessageBox.critical(
-                self,
-                "Error",
-                f"Error al cargar usuarios: {str(e)}"
-            )
+            self._on_load_failed(str(e))
+    
+    def _on_load_failed(self, message):
+        """Informa un error de la carga."""
+        QMessageBox.critical(
+            self,
+            "Error",
+            f"Error al cargar usuarios: {message}"
+        )
     
     def _populate_table(self, usuarios):
         """Llena la tabla con los usuarios desde la BD."""
-        # Deshabilitar sorting temporalmente para evitar problemas
-        self.table.setSortingEnabled(False)
-        
-        self.table.setRowCount(len(usuarios))
-        
-        for row, usuario in enumerate(usuarios):
-            # Columnas: ID Biblioteca, Cédula, Nombre, Apellido, Email, Celular
-            columns = [
-                usuario.get('id_biblioteca', ''),
-                usuario.get('cedula', ''),
-                usuario.get('nombre_usuario', ''),
-                usuario.get('apellido_usuario', ''),
-                usuario.get('email_usuario', ''),
-                usuario.get('celular_usuario', '')
-            ]
-            
-            for col, value in enumerate(columns):
-                item = QTableWidgetItem(str(value))
-                # Centrar ID Biblioteca, Cédula y Celular
-                if col in [0, 1, 5]:
-                    item.setTextAlignment(Qt.AlignCenter)
-                else:
-                    item.setTextAlignment(Qt.AlignLeft | Qt.AlignVCenter)
-                self.table.setItem(row, col, item)
-        
-        # Rehabilitar sorting
-        self.table.setSortingEnabled(True)
-        
+        # El modelo lee el ResultSet; solo se dibujan las filas visibles
+        self.table.set_result(usuarios)
         self._update_stats()
     
     def _update_stats(self):
         """Actualiza las estadísticas."""
-        total = self.table.rowCount()
+        total = self.table.row_count()
         self.total_label.setText(f"Total: {total} usuarios")
     
+    def _search_on_server(self) -> bool:
+        """
+        Indica si se busca en el servidor: mientras los usuarios no están
+        cargados o si son tantos que no conviene indexarlos en memoria.
+        """
+        if not self.sp_usuarios.has_procedure("sp_Buscar_Usuario"):
+            return False
+        return not self._sync.loaded or len(self._sync.result) > Settings.SEARCH_SERVER_ROWS
+    
+    def _search_users(self):
+        """Lanza la búsqueda en el servidor; el resultado se muestra en _on_search_loaded."""
+        search_text = self.search_input.text().strip()
+        if not search_text:
+            self._search_loader.cancel()
+            self._populate_table(self._sync.result)
+            return
+        self._search_loader.start(self._fetch_search, search_text)
+    
+    def _fetch_search(self, progress, texto):
+        """Busca los usuarios en el servidor; se ejecuta en el pool."""
+        progress("Buscando...")
+        return self.sp_usuarios.buscar_usuario(
+            texto, id_biblioteca=self.allowed_biblioteca, as_result_set=True
+        )
+    
+    def _on_search_loaded(self, usuarios):
+        """Muestra los usuarios encontrados, si la búsqueda sigue siendo en el servidor."""
+        if self.search_input.text().strip() and self._search_on_server():
+            self._populate_table(usuarios)
+    
     def _filter_users(self):
         """Filtra los usuarios según la búsqueda."""
-        search_text = self.search_input.text().lower()
+        if self._search_on_server():
+            # Usuarios sin cargar o muchos: se busca en el servidor al dejar
+            # de escribir (la búsqueda anterior ya no sirve)
+            self._search_loader.cancel()
+            self._search_timer.start()
+            return
+        self._search_timer.stop()
+        self._search_loader.cancel()
         
-        for row in range(self.table.rowCount()):
-            show = True
-            
-            if search_text:
-                match = False
-                # Buscar en: Cédula, Nombre, Apellido, Email
-                for col in [1, 2, 3, 4]:
-                    item = self.table.item(row, col)
-                    if item and search_text in item.text().lower():
-                        match = True
-                        break
-                show = match
-            
-            self.table.setRowHidden(row, not show)
+        # Solo se dibujan los usuarios que devuelve el índice, sin recorrer la tabla
+        matches = self._search_index.search(self.search_input.text())
+        self._populate_table(self._sync.result if matches is None else self._sync.subset(matches))
     
     def _add_user(self):
         """Abre el diálogo para agregar usuario."""
@@ -372,7 +462,7 @@ class UsuariosView(QWidget):
     def _edit_user(self):
         """Abre el diálogo para editar usuario seleccionado."""
         # Verificar que hay una fila seleccionada
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -384,12 +474,12 @@ class UsuariosView(QWidget):
         
         # Obtener datos actuales de la fila
         usuario_data = {
-            'id_biblioteca': self.table.item(current_row, 0).text(),
-            'cedula': self.table.item(current_row, 1).text(),
-            'nombre_usuario': self.table.item(current_row, 2).text(),
-            'apellido_usuario': self.table.item(current_row, 3).text(),
-            'email_usuario': self.table.item(current_row, 4).text(),
-            'celular_usuario': self.table.item(current_row, 5).text()
+            'id_biblioteca': self.table.text(current_row, 0),
+            'cedula': self.table.text(current_row, 1),
+            'nombre_usuario': self.table.text(current_row, 2),
+            'apellido_usuario': self.table.text(current_row, 3),
+            'email_usuario': self.table.text(current_row, 4),
+            'celular_usuario': self.table.text(current_row, 5)
         }
         
         # Abrir diálogo en modo editar
@@ -436,7 +526,7 @@ class UsuariosView(QWidget):
     def _delete_user(self):
         """Elimina el usuario seleccionado."""
         # Verificar que hay una fila seleccionada
-        current_row = self.table.currentRow()
+        current_row = self.table.current_row()
         
         if current_row < 0:
             QMessageBox.warning(
@@ -447,10 +537,10 @@ class UsuariosView(QWidget):
             return
         
         # Obtener datos del usuario
-        id_biblioteca = self.table.item(current_row, 0).text()
-        cedula = self.table.item(current_row, 1).text()
-        nombre = self.table.item(current_row, 2).text()
-        apellido = self.table.item(current_row, 3).text()
+        id_biblioteca = self.table.text(current_row, 0)
+        cedula = self.table.text(current_row, 1)
+        nombre = self.table.text(current_row, 2)
+        apellido = self.table.text(current_row, 3)
         
         # Confirmar eliminación
         reply = QMessageBox.question(
@@ -499,12 +589,12 @@ class UsuariosView(QWidget):
         """Muestra los detalles del usuario."""
         row = index.row()
         user_info = f"""
-        <b>ID Biblioteca:</b> {self.table.item(row, 0).text()}<br>
-        <b>Cédula:</b> {self.table.item(row, 1).text()}<br>
-        <b>Nombre:</b> {self.table.item(row, 2).text()}<br>
-        <b>Apellido:</b> {self.table.item(row, 3).text()}<br>
-        <b>Email:</b> {self.table.item(row, 4).text()}<br>
-        <b>Celular:</b> {self.table.item(row, 5).text()}
+        <b>ID Biblioteca:</b> {self.table.text(row, 0)}<br>
+        <b>Cédula:</b> {self.table.text(row, 1)}<br>
+        <b>Nombre:</b> {self.table.text(row, 2)}<br>
+        <b>Apellido:</b> {self.table.text(row, 3)}<br>
+        <b>Email:</b> {self.table.text(row, 4)}<br>
+        <b>Celular:</b> {self.table.text(row, 5)}
         """
         
         QMessageBox.information(self, "Detalles del Usuario", user_info)
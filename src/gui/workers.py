@@ -0,0 +1,170 @@
+"""
+Tareas en segundo plano para la interfaz - PyQt5.
+Las consultas de las vistas se ejecutan en el pool de hilos de Qt para que la
+ventana siga respondiendo aunque un nodo tarde. Los resultados vuelven al hilo
+de la interfaz mediante señales; cada vista usa un BackgroundLoader, que
+descarta el resultado de una carga anterior cuando se vuelve a cargar o la
+vista se destruye.
+"""
+import threading
+from typing import Any, Callable
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """Señales de un Worker; cada una lleva el número de la tarea."""
+    
+    progress = pyqtSignal(int, str)
+    result = pyqtSignal(int, object)
+    error = pyqtSignal(int, str)
+    finished = pyqtSignal(int)
+
+
+class Worker(QRunnable):
+    """Ejecuta una función en un hilo del pool y publica su resultado por señales."""
+    
+    def __init__(self, token: int, fn: Callable[..., Any], *args, **kwargs):
+        """
+        Inicializa la tarea.
+        
+        Args:
+            token: Número de la tarea, incluido en todas sus señales.
+            fn: Función a ejecutar. Recibe como primer argumento una función
+               progress(mensaje) para informar el avance.
+            *args: Argumentos adicionales de fn.
+            **kwargs: Argumentos con nombre de fn.
+        """
+        super().__init__()
+        self.token = token
+        self.signals = WorkerSignals()
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelled = threading.Event()
+    
+    @property
+    def cancelled(self) -> bool:
+        """Indica si se canceló la tarea."""
+        return self._cancelled.is_set()
+    
+    def cancel(self):
+        """
+        Cancela la tarea: si no ha empezado no se ejecuta, y si está en curso
+        su resultado no se publica (la consulta en curso no se interrumpe).
+        """
+        self._cancelled.set()
+    
+    def _report(self, message: str):
+        """Publica un mensaje de avance."""
+        if not self.cancelled:
+            self.signals.progress.emit(self.token, message)
+    
+    def run(self):
+        """Ejecuta la función (llamado por QThreadPool)."""
+        if self.cancelled:
+            return
+        try:
+            result = self._fn(self._report, *self._args, **self._kwargs)
+        except Exception as e:
+            if not self.cancelled:
+                self.signals.error.emit(self.token, str(e))
+        else:
+            if not self.cancelled:
+                self.signals.result.emit(self.token, result)
+        finally:
+            self.signals.finished.emit(self.token)
+
+
+class BackgroundLoader(QObject):
+    """Carga de una vista en segundo plano, con una sola carga vigente a la vez."""
+    
+    # Avance de la carga vigente
+    progress = pyqtSignal(str)
+    # Resultado de la carga vigente
+    loaded = pyqtSignal(object)
+    # Error de la carga vigente
+    failed = pyqtSignal(str)
+    # La carga vigente terminó (con resultado o con error)
+    finished = pyqtSignal()
+    
+    def __init__(self, parent: QObject, pool: QThreadPool = None):
+        """
+        Inicializa el cargador. Se cancela al destruirse el widget padre.
+        
+        Args:
+            parent: Vista dueña del cargador.
+            pool: Pool de hilos. Si es None, se usa el global de Qt.
+        """
+        super().__init__(parent)
+        self._pool = pool or QThreadPool.globalInstance()
+        self._token = 0
+        self._worker = None
+        parent.destroyed.connect(lambda _=None: self.cancel())
+    
+    @property
+    def running(self) -> bool:
+        """Indica si hay una carga en curso."""
+        return self._worker is not None
+    
+    def start(self, fn: Callable[..., Any], *args, **kwargs):
+        """
+        Inicia una carga, cancelando la anterior si sigue en curso.
+        
+        Args:
+            fn: Función a ejecutar en el pool; recibe progress(mensaje) como
+               primer argumento y su valor de retorno se emite en loaded.
+            *args: Argumentos adicionales de fn.
+            **kwargs: Argumentos con nombre de fn.
+        """
+        self.cancel()
+        self._token += 1
+        worker = Worker(self._token, fn, *args, **kwargs)
+        worker.signals.progress.connect(self._on_progress)
+        worker.signals.result.connect(self._on_result)
+        worker.signals.error.connect(self._on_error)
+        worker.signals.finished.connect(self._on_finished)
+        self._worker = worker
+        self._pool.start(worker)
+    
+    def cancel(self):
+        """Cancela la carga en curso; su resultado ya no se emitirá."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+    
+    def _current(self, token: int) -> bool:
+        """Indica si una señal viene de la carga vigente."""
+        return self._worker is not None and token == self._token
+    
+    def _on_progress(self, token: int, message: str):
+        if self._current(token):
+            self.progress.emit(message)
+    
+    def _on_result(self, token: int, result: Any):
+        if self._current(token):
+            self.loaded.emit(result)
+    
+    def _on_error(self, token: int, message: str):
+        if self._current(token):
+            self.failed.emit(message)
+    
+    def _on_finished(self, token: int):
+        if self._current(token):
+            self._worker = None
+            self.finished.emit()
+
+
+def run_in_background(fn: Callable[..., Any], *args, **kwargs):
+    """
+    Ejecuta una función en el pool global sin esperar su resultado (por
+    ejemplo, guardar la copia local). Los errores deben tratarse dentro de fn.
+    
+    Args:
+        fn: Función a ejecutar.
+        *args: Argumentos de fn.
+        **kwargs: Argumentos con nombre de fn.
+    """
+    QThreadPool.globalInstance().start(
+        Worker(0, lambda progress: fn(*args, **kwargs))
+    )
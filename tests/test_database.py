@@ -1,8 +1,53 @@
 """
 Pruebas para el módulo de base de datos.
 """
+import asyncio
+import gc
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
 import unittest
-from src.config.database import DatabaseConfig
+import unittest.mock
+import weakref
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from src.config.database import (DatabaseConfig, DistributedDatabaseConfig, PoolConfig,
+                                 CircuitBreakerConfig, QueryCacheConfig)
+
+# Los módulos de database importan config.* y database.* desde src
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from config import database as local_config  # noqa: E402
+from database.async_connection import AsyncDistributedConnection  # noqa: E402
+from database.circuit_breaker import CircuitBreaker, CircuitState  # noqa: E402
+from database.connection import DatabaseConnection  # noqa: E402
+from database.delta_sync import DeltaSync  # noqa: E402
+from database.distributed_connection import DistributedConnection  # noqa: E402
+from database.instrumentation import (LatencyHistogram, MetricsCollector,  # noqa: E402
+                                      QueryEvent, estimate_batch_bytes, statement_name)
+from database.pool import ConnectionPool  # noqa: E402
+from database.query_cache import QueryCache  # noqa: E402
+from database.read_router import ReadRouter  # noqa: E402
+from database.result_set import ResultSet  # noqa: E402
+from database.snapshot import SnapshotStore, connection_scope  # noqa: E402
+from database.s_p_libro import SP_Libro  # noqa: E402
+from database.s_p_prestamo import SP_Prestamo  # noqa: E402
+from database.s_p_usuarios import SP_Usuarios  # noqa: E402
+from database.search_index import TrigramIndex  # noqa: E402
+from database.sqlite_backend import PROCEDURES, SQLiteCursor  # noqa: E402
+
+# Las pruebas de la interfaz usan la plataforma de Qt sin pantalla
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+try:
+    from PyQt5 import sip  # noqa: E402
+    from PyQt5.QtCore import QObject, Qt, QThreadPool  # noqa: E402
+    from PyQt5.QtWidgets import QApplication  # noqa: E402
+except ImportError:
+    QApplication = None
 
 
 class TestDatabaseConfig(unittest.TestCase):
@@ -31,6 +76,1003 @@ class TestDatabaseConfig(unittest.TestCase):
         conn_str = config.get_connection_string()
         self.assertIn("UID=user", conn_str)
         self.assertIn("PWD=pass", conn_str)
+    
+    def test_timeouts_from_env(self):
+        """Prueba que los límites de tiempo se lean de las variables de entorno."""
+        with unittest.mock.patch.dict(os.environ, {"DB_CONNECT_TIMEOUT": "5",
+                                                   "DB_QUERY_TIMEOUT": "12"}):
+            config = DatabaseConfig.from_env()
+            distributed = DistributedDatabaseConfig.from_env()
+        self.assertEqual(config.connect_timeout, 5)
+        self.assertEqual(config.query_timeout, 12)
+        for node in distributed.get_all_nodes().values():
+            self.assertEqual(node.connect_timeout, 5)
+            self.assertEqual(node.query_timeout, 12)
+
+
+
+class TestPoolConfig(unittest.TestCase):
+    """Pruebas para PoolConfig."""
+    
+    def test_distributed_config_has_pool(self):
+        """Prueba que cada configuración distribuida tenga su propio pool."""
+        config = DistributedDatabaseConfig.from_env()
+        other = DistributedDatabaseConfig.from_env()
+        self.assertIsInstance(config.pool, PoolConfig)
+        self.assertIsNot(config.pool, other.pool)
+    
+    def test_pool_limits(self):
+        """Prueba que los límites del pool sean coherentes."""
+        pool = PoolConfig()
+        self.assertGreater(pool.max_size, 0)
+        self.assertLess(pool.validation_interval, pool.idle_timeout)
+        self.assertLess(pool.idle_timeout, pool.max_lifetime)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """Pruebas del pool de conexiones con el backend SQLite."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = local_config.DistributedDatabaseConfig.for_sqlite(self.directory)
+        self.pool = ConnectionPool(config.nodes["FIS"], PoolConfig(max_size=2), name="FIS")
+    
+    def tearDown(self):
+        self.pool.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_prestamo_y_devolucion(self):
+        """Prueba que una conexión devuelta quede libre y se vuelva a prestar."""
+        connection = self.pool.checkout()
+        self.assertEqual((self.pool.size, self.pool.idle_count), (1, 0))
+        self.pool.checkin(connection)
+        self.assertEqual((self.pool.size, self.pool.idle_count), (1, 1))
+        self.assertIs(self.pool.checkout(), connection)
+    
+    def test_limite_con_espera(self):
+        """Prueba que sin conexiones libres se espere hasta el tiempo límite."""
+        first = self.pool.checkout()
+        self.pool.checkout()
+        with self.assertRaises(TimeoutError):
+            self.pool.checkout(timeout=0.05)
+        self.assertEqual(self.pool.size, 2)
+        self.pool.checkin(first)
+        self.assertIs(self.pool.checkout(timeout=0.05), first)
+    
+    def test_conexion_caida_se_descarta(self):
+        """Prueba que una conexión que dejó de responder tras un error se cierre."""
+        with self.assertRaises(RuntimeError):
+            with self.pool.connection() as connection:
+                connection.disconnect()
+                raise RuntimeError("consulta fallida")
+        self.assertEqual((self.pool.size, self.pool.idle_count), (0, 0))
+    
+    def test_sonda_descarta_conexion_libre_caida(self):
+        """Prueba que warm() no dé por vivo el nodo con una conexión libre que ya no responde."""
+        connection = self.pool.checkout()
+        self.pool.checkin(connection)
+        # Libre hace menos de validation_interval: checkout() no la validaría
+        with unittest.mock.patch.object(type(connection), "is_alive", return_value=False), \
+                unittest.mock.patch.object(type(connection), "connect", return_value=False):
+            self.assertFalse(self.pool.warm())
+        self.assertEqual((self.pool.size, self.pool.idle_count), (0, 0))
+        self.assertTrue(self.pool.warm())
+    
+    def test_cerrar_y_reabrir(self):
+        """Prueba que close() cierre las conexiones libres y reopen() vuelva a prestar."""
+        self.pool.checkin(self.pool.checkout())
+        self.pool.close()
+        self.assertEqual(self.pool.size, 0)
+        with self.assertRaises(ConnectionError):
+            self.pool.checkout()
+        self.pool.reopen()
+        self.assertTrue(self.pool.checkout().is_alive())
+
+
+class TestCircuitBreakerConfig(unittest.TestCase):
+    """Pruebas para CircuitBreakerConfig."""
+    
+    def test_distributed_config_has_breaker(self):
+        """Prueba que la configuración distribuida incluya el interruptor."""
+        config = DistributedDatabaseConfig.from_env()
+        self.assertIsInstance(config.breaker, CircuitBreakerConfig)
+    
+    def test_backoff_limits(self):
+        """Prueba que la espera máxima no sea menor que la inicial."""
+        breaker = CircuitBreakerConfig()
+        self.assertGreater(breaker.failure_threshold, 0)
+        self.assertLessEqual(breaker.base_backoff, breaker.max_backoff)
+
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    """Pruebas de las transiciones del interruptor de circuito."""
+    
+    def setUp(self):
+        config = local_config.CircuitBreakerConfig(failure_threshold=2, base_backoff=0.01)
+        self.breaker = CircuitBreaker(config, name="FIS")
+    
+    def test_cerrado_abierto_en_prueba_cerrado(self):
+        """Prueba que el circuito se abra tras el umbral y se cierre con una prueba exitosa."""
+        self.breaker.record_failure()
+        self.assertIs(self.breaker.state, CircuitState.CLOSED)
+        self.breaker.record_failure()
+        self.assertIs(self.breaker.state, CircuitState.OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        
+        time.sleep(0.02)
+        self.assertTrue(self.breaker.allow_request())
+        self.assertIs(self.breaker.state, CircuitState.HALF_OPEN)
+        self.assertFalse(self.breaker.allow_request())
+        self.breaker.record_success()
+        self.assertIs(self.breaker.state, CircuitState.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+    
+    def test_prueba_fallida_vuelve_a_abrir(self):
+        """Prueba que un fallo en prueba reabra el circuito con una espera mayor."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_failure()
+        self.assertIs(self.breaker.state, CircuitState.OPEN)
+        self.assertGreater(self.breaker.retry_in(), 0.01)
+    
+    def test_llamada_sin_conexion_no_decide(self):
+        """Prueba que una prueba que no llegó al nodo permita otra prueba."""
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        time.sleep(0.02)
+        self.assertTrue(self.breaker.allow_request())
+        self.breaker.record_skipped()
+        self.assertIs(self.breaker.state, CircuitState.OPEN)
+        self.assertTrue(self.breaker.allow_request())
+    
+    def test_sonda_en_segundo_plano(self):
+        """Prueba que la sonda cierre el circuito cuando el nodo vuelve a responder."""
+        intentos = iter([False, True])
+        self.breaker.probe = lambda: next(intentos)
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertFalse(self.breaker.allow_request())
+        limite = time.monotonic() + 2
+        while self.breaker.state is not CircuitState.CLOSED and time.monotonic() < limite:
+            time.sleep(0.01)
+        self.assertIs(self.breaker.state, CircuitState.CLOSED)
+    
+    def test_pool_saturado_no_cierra_el_circuito(self):
+        """Prueba que esperar sin conexiones libres no cuente como un éxito del nodo."""
+        directory = tempfile.mkdtemp()
+        config = local_config.DistributedDatabaseConfig.for_sqlite(directory)
+        dist_conn = DistributedConnection(config)
+        try:
+            dist_conn._breakers["FIS"].record_failure()
+            with unittest.mock.patch.object(dist_conn.get_pool("FIS"), "checkout",
+                                            side_effect=TimeoutError("Sin conexiones libres")):
+                with self.assertRaises(TimeoutError):
+                    dist_conn.execute_query("FIS", "SELECT 1")
+            self.assertEqual(dist_conn.get_node_info("FIS")['circuit_failures'], "1")
+            dist_conn.execute_query("FIS", "SELECT 1")
+            self.assertEqual(dist_conn.get_node_info("FIS")['circuit_failures'], "0")
+        finally:
+            dist_conn.disconnect_all()
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestReadRouter(unittest.TestCase):
+    """Pruebas del enrutamiento de lecturas replicadas."""
+    
+    def _router(self, **config) -> ReadRouter:
+        router = ReadRouter(("FIS", "FIQA"), local_config.ReadRouterConfig(**config))
+        with router.measure("FIS"):
+            time.sleep(0.02)
+        with router.measure("FIQA"):
+            pass
+        return router
+    
+    def test_elige_el_nodo_mas_rapido(self):
+        """Prueba que se elija el nodo de menor latencia y que los errores no se midan."""
+        router = self._router(probe_interval=60)
+        self.assertEqual(router.choose(), "FIQA")
+        with self.assertRaises(ValueError):
+            with router.measure("FIS"):
+                raise ValueError("consulta fallida")
+        self.assertEqual(len(router._stats["FIS"].history), 1)
+    
+    def test_muestra_lenta_no_excluye_para_siempre(self):
+        """Prueba que un nodo descartado reciba una lectura de prueba tras probe_interval."""
+        router = self._router(probe_interval=0.05)
+        self.assertEqual(router.choose(), "FIQA")
+        time.sleep(0.06)
+        self.assertEqual(router.choose(), "FIS")
+        self.assertEqual(router.choose(), "FIQA")
+    
+    def test_lectura_tras_escritura(self):
+        """Prueba que después de escribir se lea del nodo escrito mientras dure pin_after_write."""
+        router = self._router(probe_interval=60, pin_after_write=0.05)
+        router.pin("FIS", "LIBRO")
+        self.assertEqual(router.choose(table="LIBRO"), "FIS")
+        self.assertEqual(router.choose(("FIQA",), table="LIBRO"), "FIQA")
+        # Solo se fijan las lecturas de la tabla escrita
+        self.assertEqual(router.choose(table="PASILLO"), "FIQA")
+        self.assertEqual(router.choose(), "FIQA")
+        time.sleep(0.06)
+        self.assertIsNone(router.pinned(table="LIBRO"))
+        self.assertEqual(router.choose(table="LIBRO"), "FIQA")
+
+
+class TestInstrumentation(unittest.TestCase):
+    """Pruebas de la instrumentación de consultas."""
+    
+    def test_nombre_de_sentencia(self):
+        """Prueba los nombres con que se agrupan procedimientos y consultas directas."""
+        self.assertEqual(statement_name("EXEC sp_Consultar_Libro @ISBN=?"), "sp_Consultar_Libro")
+        self.assertEqual(statement_name("  execute dbo.sp_Buscar_Libro"), "dbo.sp_Buscar_Libro")
+        self.assertEqual(statement_name("select * from v_Prestamo where ISBN = ?"),
+                         "SELECT v_Prestamo")
+        self.assertEqual(statement_name("SELECT 1"), "SELECT")
+        self.assertEqual(statement_name(""), "")
+    
+    def test_percentiles_del_histograma(self):
+        """Prueba que los percentiles usen el límite de su intervalo sin superar el máximo."""
+        histogram = LatencyHistogram()
+        self.assertEqual(histogram.percentile(0.5), 0.0)
+        for _ in range(90):
+            histogram.record(0.0005)
+        for _ in range(10):
+            histogram.record(0.15)
+        self.assertEqual(histogram.percentile(0.50), 0.001)
+        self.assertEqual(histogram.percentile(0.95), 0.15)
+        self.assertAlmostEqual(histogram.mean, 0.01545)
+        histogram.record(45.0)
+        self.assertEqual(histogram.percentile(1.0), 45.0)
+    
+    def test_bytes_estimados_por_muestra(self):
+        """Prueba la estimación de bytes de un lote a partir de algunas filas."""
+        self.assertEqual(estimate_batch_bytes([]), 0)
+        self.assertEqual(estimate_batch_bytes([("abcd", 1, None)] * 1000), 12000)
+    
+    def test_consulta_lenta_registrada(self):
+        """Prueba que una consulta lenta se acumule y se informe en el logger."""
+        collector = MetricsCollector(slow_query_threshold=0.1)
+        with self.assertLogs("database.instrumentation", "WARNING"):
+            collector.record(QueryEvent("FIS", "sp_Consultar_Libro", elapsed=0.5, rows=3))
+        collector.record(QueryEvent("FIS", "sp_Consultar_Libro", elapsed=0.01, error="x"))
+        resumen = collector.snapshot()["FIS"]["sp_Consultar_Libro"]
+        self.assertEqual((resumen['calls'], resumen['errors'], resumen['rows']), (2, 1, 3))
+        self.assertEqual(len(collector.slow_queries), 1)
+
+
+class TestQueryCache(unittest.TestCase):
+    """Pruebas para QueryCache."""
+    
+    def test_lru_eviction(self):
+        """Prueba que al superar el límite se desaloje el resultado menos usado."""
+        cache = QueryCache(local_config.QueryCacheConfig(max_entries=2))
+        cache.put("a", [1], "LIBRO", 0)
+        cache.put("b", [2], "LIBRO", 0)
+        cache.get("a")
+        cache.put("c", [3], "LIBRO", 0)
+        self.assertEqual(cache.get("a"), (True, [1]))
+        self.assertEqual(cache.get("b"), (False, None))
+    
+    def test_write_during_read_is_not_cached(self):
+        """Prueba que un resultado leído antes de una escritura no se guarde."""
+        cache = QueryCache(local_config.QueryCacheConfig())
+        generation = cache.generation("LIBRO")
+        cache.invalidate("LIBRO")
+        cache.put("a", [1], "LIBRO", generation)
+        self.assertEqual(len(cache), 0)
+    
+    def test_config_defaults(self):
+        """Prueba que la configuración distribuida incluya la caché activa."""
+        self.assertIsInstance(DistributedDatabaseConfig.from_env().cache, QueryCacheConfig)
+        self.assertGreater(QueryCacheConfig().ttl, 0)
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """Pruebas para TrigramIndex."""
+    
+    def setUp(self):
+        self.index = TrigramIndex(("ISBN", "nombre_libro"))
+        self.rows = {
+            ("978-1",): ("978-1", "Fundamentos de Química", 2020),
+            ("978-2",): ("978-2", "Ingeniería de Software", 2021),
+        }
+        self.index.reset(["ISBN", "nombre_libro", "anio_edicion"], self.rows)
+    
+    def test_busqueda_sin_tildes_ni_mayusculas(self):
+        """Prueba que se encuentren subcadenas de cualquier palabra y entre palabras."""
+        self.assertIsNone(self.index.search("  "))
+        self.assertEqual(self.index.search("QUIMICA"), {("978-1",)})
+        self.assertEqual(self.index.search("ria de soft"), {("978-2",)})
+        self.assertEqual(self.index.search("de"), {("978-1",), ("978-2",)})
+        self.assertEqual(self.index.search("2020"), set())
+    
+    def test_actualizacion_incremental(self):
+        """Prueba que los cambios por fila se reflejen sin reconstruir el índice."""
+        self.index.search("x")
+        self.index.add(("978-2",), ("978-2", "Redes", 2021))
+        self.index.add(("978-3",), ("978-3", "Química orgánica", 2019))
+        self.index.remove(("978-1",))
+        self.assertEqual(self.index.search("software"), set())
+        self.assertEqual(self.index.search("quimica"), {("978-3",)})
+        self.assertEqual(len(self.index), 2)
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """Pruebas para SnapshotStore."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = SnapshotStore(os.path.join(self.directory, "copia", "snapshot.db"))
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_guardar_y_leer(self):
+        """Prueba que el último resultado guardado se lea con sus columnas y filas."""
+        self.assertIsNone(self.store.load("libros"))
+        self.store.save("libros", ResultSet(["ISBN"], [("978-1",)]))
+        self.store.save("libros", ResultSet(["ISBN"], [("978-1",), ("978-2",)]))
+        libros = self.store.load("libros")
+        self.assertEqual(libros.columns, ["ISBN"])
+        self.assertEqual(libros.column("ISBN"), ["978-1", "978-2"])
+        self.assertEqual(self.store.load_with_version("libros")[1:], (None, None))
+        self.store.save("libros", libros, 42, node="FIQA")
+        self.assertEqual(self.store.load_with_version("libros")[1:], (42, "FIQA"))
+    
+    def test_tipos_y_conexiones(self):
+        """Prueba que fechas y decimales se recuperen y que cada conexión tenga su copia."""
+        prestamos = ResultSet(
+            ["cedula", "fecha_prestamo", "registrado", "multa"],
+            [("0102", date(2024, 5, 1), datetime(2024, 5, 1, 9, 30), Decimal("1.50"))]
+        )
+        self.store.save("prestamos", prestamos, 7, scope="a")
+        self.assertEqual(self.store.load("prestamos", "a").rows, prestamos.rows)
+        self.assertIsNone(self.store.load("prestamos", "b"))
+        if os.name == "posix":
+            self.assertEqual(os.stat(self.store.path).st_mode & 0o777, 0o600)
+    
+    def test_borrar_al_cerrar_sesion(self):
+        """Prueba que clear() borre las copias y descarte los guardados pedidos antes."""
+        session = self.store.session
+        self.store.save("libros", ResultSet(["ISBN"], [("978-1",)]), session=session)
+        self.store.clear()
+        self.assertFalse(os.path.exists(self.store.path))
+        self.store.save("libros", ResultSet(["ISBN"], [("978-1",)]), session=session)
+        self.assertIsNone(self.store.load("libros"))
+    
+    def test_alcance_por_configuracion(self):
+        """Prueba que el alcance dependa de los servidores de la configuración."""
+        fis = local_config.DistributedDatabaseConfig.for_sqlite(self.directory)
+        otro = local_config.DistributedDatabaseConfig.for_sqlite(os.path.join(self.directory, "x"))
+        self.assertEqual(connection_scope(fis), connection_scope(
+            local_config.DistributedDatabaseConfig.for_sqlite(self.directory)))
+        self.assertNotEqual(connection_scope(fis), connection_scope(otro))
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """Pruebas de los procedimientos emulados con el backend SQLite."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = local_config.DistributedDatabaseConfig.for_sqlite(self.directory)
+        self.dist_conn = DistributedConnection(config)
+        self.sp_libro = SP_Libro(self.dist_conn)
+        self.sp_usuarios = SP_Usuarios(self.dist_conn)
+    
+    def tearDown(self):
+        self.dist_conn.disconnect_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_libro_replicado(self):
+        """Prueba que un libro insertado en FIS se lea también desde FIQA."""
+        self.assertTrue(self.sp_libro.insertar_libro("978-1", "Libro", 2020, "Novela", "Quito"))
+        libros = self.sp_libro.consultar_libro("978-1", node="FIQA")
+        self.assertEqual(len(libros), 1)
+        self.assertEqual(libros[0]['nombre_libro'], "Libro")
+    
+    def test_usuario_fragmentacion_mixta(self):
+        """Prueba que v_Usuario una el contacto de FIS con la información de FIQA."""
+        self.assertTrue(self.sp_usuarios.insertar_usuario(
+            "02", "0102030405", "Ana", "Paz", "ana@correo.com", "0991234567"
+        ))
+        usuarios = self.sp_usuarios.consultar_usuario(node="FIQA")
+        self.assertEqual(len(usuarios), 1)
+        self.assertEqual(usuarios[0]['id_biblioteca'], "02")
+        self.assertEqual(usuarios[0]['email_usuario'], "ana@correo.com")
+    
+    def test_consulta_en_todos_los_nodos(self):
+        """Prueba que la misma consulta se ejecute en cada nodo y se unan sus filas."""
+        self.sp_libro.insertar_libro("978-13", "Libro", 2020, "Novela", "Quito")
+        resultado = self.dist_conn.execute_procedure_all("sp_Consultar_Libro",
+                                                         {"ISBN": "978-13"})
+        self.assertTrue(resultado.ok)
+        self.assertEqual(set(resultado.results), {"FIS", "FIQA"})
+        self.assertEqual(len(resultado["fiqa"].rows), 1)
+        self.assertEqual(len(resultado.merged()), 2)
+        self.assertEqual(len(resultado.merged(distinct=True)), 1)
+    
+    def test_consulta_con_un_nodo_caido(self):
+        """Prueba que el fallo de un nodo quede en su resultado sin afectar al otro."""
+        self.sp_libro.insertar_libro("978-14", "Libro", 2020, "Novela", "Quito")
+        with unittest.mock.patch.object(self.dist_conn.get_pool("FIQA"), "checkout",
+                                        side_effect=ConnectionError("Nodo caído")):
+            resultado = self.dist_conn.execute_query_all("SELECT ISBN FROM LIBRO")
+        self.assertFalse(resultado.ok)
+        self.assertEqual(list(resultado.errors), ["FIQA"])
+        self.assertEqual(resultado["FIQA"].rows, [])
+        self.assertEqual(resultado.merged(), [{"ISBN": "978-14"}])
+    
+    def test_fachada_asincrona(self):
+        """Prueba que la fachada asíncrona se cierre y se libere con su conexión."""
+        dist_conn = DistributedConnection(self.dist_conn.config)
+        fachada = AsyncDistributedConnection.for_connection(dist_conn)
+        self.assertIs(AsyncDistributedConnection.for_connection(dist_conn), fachada)
+        filas = asyncio.run(fachada.execute_query("FIS", "SELECT 1 AS uno"))
+        self.assertEqual(filas, [{"uno": 1}])
+        dist_conn.disconnect_all()
+        self.assertEqual(fachada._executors, {})
+        
+        referencia = weakref.ref(fachada)
+        del dist_conn, fachada
+        gc.collect()
+        self.assertIsNone(referencia())
+    
+    def test_iterador_cerrado_devuelve_la_conexion(self):
+        """Prueba que cerrar antes de tiempo un iterador devuelva su conexión al pool."""
+        for isbn in ("978-15", "978-16"):
+            self.sp_libro.insertar_libro(isbn, "Libro", 2020, "Novela", "Quito")
+        pool = self.dist_conn.get_pool("FIS")
+        for _ in range(pool.pool_config.max_size + 1):
+            libros = self.sp_libro.consultar_libro_iter(node="FIS", batch_size=1)
+            next(libros)
+            libros.close()
+        self.assertEqual(pool.idle_count, pool.size)
+        
+        libros = self.sp_libro.consultar_libro_iter(node="FIS", batch_size=1)
+        next(libros)
+        with unittest.mock.patch.object(SQLiteCursor, "fetchmany",
+                                        side_effect=sqlite3.OperationalError("corte")):
+            with self.assertRaises(sqlite3.OperationalError):
+                list(libros)
+        self.assertEqual(pool.idle_count, pool.size)
+    
+    def test_escritura_fija_las_lecturas(self):
+        """Prueba que una escritura confirmada envíe las lecturas de LIBRO al publicador."""
+        router = self.dist_conn.read_router
+        self.assertIsNone(router.pinned(table="LIBRO"))
+        self.sp_libro.insertar_libro("978-17", "Libro", 2020, "Novela", "Quito")
+        self.assertEqual(router.pinned(table="LIBRO"), "FIS")
+        self.assertIsNone(router.pinned(table="USUARIOS"))
+        self.assertEqual(len(self.sp_libro.consultar_libro("978-17")), 1)
+    
+    def test_escritura_fallida_no_fija_las_lecturas(self):
+        """Prueba que una escritura fallida o revertida no fije las lecturas."""
+        router = self.dist_conn.read_router
+        with unittest.mock.patch.object(DatabaseConnection, "execute_non_query",
+                                        side_effect=sqlite3.OperationalError("corte")):
+            self.assertFalse(self.sp_libro.eliminar_libro("978-21"))
+        with self.assertRaises(Exception):
+            with self.dist_conn.transaction("FIS"):
+                self.sp_libro.insertar_libro("978-21", "Libro", 2020, "Novela", "Quito")
+                self.sp_libro.insertar_libro("978-21", "Repetido", 2020, "Novela", "Quito")
+        self.assertIsNone(router.pinned(table="LIBRO"))
+        with self.dist_conn.transaction("FIS"):
+            self.sp_libro.insertar_libro("978-22", "Libro", 2020, "Novela", "Quito")
+            self.assertIsNone(router.pinned(table="LIBRO"))
+        self.assertEqual(router.pinned(table="LIBRO"), "FIS")
+    
+    def test_solo_las_lecturas_enrutadas_se_miden(self):
+        """Prueba que las consultas a un nodo fijo no alteren la latencia del enrutador."""
+        stats = self.dist_conn.read_router._stats
+        self.sp_libro.consultar_libro(node="FIS", cached=False)
+        self.sp_libro.version_cambios("FIS")
+        self.assertEqual(len(stats["FIS"].history) + len(stats["FIQA"].history), 0)
+        self.sp_libro.consultar_libro(cached=False)
+        self.assertEqual(len(stats["FIS"].history) + len(stats["FIQA"].history), 1)
+    
+    def test_lectura_duplicada_con_un_nodo_lento(self):
+        """Prueba que una lectura lenta se duplique en la otra réplica y gane la más rápida."""
+        self.dist_conn.read_router.config.pin_after_write = 0
+        self.sp_libro.insertar_libro("978-18", "Libro", 2020, "Novela", "Quito")
+        self.dist_conn.read_router._stats["FIS"].latency = 0.001
+        consultas = []
+        original = DatabaseConnection.execute_query
+        
+        def consulta_medida(connection, *args, **kwargs):
+            consultas.append(connection.config.database)
+            if connection.config.database == "FIS":
+                time.sleep(0.5)
+            return original(connection, *args, **kwargs)
+        
+        with unittest.mock.patch.object(DatabaseConnection, "execute_query", consulta_medida):
+            inicio = time.perf_counter()
+            query = "EXEC sp_Consultar_Libro @ISBN=?"
+            libros = self.dist_conn.execute_hedged(query, ("978-18",), delay=0.02)
+            self.assertLess(time.perf_counter() - inicio, 0.4)
+            self.assertEqual(libros[0]['ISBN'], "978-18")
+            self.assertEqual(consultas, ["FIS", "FIQA"])
+            
+            del consultas[:]
+            self.dist_conn.read_router._stats["FIQA"].latency = 0.0001
+            libro = self.sp_libro.consultar_libro("978-18", hedged=True)
+            self.assertEqual(libro[0]['nombre_libro'], "Libro")
+            self.assertEqual(consultas, ["FIQA"])
+    
+    def test_lote_con_fila_invalida(self):
+        """Prueba que una fila repetida del lote falle sin descartar las demás."""
+        libro = {"ISBN": "978-2", "nombre_libro": "Libro", "anio_edicion": 2020,
+                 "categoria_libro": "Novela", "lugar_impresion_libro": "Quito"}
+        outcomes = self.sp_libro.insertar_libros([libro, dict(libro, ISBN="978-3"), libro])
+        self.assertEqual([ok for ok, _ in outcomes], [True, True, False])
+        self.assertEqual(len(self.sp_libro.consultar_libro()), 2)
+    
+    def test_transaccion_revierte_todo(self):
+        """Prueba que un error dentro de transaction() revierta todas las escrituras."""
+        with self.assertRaises(Exception):
+            with self.dist_conn.transaction("FIS"):
+                self.sp_libro.insertar_libro("978-4", "Libro", 2020, "Novela", "Quito")
+                self.sp_libro.insertar_libro("978-4", "Repetido", 2020, "Novela", "Quito")
+        self.assertEqual(self.sp_libro.consultar_libro("978-4"), [])
+    
+    def test_cache_invalidada_por_escritura(self):
+        """Prueba que una consulta repetida use la caché hasta que se modifique la tabla."""
+        self.assertEqual(self.sp_libro.consultar_libro(node="FIS"), [])
+        self.assertEqual(self.sp_libro.consultar_libro(node="FIS"), [])
+        self.assertEqual(self.dist_conn.query_cache.hits, 1)
+        self.sp_libro.insertar_libro("978-5", "Libro", 2020, "Novela", "Quito")
+        self.assertEqual(len(self.sp_libro.consultar_libro(node="FIS")), 1)
+    
+    def test_lectura_enrutada_tras_escritura_no_se_guarda(self):
+        """Prueba que las lecturas enrutadas no se guarden justo después de escribir."""
+        self.sp_libro.insertar_libro("978-19", "Libro", 2020, "Novela", "Quito")
+        self.assertEqual(len(self.sp_libro.consultar_libro()), 1)
+        self.assertEqual(len(self.dist_conn.query_cache), 0)
+        self.dist_conn.read_router.config.pin_after_write = 0
+        self.sp_libro.insertar_libro("978-20", "Otro", 2020, "Novela", "Quito")
+        self.assertEqual(len(self.sp_libro.consultar_libro()), 2)
+        self.assertEqual(len(self.dist_conn.query_cache), 1)
+    
+    def _sync_libros(self, choose_node=lambda: "FIS", changes_nodes=None) -> DeltaSync:
+        """DeltaSync del catálogo como el de LibrosView, anotando dónde se piden los cambios."""
+        def load_changes(node, version):
+            if changes_nodes is not None:
+                changes_nodes.append(node)
+            return self.sp_libro.consultar_libro_cambios(version, node=node)
+        
+        return DeltaSync(
+            ("ISBN",),
+            lambda node, cached: self.sp_libro.consultar_libro(
+                node=node, as_result_set=True, cached=cached
+            ),
+            load_changes,
+            lambda node: self.sp_libro.version_cambios(node, "sp_Cambios_Libro"),
+            choose_node
+        )
+    
+    def test_sincronizacion_incremental(self):
+        """Prueba que DeltaSync aplique inserciones, cambios y eliminaciones."""
+        self.sp_libro.insertar_libro("978-6", "Libro", 2020, "Novela", "Quito")
+        self.sp_libro.insertar_libro("978-7", "Otro", 2021, "Ensayo", "Lima")
+        sync = self._sync_libros()
+        index = TrigramIndex(("nombre_libro",))
+        sync.attach(index)
+        self.assertTrue(sync.refresh())
+        self.assertEqual(len(sync.result), 2)
+        self.assertEqual(index.search("otro"), {("978-7",)})
+        self.assertFalse(sync.refresh())
+        
+        self.sp_libro.insertar_libro("978-8", "Nuevo", 2022, "Novela", "Quito")
+        self.sp_libro.actualizar_libro("978-6", "Editado", 2020, "Novela", "Quito")
+        self.sp_libro.eliminar_libro("978-7")
+        self.assertTrue(sync.refresh())
+        libros = {row['ISBN']: row['nombre_libro'] for row in sync.result}
+        self.assertEqual(libros, {"978-6": "Editado", "978-8": "Nuevo"})
+        self.assertEqual(index.search("o"), {("978-6",), ("978-8",)})
+        self.assertEqual(sync.subset(index.search("nuevo")).column("ISBN"), ["978-8"])
+    
+    def test_sincronizacion_en_dos_pasos(self):
+        """Prueba que DeltaSync.fetch solo consulte y apply modifique los datos."""
+        sync = self._sync_libros()
+        index = TrigramIndex(("nombre_libro",))
+        sync.attach(index)
+        self.sp_libro.insertar_libro("978-12", "Libro", 2020, "Novela", "Quito")
+        self.assertIsNone(sync.checkpoint)
+        update = sync.fetch(sync.checkpoint)
+        self.assertTrue(update.full)
+        self.assertFalse(sync.loaded)
+        # El índice se construye al consultar; apply solo lo adopta
+        self.assertEqual(len(update.indexes[0]), 1)
+        self.assertEqual(len(index), 0)
+        self.assertTrue(sync.apply(update))
+        self.assertEqual(index.search("libro"), {("978-12",)})
+        
+        self.sp_libro.eliminar_libro("978-12")
+        checkpoint = sync.checkpoint
+        self.assertEqual(checkpoint[0], "FIS")
+        update = sync.fetch(checkpoint)
+        self.assertFalse(update.full)
+        self.assertEqual(len(sync.result), 1)
+        self.assertTrue(sync.apply(update))
+        self.assertEqual(len(sync.result), 0)
+    
+    def test_carga_completa_sin_cache(self):
+        """Prueba que la carga completa de DeltaSync no use ni llene la caché."""
+        self.sp_libro.insertar_libro("978-13", "Libro", 2020, "Novela", "Quito")
+        libros = self.sp_libro.consultar_libro(node="FIS", as_result_set=True, cached=False)
+        self.assertEqual(len(libros), 1)
+        self.assertEqual(len(self.dist_conn.query_cache), 0)
+    
+    def test_procedimiento_de_cambios_ausente(self):
+        """Prueba que sin sp_Cambios_Libro se recargue todo, desde la caché, y se deje de llamarlo."""
+        sync = self._sync_libros()
+        self.sp_libro.insertar_libro("978-14", "Libro", 2020, "Novela", "Quito")
+        self.assertTrue(sync.refresh())
+        # Con versión de cambios la carga completa no pasa por la caché
+        self.assertEqual(len(self.dist_conn.query_cache), 0)
+        with unittest.mock.patch.dict(PROCEDURES):
+            del PROCEDURES["sp_Cambios_Libro"]
+            self.sp_libro.insertar_libro("978-15", "Otro", 2021, "Ensayo", "Lima")
+            update = sync.fetch(sync.checkpoint)
+            self.assertTrue(update.full)
+            self.assertIsNone(update.version)
+            self.assertTrue(sync.apply(update))
+            self.assertEqual(len(sync.result), 2)
+            self.assertFalse(self.sp_libro.has_procedure("sp_Cambios_Libro"))
+            self.assertIsNone(self.sp_libro.consultar_libro_cambios(sync.version))
+            # Sin versión, las recargas siguientes se sirven desde la caché
+            hits = self.dist_conn.query_cache.hits
+            self.assertFalse(sync.refresh())
+            self.assertEqual(self.dist_conn.query_cache.hits, hits + 1)
+        self.dist_conn.disconnect_all()
+        self.assertTrue(self.sp_libro.has_procedure("sp_Cambios_Libro"))
+    
+    def test_sincronizacion_en_un_solo_nodo(self):
+        """Prueba que la versión, la carga y los cambios se lean de la réplica elegida."""
+        self.sp_libro.insertar_libro("978-23", "Libro", 2020, "Novela", "Quito")
+        elegido = ["FIQA"]
+        cambios = []
+        sync = self._sync_libros(lambda: elegido[0], cambios)
+        self.assertTrue(sync.refresh())
+        self.assertEqual(sync.checkpoint[0], "FIQA")
+        
+        # Aunque el enrutador prefiera otro nodo, los cambios se piden al de la carga
+        elegido[0] = "FIS"
+        self.sp_libro.actualizar_libro("978-23", "Editado", 2020, "Novela", "Quito")
+        self.assertTrue(sync.refresh())
+        self.assertEqual(cambios, ["FIQA"])
+        self.assertEqual(sync.result.column("nombre_libro"), ["Editado"])
+        
+        # Si los cambios fallan, la carga completa va al nodo elegido ahora
+        with unittest.mock.patch.object(self.sp_libro, "consultar_libro_cambios",
+                                        return_value=None):
+            sync.refresh()
+        self.assertEqual(sync.node, "FIS")
+        # Cambios pedidos con un punto anterior a la recarga: se descartan
+        stale = sync.fetch(("FIQA", 0))
+        self.assertFalse(sync.apply(stale))
+    
+    def test_busqueda_en_servidor(self):
+        """Prueba las búsquedas de libros por palabras y de usuarios por prefijo."""
+        self.sp_libro.insertar_libro("978-10", "Fundamentos de Química", 2020, "Química", "Quito")
+        self.sp_libro.insertar_libro("978-11", "Ingeniería de Software", 2021, "Software", "Lima")
+        self.sp_libro.actualizar_libro("978-11", "Redes", 2021, "Software", "Lima")
+        self.assertEqual([l['ISBN'] for l in self.sp_libro.buscar_libro("quimica fund")], ["978-10"])
+        self.assertEqual(self.sp_libro.buscar_libro("ingenieria"), [])
+        self.assertEqual(len(self.sp_libro.buscar_libro("978", "Software", node="FIQA")), 1)
+        
+        self.sp_usuarios.insertar_usuario("01", "0102", "Ana", "Paz", "ana@correo.com", "099")
+        self.sp_usuarios.insertar_usuario("02", "0203", "Luis", "Anaya", "luis@correo.com", "098")
+        self.assertEqual([u['cedula'] for u in self.sp_usuarios.buscar_usuario("AN")],
+                         ["0203", "0102"])
+        self.assertEqual(len(self.sp_usuarios.buscar_usuario("an", id_biblioteca="01")), 1)
+    
+    def test_busqueda_sin_procedimiento(self):
+        """Prueba que sin sp_Buscar_Libro la búsqueda no falle y se deje de llamar."""
+        with unittest.mock.patch.dict(PROCEDURES):
+            del PROCEDURES["sp_Buscar_Libro"]
+            self.assertEqual(self.sp_libro.buscar_libro("quimica"), [])
+        self.assertFalse(self.sp_libro.has_procedure("sp_Buscar_Libro"))
+        self.assertTrue(self.sp_usuarios.has_procedure("sp_Buscar_Usuario"))
+    
+    def test_paginacion_por_clave(self):
+        """Prueba que las páginas recorran todos los préstamos una sola vez y en orden."""
+        sp_prestamo = SP_Prestamo(self.dist_conn)
+        inicio = date(2024, 1, 1)
+        for dia in range(5):
+            for id_biblioteca in ("01", "02"):
+                sp_prestamo.insertar_prestamo(id_biblioteca, "978-9", 1, "0102030405",
+                                              inicio + timedelta(days=dia),
+                                              inicio + timedelta(days=dia + 15))
+        paginas = list(sp_prestamo.consultar_prestamo_pages(limit=3))
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 3, 1])
+        claves = [(p['id_biblioteca'], str(p['fecha_prestamo'])) for pagina in paginas
+                  for p in pagina]
+        self.assertEqual(claves, sorted(set(claves)))
+        self.assertEqual(len(claves), 10)
+    
+    def test_pagina_fallida(self):
+        """Prueba que una página que falla lance el error y no parezca la última."""
+        sp_prestamo = SP_Prestamo(self.dist_conn)
+        with unittest.mock.patch.dict(PROCEDURES):
+            del PROCEDURES["sp_Pagina_Prestamo"]
+            with self.assertRaises(sqlite3.DatabaseError):
+                list(sp_prestamo.consultar_prestamo_pages(limit=3))
+
+
+
+@unittest.skipIf(QApplication is None, "PyQt5 no está instalado")
+class QtTestCase(unittest.TestCase):
+    """Base de las pruebas de la interfaz."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.app = QApplication.instance() or QApplication([])
+    
+    def process_events(self, until=None, timeout: float = 5.0) -> bool:
+        """
+        Procesa eventos y tareas del pool de hilos hasta que until() se
+        cumpla (sin until, hasta que el pool quede libre) o pase timeout.
+        """
+        pool = QThreadPool.globalInstance()
+        if until is None:
+            def until():
+                return pool.activeThreadCount() == 0
+        deadline = time.monotonic() + timeout
+        while True:
+            pool.waitForDone(20)
+            self.app.processEvents()
+            if until() or time.monotonic() >= deadline:
+                return until()
+
+
+class TestVistas(QtTestCase):
+    """Pruebas de las vistas con el backend SQLite."""
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = local_config.DistributedDatabaseConfig.for_sqlite(self.directory)
+        self.dist_conn = DistributedConnection(config)
+        self.scope = connection_scope(config)
+        self.store = SnapshotStore(os.path.join(self.directory, "copia", "snapshot.db"))
+    
+    def tearDown(self):
+        self.process_events()
+        self.dist_conn.disconnect_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_copia_local_de_usuarios_por_biblioteca(self):
+        """Prueba que un gestor guarde en la copia local solo los usuarios de su biblioteca."""
+        from gui.views.usuarios_view import UsuariosView
+        sp_usuarios = SP_Usuarios(self.dist_conn)
+        sp_usuarios.insertar_usuario("01", "0102", "Ana", "Paz", "ana@correo.com", "099")
+        sp_usuarios.insertar_usuario("02", "0203", "Luis", "Vera", "luis@correo.com", "098")
+        with unittest.mock.patch("gui.views.usuarios_view.snapshot_store", self.store):
+            view = UsuariosView(self.dist_conn, {'role': 'gestor_fis'})
+            self.assertTrue(self.process_events(
+                lambda: self.store.load("usuarios_01", self.scope) is not None
+            ))
+            view.deleteLater()
+        self.assertEqual(len(view._sync.result), 2)
+        usuarios = self.store.load("usuarios_01", self.scope)
+        self.assertEqual(usuarios.column("cedula"), ["0102"])
+        self.assertIsNone(self.store.load("usuarios", self.scope))
+
+
+
+class TestTablas(QtTestCase):
+    """Pruebas de los filtros, el modelo y las tablas sobre ResultSet."""
+    
+    COLUMNAS = ["ISBN", "nombre_libro", "id_biblioteca"]
+    
+    def _libros(self) -> ResultSet:
+        return ResultSet(self.COLUMNAS, [
+            ("978-1", "Química General", "01"),
+            ("978-2", "Redes", "02"),
+            ("978-3", "Quimica Orgánica", "02"),
+            ("978-4", "Álgebra", "01"),
+        ])
+    
+    def test_filtro_compilado(self):
+        """Prueba los filtros por texto, por valor exacto y combinados."""
+        from gui.components.tables import RowFilter
+        filas = self._libros().rows
+        
+        def isbns(row_filter):
+            predicate = row_filter.compile(self.COLUMNAS)
+            return [values[0] for values in filas if predicate is None or predicate(values)]
+        
+        self.assertIsNone(RowFilter("  ", ("nombre_libro",)).compile(self.COLUMNAS))
+        self.assertIsNone(RowFilter(equals={'id_biblioteca': None}).compile(self.COLUMNAS))
+        # Sin distinguir mayúsculas ni tildes
+        self.assertEqual(isbns(RowFilter("QUÍMICA", ("nombre_libro",))), ["978-1", "978-3"])
+        self.assertEqual(isbns(RowFilter(equals={'id_biblioteca': "01"})), ["978-1", "978-4"])
+        self.assertEqual(isbns(RowFilter(equals={'id_biblioteca': "02", 'ISBN': "978-2"})),
+                         ["978-2"])
+        self.assertEqual(isbns(RowFilter("quimica", ("nombre_libro", "ISBN"),
+                                         {'id_biblioteca': "02"})), ["978-3"])
+        self.assertEqual(isbns(RowFilter(equals={'cedula': "0102"})), [])
+    
+    def test_orden_tras_filtro(self):
+        """Prueba que el orden se aplique a las filas filtradas y se conserve al quitar el filtro."""
+        from gui.components.tables import ResultSetModel, RowFilter
+        model = ResultSetModel(["ISBN", "nombre_libro"])
+        model.set_result(self._libros())
+        model.set_filter(RowFilter(equals={'id_biblioteca': "02"}))
+        model.sort(1, Qt.DescendingOrder)
+        self.assertEqual(model.column("ISBN"), ["978-2", "978-3"])
+        self.assertEqual(model.record(0)['nombre_libro'], "Redes")
+        model.set_filter(None)
+        # Orden por código de carácter: 'Á' va después de 'R' e 'í' después de 'i'
+        self.assertEqual(model.column("ISBN"), ["978-4", "978-2", "978-1", "978-3"])
+        # Un resultado nuevo mantiene filtro y orden
+        model.set_filter(RowFilter("quimica", ("nombre_libro",)))
+        model.set_result(self._libros()[:3])
+        self.assertEqual(model.column("ISBN"), ["978-1", "978-3"])
+        self.assertEqual(model.text(0, 1), "Química General")
+    
+    def test_seleccion_se_conserva_al_ordenar(self):
+        """Prueba que la fila seleccionada siga seleccionada al reordenar o filtrar."""
+        from gui.components.tables import ResultTableView, RowFilter
+        table = ResultTableView(["ISBN", "nombre_libro"])
+        table.set_result(self._libros())
+        table.selectRow(1)
+        self.assertEqual(table.record(table.selected_row())['ISBN'], "978-2")
+        table.sortByColumn(1, Qt.AscendingOrder)
+        self.assertEqual(table.selected_row(), 2)
+        self.assertEqual(table.record(table.selected_row())['ISBN'], "978-2")
+        table.set_filter(RowFilter(equals={'id_biblioteca': "02"}))
+        self.assertEqual(table.row_count(), 2)
+        self.assertEqual(table.record(table.selected_row())['ISBN'], "978-2")
+        # Si la fila seleccionada deja de mostrarse, no queda selección
+        table.set_filter(RowFilter(equals={'id_biblioteca': "01"}))
+        self.assertEqual(table.selected_row(), -1)
+        table.deleteLater()
+    
+    def test_tabla_de_datos(self):
+        """Prueba que DataTable muestre diccionarios y emita la fila seleccionada."""
+        from gui.components.tables import DataTable
+        data_table = DataTable(["ISBN", "nombre_libro"], [
+            {"ISBN": "978-1", "nombre_libro": "Química General"},
+            {"ISBN": "978-2", "nombre_libro": None},
+        ])
+        seleccionadas = []
+        data_table.row_selected.connect(seleccionadas.append)
+        self.assertEqual(data_table.table.row_count(), 2)
+        self.assertEqual(data_table.table.text(1, 1), "")
+        self.assertIsNone(data_table.get_selected())
+        data_table.table.selectRow(0)
+        self.assertEqual(seleccionadas, [{"ISBN": "978-1", "nombre_libro": "Química General"}])
+        self.assertEqual(data_table.get_selected()["ISBN"], "978-1")
+        data_table.load_data(self._libros())
+        self.assertEqual(data_table.table.row_count(), 4)
+        self.assertIsNone(data_table.get_selected())
+        data_table.clear()
+        self.assertEqual(data_table.table.row_count(), 0)
+        data_table.deleteLater()
+
+
+
+class TestBackgroundLoader(QtTestCase):
+    """Pruebas de las cargas en segundo plano de las vistas."""
+    
+    def setUp(self):
+        from gui.workers import BackgroundLoader, Worker
+        # Un solo hilo, ocupado por una tarea hasta liberar self.release
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(1)
+        self.release = threading.Event()
+        self.pool.start(Worker(0, lambda progress: self.release.wait(5)))
+        self.parent = QObject()
+        self.loader = BackgroundLoader(self.parent, self.pool)
+        self.loaded = []
+        self.loader.loaded.connect(self.loaded.append)
+    
+    def tearDown(self):
+        self.release.set()
+        self.pool.waitForDone()
+    
+    def _finish(self):
+        """Libera el pool y entrega las señales pendientes."""
+        self.release.set()
+        self.pool.waitForDone()
+        self.app.processEvents()
+    
+    def test_resultado_de_carga_anterior_se_descarta(self):
+        """Prueba que solo se emita el resultado de la última carga."""
+        self.loader.start(lambda progress: "primera")
+        first = self.loader._worker
+        self.loader.start(lambda progress: "segunda")
+        self.assertTrue(first.cancelled)
+        # Aunque la tarea anterior llegue a emitir, su número ya no es el vigente
+        first.signals.result.emit(first.token, "primera")
+        self._finish()
+        self.assertEqual(self.loaded, ["segunda"])
+        self.assertFalse(self.loader.running)
+    
+    def test_cancelar_antes_de_empezar(self):
+        """Prueba que una carga cancelada antes de empezar no ejecute su función."""
+        llamadas = []
+        self.loader.start(lambda progress: llamadas.append(1))
+        self.loader.cancel()
+        self._finish()
+        self.assertEqual(llamadas, [])
+        self.assertEqual(self.loaded, [])
+    
+    def test_destruir_la_vista_cancela_la_carga(self):
+        """Prueba que destruir el widget dueño cancele la carga pendiente."""
+        llamadas = []
+        self.loader.start(lambda progress: llamadas.append(1))
+        worker = self.loader._worker
+        sip.delete(self.parent)
+        self.assertTrue(worker.cancelled)
+        self._finish()
+        self.assertEqual(llamadas, [])
+        self.assertEqual(self.loaded, [])
+
+
+
+class TestMainWindow(QtTestCase):
+    """Pruebas de la creación de las vistas en la ventana principal."""
+    
+    def setUp(self):
+        from gui.main_window import MainWindow
+        from database.snapshot import snapshot_store
+        self.directory = tempfile.mkdtemp()
+        config = local_config.DistributedDatabaseConfig.for_sqlite(self.directory)
+        self.dist_conn = DistributedConnection(config)
+        patcher = unittest.mock.patch.object(
+            snapshot_store, "path", os.path.join(self.directory, "snapshot.db")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.window = MainWindow()
+        self.window.dist_conn = self.dist_conn
+        self.window.current_user = {'role': 'admin'}
+        self.window._setup_main_interface()
+        self.window._prefetch_timer.stop()
+        self.process_events()
+    
+    def tearDown(self):
+        self.window._prefetch_timer.stop()
+        self.window.deleteLater()
+        self.process_events()
+        self.dist_conn.disconnect_all()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def test_vista_se_crea_una_vez(self):
+        """Prueba que cada vista se cree al pedirla por primera vez y luego se reutilice."""
+        from gui.views.usuarios_view import UsuariosView
+        self.assertEqual(list(self.window._views), [0])
+        self.assertIs(self.window._view(0), self.window._views[0])
+        usuarios = self.window._view(1)
+        self.assertIsInstance(usuarios, UsuariosView)
+        self.assertIs(self.window._view(1), usuarios)
+        self.assertEqual(self.window.content_stack.count(), 2)
+    
+    def test_precarga_espera_a_que_el_pool_quede_libre(self):
+        """Prueba que no se creen vistas mientras hay consultas en curso o actividad reciente."""
+        ocupado = [1]
+        pool = unittest.mock.Mock()
+        pool.activeThreadCount.side_effect = lambda: ocupado[0]
+        with unittest.mock.patch("gui.main_window.QThreadPool") as qthreadpool:
+            qthreadpool.globalInstance.return_value = pool
+            self.window._last_input = 0.0
+            self.window._prefetch_next_view()
+            self.assertEqual(list(self.window._views), [0])
+            self.assertTrue(self.window._prefetch_timer.isActive())
+            
+            ocupado[0] = 0
+            self.window._last_input = time.monotonic()
+            self.window._prefetch_next_view()
+            self.assertEqual(list(self.window._views), [0])
+            
+            self.window._last_input = 0.0
+            self.window._prefetch_next_view()
+            self.assertEqual(sorted(self.window._views), [0, 1])
+            self.assertTrue(self.window._prefetch_timer.isActive())
 
 
 if __name__ == '__main__':